@@ -2,13 +2,24 @@
 Backend file for the monitoring dashboard. This file contains the API endpoints for the dashboard.
 """
 
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, send_from_directory
+import hashlib
+import json
+import threading
+from urllib.parse import quote
 from flask_cors import CORS
 import logging
 from src.dashboard.workspace_manager import WorkspaceManager
-from scripts.data_details import load_details
-from src.utils.config_manager import load_config
-from src.dashboard.create_project import update_panels
+from scripts.data_details import load_details, get_details_path
+from src.utils.config_manager import get_model_config
+from src.dashboard.create_project import build_panels, get_stratum_key
+from src.dashboard.filter_views import create_view, get_view_id, is_view_use_stale, touch_view
+from src.dashboard.panel_cache import PanelCache, MAX_CACHED_VIEWS, normalize_tags
+from src.dashboard.sessions import SessionViews
+from src.dashboard.fact_card import get_fact_card_cache_dir
+from src.monitoring.bootstrap import get_intervals_path, load_intervals
+from src.monitoring.metric_store import MetricStore, DEFAULT_PAGE_SIZE, get_metric_store_path
+from src.utils.api_metrics import instrument_app, WORKSPACE_WRITE_LATENCY
 import os
 
 logging.basicConfig(level=logging.INFO)
@@ -29,15 +40,22 @@ CORS(
     supports_credentials=True,
     resources={r"/*": {"origins": allowed_origins}},
 )
+instrument_app(app, "dashboard")
 
-config = load_config()
-details = load_details()
+# the model served by this API, required if several models are monitored
+config = get_model_config(os.environ.get("MONITORING_MODEL_ID") or None)
+details = load_details(get_details_path(config))
 workspace_instance = WorkspaceManager.get_instance()
-ws = workspace_instance.workspace
 
 dashboard_url = os.environ.get("DASHBOARD_URL", "http://localhost:3000")
 evidently_url = os.environ.get("EVIDENTLY_URL", "http://localhost:8000")
 
+panel_cache = PanelCache(config.get("dashboard_cache", {}).get("max_size", MAX_CACHED_VIEWS))
+session_views = SessionViews()
+# JSON bodies and ETags of the endpoints whose results only change after a flow run, by workspace generation
+response_cache = {}
+response_cache_lock = threading.Lock()
+
 
 def get_filters(config: dict) -> dict:
     """
@@ -76,20 +94,65 @@ def get_filters(config: dict) -> dict:
     return strata_mapping
 
 
+def cached_response(name: str, builder):
+    """
+    Respond with the JSON result of builder(), computed once per workspace generation, with a strong ETag on its
+    content, or with 304 Not Modified if the client already has it.
+    """
+    workspace_instance = WorkspaceManager.get_instance()
+    workspace_instance.get_workspace()
+    generation = workspace_instance.generation
+    with response_cache_lock:
+        cached = response_cache.get(name)
+    if cached is None or cached[0] != generation:
+        body = json.dumps(builder(), sort_keys=True)
+        cached = (generation, body, hashlib.sha1(body.encode()).hexdigest())
+        with response_cache_lock:
+            response_cache[name] = cached
+    _, body, etag = cached
+
+    if etag in request.if_none_match:
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype="application/json")
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def build_filter_options() -> dict:
+    """
+    Reload the data details, which the flow updates, and build the filter options.
+    """
+    global details
+    details = load_details(get_details_path(config))
+    return get_filters(config)
+
+
 @app.route("/get_filter_options", methods=["GET"])
 def get_filter_options():
     """
     Get the filter options for the dashboard.
     """
-    return jsonify(get_filters(config))
+    return cached_response("filter_options", build_filter_options)
+
+
+def get_session_id(payload: dict = None) -> str:
+    """
+    Get the session id of the request from the payload or the X-Session-ID header, or generate a new one.
+    """
+    session_id = (payload or {}).get("session_id") or request.headers.get("X-Session-ID")
+    return session_id or session_views.new_session_id()
 
 
 @app.route("/apply_filters", methods=["POST"])
 def apply_filters():
     """
-    Apply the selected filters to the dashboard.
+    Apply the selected filters to the dashboard of the session.
     """
-    filters = request.json
+    filters = dict(request.json or {})
+    session_id = get_session_id(filters)
+    filters.pop("session_id", None)
     tags = [v for k, v in filters.items() if v]
 
     # if exactly one tag, add the tag 'single' to the list of tags
@@ -98,19 +161,142 @@ def apply_filters():
 
     logger.debug("tags: %s", tags)
 
-    workspace_instance = WorkspaceManager.get_instance()
-    workspace_instance.reload_workspace()
-    ws = workspace_instance.workspace
-
     if tags:
         logger.info("Applying filters: %s", tags)
-        update_panels(ws, config, tags)
     else:
         logger.info("No filters applied")
-        update_panels(ws, config)
 
-    filtered_url = f"{dashboard_url}/dashboard"
-    return jsonify({"status": "updated", "filtered_url": filtered_url})
+    key = normalize_tags(tags)
+    session_views.set(session_id, key)
+
+    # each filter set has its own prebuilt view project, so switching filters is a lookup
+    workspace_instance = WorkspaceManager.get_instance()
+    try:
+        view_id = get_view_id(workspace_instance.get_workspace(), config, key)
+        if view_id is not None and is_view_use_stale(workspace_instance.get_workspace(), config, view_id):
+            # the least recently used views are evicted first
+            with workspace_instance.write_lock():
+                touch_view(workspace_instance.get_workspace(), config, view_id)
+        if view_id is None:
+            # the first request for a filter set creates its view, once across the API workers
+            with workspace_instance.write_lock():
+                workspace = workspace_instance.get_workspace()
+                view_id = get_view_id(workspace, config, key)
+                if view_id is None:
+                    panels = panel_cache.get_or_build(
+                        key, lambda key: build_panels(config, key), version=workspace_instance.generation
+                    )
+                    # the other processes find the new view in the view registry, without reloading the workspace
+                    with WORKSPACE_WRITE_LATENCY.time():
+                        view_id = create_view(workspace, config, key, panels)
+    except IndexError:
+        return jsonify({"status": "error", "message": "Project not found, please create the project."}), 404
+
+    view_url = f"{evidently_url}/projects/{view_id}"
+    filtered_url = f"{dashboard_url}/dashboard?view={quote(view_url, safe='')}"
+    return jsonify(
+        {
+            "status": "updated",
+            "filtered_url": filtered_url,
+            "dashboard_url": view_url,
+            "session_id": session_id,
+            "tags": list(key),
+        }
+    )
+
+
+@app.route("/get_view", methods=["GET"])
+def get_view():
+    """
+    Get the filter tags, panel titles and view project URL of the dashboard view of a session.
+    """
+    session_id = get_session_id(request.args)
+    key = session_views.get(session_id)
+    workspace_instance = WorkspaceManager.get_instance()
+    workspace_instance.get_workspace()
+    version = workspace_instance.generation
+    panels = panel_cache.get_or_build(key, lambda key: build_panels(config, key), version=version)
+    try:
+        view_id = get_view_id(workspace_instance.get_workspace(), config, key)
+    except IndexError:
+        view_id = None
+    return jsonify(
+        {
+            "session_id": session_id,
+            "tags": list(key),
+            "panels": [panel.title for panel in panels],
+            "dashboard_url": f"{evidently_url}/projects/{view_id}" if view_id else None,
+        }
+    )
+
+
+@app.route("/get_intervals", methods=["GET"])
+def get_intervals():
+    """
+    Get the bootstrap confidence intervals of the latest run for the selected filters.
+    """
+    tags = [v for k, v in request.args.items() if v]
+    stratum = get_stratum_key(tags)
+    intervals = load_intervals(get_intervals_path(config))
+    return jsonify(
+        {
+            "timestamp": intervals.get("timestamp"),
+            "stratum": stratum,
+            "intervals": intervals.get("strata", {}).get(stratum, {}),
+        }
+    )
+
+
+@app.route("/get_metrics", methods=["GET"])
+def get_metrics():
+    """
+    Get a page of the metric values of a stratum over time, optionally for one metric and between two timestamps.
+    """
+    stratum = request.args.get("stratum")
+    if not stratum:
+        return jsonify({"status": "error", "message": "Missing stratum"}), 400
+    try:
+        limit = int(request.args.get("limit", DEFAULT_PAGE_SIZE))
+        offset = max(int(request.args.get("offset", 0)), 0)
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and offset must be integers"}), 400
+
+    db_path = get_metric_store_path(config)
+    if not os.path.exists(db_path):
+        return jsonify({"stratum": stratum, "values": [], "next_offset": None})
+
+    # the API only reads the store, the flow creates it
+    store = MetricStore(db_path, read_only=True)
+    try:
+        # the ETag changes with the query and with every run added to the store
+        query = sorted(request.args.items())
+        etag = hashlib.sha1(repr((store.version(), query)).encode()).hexdigest()
+        if etag in request.if_none_match:
+            response = app.response_class(status=304)
+        else:
+            page = store.query(
+                stratum,
+                metric=request.args.get("metric"),
+                start=request.args.get("from"),
+                end=request.args.get("to"),
+                limit=limit,
+                offset=offset,
+            )
+            response = jsonify({"stratum": stratum, **page})
+    finally:
+        store.close()
+    response.set_etag(etag)
+    response.headers["Cache-Control"] = "no-cache"
+    return response
+
+
+def build_dashboard_url() -> dict:
+    """
+    Build the URL of the Evidently dashboard of the project.
+    """
+    ws = WorkspaceManager.get_instance().get_workspace()
+    project = ws.search_project(config["info"]["project_name"])[0]
+    return {"dashboard_url": f"{evidently_url}/projects/{project.id}"}
 
 
 @app.route("/get_dashboard_url", methods=["GET"])
@@ -119,20 +305,25 @@ def get_dashboard_url():
     Get the URL for the Evidently dashboard.
     """
     try:
-        workspace_instance = WorkspaceManager.get_instance()
-        workspace_instance.reload_workspace()
-        ws = workspace_instance.workspace
-        project = ws.search_project(config["info"]["project_name"])[0]
         if not evidently_url:
             return jsonify({"status": "error", "message": "Evidently URL not configured"}), 500
-        dashboard_url = f"{evidently_url}/projects/{project.id}"
-        return jsonify({"dashboard_url": dashboard_url})
+        return cached_response("dashboard_url", build_dashboard_url)
     except IndexError:
         return jsonify({"status": "error", "message": "Project not found, please create the project."}), 404
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@app.route("/fact_card/<path:file_name>", methods=["GET"])
+def get_fact_card(file_name: str):
+    """
+    Serve a prepared fact card image. Its name is derived from its content, so it can be cached forever.
+    """
+    response = send_from_directory(get_fact_card_cache_dir(), file_name, max_age=365 * 24 * 3600)
+    response.headers["Cache-Control"] += ", immutable"
+    return response
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("DASHBOARD_API_PORT", 5002))
     app.run(host="0.0.0.0", port=port, debug=True)
@@ -7,11 +7,14 @@ from flask_cors import CORS
 from pymongo.mongo_client import MongoClient
 from datetime import datetime, timezone
 import os
+import time
 import pandas as pd
 import logging
 from werkzeug.exceptions import RequestEntityTooLarge
 
-from src.utils.config_manager import load_config
+from src.utils.config_manager import get_model_config
+from src.utils.api_metrics import instrument_app, record_insert
+from src.utils.pending_matches import count_matches, record_pending_matches
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -36,6 +39,7 @@ CORS(
     supports_credentials=True,
     resources={r"/*": {"origins": allowed_origins}},
 )
+instrument_app(app, "ingestion")
 # Load the database
 mongo_uri = os.getenv("MONGO_URI")
 db_name = os.getenv("MONGO_DB_NAME", "data_ingestion")
@@ -54,8 +58,8 @@ try:
 except Exception as e:
     logger.error(f"Failed to connect to MongoDB: {e}")
 
-# Load the configuration
-config = load_config()
+# Load the configuration of the model, required if several models are monitored
+config = get_model_config(os.environ.get("MONITORING_MODEL_ID") or None)
 model_id = config["model_config"]["model_id"]
 
 # Load the database
@@ -218,7 +222,14 @@ def ingest_results():
 
             results.append(new_result)
 
+        insert_start = time.perf_counter()
         results_collection.insert_many(results)
+        record_insert(results_collection.name, len(results), time.perf_counter() - insert_start)
+
+        # count the uploaded rows that complete a pair, for the flow trigger
+        study_ids = [row[columns["study_id"]] for row in results]
+        matches = count_matches(db, f"{model_id}_labels", columns["study_id"], study_ids)
+        record_pending_matches(db, model_id, matches)
 
         logger.info("Results ingested successfully.")
         return jsonify({"message": "Results ingested successfully."}), 200
@@ -287,7 +298,14 @@ def ingest_labels():
 
             labels.append(new_label)
 
+        insert_start = time.perf_counter()
         labels_collection.insert_many(labels)
+        record_insert(labels_collection.name, len(labels), time.perf_counter() - insert_start)
+
+        # count the uploaded rows that complete a pair, for the flow trigger
+        study_ids = [row[columns["study_id"]] for row in labels]
+        matches = count_matches(db, f"{model_id}_results", columns["study_id"], study_ids)
+        record_pending_matches(db, model_id, matches)
 
         logger.info("Labels ingested successfully.")
         return jsonify({"message": "Labels ingested successfully."}), 200
@@ -2,7 +2,6 @@
 Prefect flow for monitoring dashboard pipeline with parallel snapshot generation.
 """
 
-import time
 from prefect import flow, task
 from prefect.task_runners import ConcurrentTaskRunner
 import logging
@@ -10,34 +9,60 @@ from datetime import datetime
 import warnings
 from sklearn.exceptions import UndefinedMetricWarning
 import os
+import threading
 
-from src.utils.config_manager import load_config
-from scripts.data_details import load_details
+from src.utils.config_manager import load_model_configs, get_data_dir
+from scripts.data_details import load_details, get_details_path
 from src.data_preprocessing.etl import etl_pipeline
 from src.monitoring.stratify import DataSplitter
 from src.monitoring.metrics import generate_report
 from src.monitoring.tests import generate_tests
+from src.monitoring.cache import SnapshotCache, get_cache_dir, prune_cache
+from src.monitoring.accumulators import delete_accumulated_runs, update_accumulators, save_rolling_metrics
+from src.monitoring.bootstrap import compute_intervals, save_intervals, get_intervals_path
+from src.monitoring.metric_store import (
+    save_metric_values,
+    delete_metric_values,
+    get_metric_store_path,
+    collect_run_values,
+)
+from src.monitoring.snapshots import get_run_dir
+from src.monitoring.alerts import check_interval_alerts, AlertCollector
 from src.dashboard.workspace_manager import WorkspaceManager
-from src.dashboard.create_project import create_or_update
+from src.dashboard.create_project import (
+    create_or_update,
+    get_failed_runs,
+    get_snapshots_dir,
+    save_run_range,
+    mark_run_complete,
+    remove_failed_runs,
+)
+from src.data_preprocessing.fetch_data import get_timestamp_col, move_matched
+from src.dashboard.fact_card import prepare_fact_card
+from src.dashboard.retention import enforce_retention
+from src.monitoring.instrumentation import stage, start_run, finish_run, get_profile_dir
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+# the reports and tests of every model share this many concurrent runs
+worker_budget = threading.BoundedSemaphore(int(os.environ.get("MONITORING_WORKERS", os.cpu_count() or 1)))
+
 
 @task
-def load_configuration():
+def load_configurations():
     """
-    Load the configuration file.
+    Load the configurations of the monitored models.
     """
-    return load_config()
+    return load_model_configs()
 
 
 @task
-def load_data_details():
+def load_data_details(config):
     """
-    Load the data details.
+    Load the data details of a model.
     """
-    return load_details()
+    return load_details(get_details_path(config))
 
 
 @task
@@ -45,7 +70,10 @@ def run_etl(config):
     """
     Run the ETL pipeline.
     """
-    return etl_pipeline(config)
+    with stage("run_etl", config=config) as record:
+        data, reference_data = etl_pipeline(config)
+        record["rows"] = 0 if data is None else len(data)
+    return data, reference_data
 
 
 @task
@@ -53,84 +81,151 @@ def split_data(data, config, details, operation):
     """
     Split the data for reports and tests.
     """
-    splitter = DataSplitter()
-    return splitter.split_data(data, config, details, operation)
+    with stage(f"split_data.{operation}", config=config) as record:
+        stratifications = DataSplitter().split_data(data, config, details, operation)
+        record["rows"] = sum(len(data_stratification) for data_stratification in stratifications.values())
+    return stratifications
 
 
 @task
 def generate_report_for_stratification(
-    data_stratification, reference_data, config, model_type, key, timestamp, details
+    data_stratification, reference_data, config, model_type, key, timestamp, details, cache
 ):
     """
     Generate a report for a data stratum.
     """
-    generate_report(
-        data_stratification,
-        reference_data,
-        config,
-        model_type,
-        folder_path=f"/reports/{key}",
-        timestamp=timestamp,
-        details=details,
-    )
+    with worker_budget, stage(f"report.{key}", config=config, rows=len(data_stratification)):
+        generate_report(
+            data_stratification,
+            reference_data,
+            config,
+            model_type,
+            folder_path=f"/reports/{key}",
+            timestamp=timestamp,
+            details=details,
+            cache=cache,
+        )
 
 
 @task
-def generate_test_for_stratification(data_stratification, reference_data, config, model_type, key, timestamp, details):
+def generate_test_for_stratification(
+    data_stratification, reference_data, config, model_type, key, timestamp, details, cache
+):
     """
     Generate tests for a data stratum.
     """
-    generate_tests(
-        data_stratification,
-        reference_data,
-        config,
-        model_type,
-        folder_path=f"/tests/{key}",
-        timestamp=timestamp,
-        details=details,
-    )
+    with worker_budget, stage(f"test.{key}", config=config, rows=len(data_stratification)):
+        generate_tests(
+            data_stratification,
+            reference_data,
+            config,
+            model_type,
+            folder_path=f"/tests/{key}",
+            timestamp=timestamp,
+            details=details,
+            cache=cache,
+        )
 
 
 @task
-def create_dashboard(config):
+def update_rolling_metrics(stratifications, config, timestamp):
     """
-    Create the dashboard.
+    Add the strata to the metric accumulators and publish the rolling metrics.
     """
-    workspace_instance = WorkspaceManager.get_instance()
-    create_or_update(workspace_instance.workspace, config)
-    time.sleep(0.5)
+    data_dir = get_data_dir(config)
+    with stage("update_rolling_metrics", config=config):
+        # the failed runs over the same rows are replaced by this run, their contributions aren't counted again
+        failed = get_failed_runs(get_snapshots_dir(config), timestamp)
+        rolling = update_accumulators(
+            stratifications, config, timestamp, os.path.join(data_dir, "accumulators.db"), failed
+        )
+        save_rolling_metrics(rolling, timestamp, os.path.join(data_dir, "rolling_metrics.json"))
 
 
-@flow(name="Monitoring Flow", task_runner=ConcurrentTaskRunner())
-def monitoring_flow():
+@task
+def compute_confidence_intervals(stratifications, config, timestamp):
     """
-    Monitoring flow for the dashboard pipeline.
+    Compute the bootstrap confidence intervals of the strata metrics, add them to the metric store, and alert on the
+    metrics whose whole interval is beyond its threshold.
     """
-    warnings.simplefilter(action="ignore", category=FutureWarning)
-    warnings.simplefilter(action="ignore", category=UndefinedMetricWarning)
-    warnings.simplefilter(action="ignore", category=RuntimeWarning)
-    warnings.simplefilter(action="ignore", category=UserWarning)
+    with stage("compute_confidence_intervals", config=config):
+        intervals = compute_intervals(stratifications, config)
+        save_intervals(intervals, timestamp, get_intervals_path(config))
+        save_metric_values(intervals, timestamp, get_metric_store_path(config))
 
-    timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
-    config = load_configuration()
-    details = load_data_details()
-    data, reference_data = run_etl(config)
+    thresholds = config.get("alerts", {}).get("metric_thresholds", {})
+    is_alert, failed_tests = check_interval_alerts(intervals, thresholds)
+    if is_alert:
+        alert_collector = AlertCollector(config)
+        alert_collector.add_failed_tests("Metric Confidence Intervals", failed_tests)
+        alert_collector.send_alert(config["alerts"]["emails"])
+
+
+@task
+def store_run_values(config, timestamp):
+    """
+    Add the drift values and test outcomes of the snapshots of the run to the metric store.
+    """
+    with stage("store_run_values", config=config):
+        values = collect_run_values(get_run_dir(timestamp, config))
+        save_metric_values(values, timestamp, get_metric_store_path(config))
+
+
+@task
+def complete_run(config, matched_ids, timestamp):
+    """
+    Move the rows of a run whose snapshots were all generated to the matched collection. Until then a failed run
+    leaves its rows in place, and the next run generates them again, reusing the cached snapshots.
+    """
+    with stage("complete_run", config=config, rows=len(matched_ids)):
+        move_matched(config, matched_ids)
+        mark_run_complete(get_snapshots_dir(config), timestamp)
+
+
+@task
+def create_dashboard(config, timestamp):
+    """
+    Create the dashboard.
+    """
+    with stage("create_dashboard", config=config):
+        # resize and recompress the fact card once, before the panels reference it
+        prepare_fact_card(config)
+        workspace_instance = WorkspaceManager.get_instance()
+        with workspace_instance.write_lock():
+            workspace = workspace_instance.get_workspace()
+            # the failed runs before this one are replaced by it, their snapshots leave the workspace in the update
+            failed = remove_failed_runs(get_snapshots_dir(config), timestamp)
+            if failed:
+                prune_cache(get_cache_dir(config))
+                delete_metric_values(failed, get_metric_store_path(config))
+                delete_accumulated_runs(failed, os.path.join(get_data_dir(config), "accumulators.db"))
+            # pruned before the update, so that the dashboard views never link pruned snapshots
+            enforce_retention(workspace, config)
+            create_or_update(workspace, config)
+            # the dashboard API reloads the workspace only when this marker changes
+            workspace_instance.mark_changed()
 
-    if data is None:
-        logger.info("No new data available. Monitoring flow completed successfully with no updates.")
-        return
+
+def submit_model_tasks(data, reference_data, config, details, timestamp):
+    """
+    Submit the reports, tests, rolling metrics and confidence intervals of a model. Return its snapshot cache and
+    the submitted tasks.
+    """
+    # Strata unchanged since a previous run reuse their snapshots
+    cache = SnapshotCache(reference_data, config)
+    # a backfill over the same rows replaces this run, the next run replaces it if it fails
+    timestamps = data[get_timestamp_col(config)]
+    save_run_range(get_snapshots_dir(config), timestamp, timestamps.min(), timestamps.max(), complete=False)
 
     # Split data for reports and tests concurrently
     report_stratifications_future = split_data.submit(data, config, details, "report")
     test_stratifications_future = split_data.submit(data, config, details, "test")
 
     # Generate reports and tests concurrently
-    report_tasks = []
-    test_tasks = []
-
-    for stratifications_future, generation_task, task_list in [
-        (report_stratifications_future, generate_report_for_stratification, report_tasks),
-        (test_stratifications_future, generate_test_for_stratification, test_tasks),
+    tasks = []
+    for stratifications_future, generation_task in [
+        (report_stratifications_future, generate_report_for_stratification),
+        (test_stratifications_future, generate_test_for_stratification),
     ]:
         stratifications = stratifications_future.result()
         for key, data_stratification in stratifications.items():
@@ -142,15 +237,68 @@ def monitoring_flow():
                 key,
                 timestamp,
                 details,
+                cache,
+            )
+            tasks.append(task)
+
+    # Update the rolling metrics and confidence intervals alongside the reports and tests
+    report_stratifications = report_stratifications_future.result()
+    tasks.append(update_rolling_metrics.submit(report_stratifications, config, timestamp))
+    tasks.append(compute_confidence_intervals.submit(report_stratifications, config, timestamp))
+    return cache, tasks
+
+
+@flow(name="Monitoring Flow", task_runner=ConcurrentTaskRunner())
+def monitoring_flow(profile: str = None):
+    """
+    Monitoring flow for the dashboard pipeline. The pipelines of the monitored models run concurrently, sharing the
+    MONITORING_WORKERS budget of concurrent reports and tests. Profile is a comma-separated list of the stages to run
+    under cProfile, e.g. "report.*,create_dashboard" or "all", by default the MONITORING_PROFILE environment variable.
+    """
+    warnings.simplefilter(action="ignore", category=FutureWarning)
+    warnings.simplefilter(action="ignore", category=UndefinedMetricWarning)
+    warnings.simplefilter(action="ignore", category=RuntimeWarning)
+    warnings.simplefilter(action="ignore", category=UserWarning)
+
+    timestamp = datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+    # the stages of each model are profiled into its snapshots
+    start_run(profile, lambda config: get_profile_dir(timestamp, config))
+    try:
+        configs = load_configurations()
+        details = [load_data_details(config) for config in configs]
+        etl_futures = [run_etl.submit(config) for config in configs]
+
+        models = []
+        for config, model_details, etl_future in zip(configs, details, etl_futures):
+            # a model whose ETL failed is skipped, the other models still run
+            try:
+                data, reference_data = etl_future.result()
+            except Exception as e:
+                logger.error(f"ETL failed for {config['model_config']['model_id']}: {e}")
+                continue
+            if data is None:
+                logger.info(f"No new data available for {config['model_config']['model_id']}.")
+                continue
+            matched_ids = data[config["columns"]["study_id"]].tolist()
+            models.append(
+                (config, matched_ids, *submit_model_tasks(data, reference_data, config, model_details, timestamp))
             )
-            task_list.append(task)
 
-    # Wait for all tasks to complete
-    for task in report_tasks + test_tasks:
-        task.result()
+        if not models:
+            logger.info("No new data available. Monitoring flow completed successfully with no updates.")
+            return
 
-    create_dashboard(config)
-    logger.info("Monitoring flow completed successfully.")
+        # Wait for all tasks of a model to complete before updating its dashboard
+        for config, matched_ids, cache, tasks in models:
+            for task in tasks:
+                task.result()
+            cache.log_stats()
+            store_run_values(config, timestamp)
+            complete_run(config, matched_ids, timestamp)
+            create_dashboard(config, timestamp)
+        logger.info("Monitoring flow completed successfully.")
+    finally:
+        finish_run(timestamp)
 
 
 if __name__ == "__main__":
@@ -11,6 +11,9 @@ prefect deployment build flow/main.py:monitoring_flow \
                       --skip-upload \
                       --apply
 
+# Start the flow when enough matched rows are waiting
+python -m flow.trigger &
+
 # Start the agent
 prefect agent start -q 'monitoring-pool' --limit 1
 
@@ -0,0 +1,124 @@
+"""
+Event-driven trigger of the monitoring flow. The ingestion API counts the uploaded rows that complete a result and
+label pair; this loop polls the count and starts a run of the monitoring flow deployment once the thresholds of the
+config's trigger section are reached, so runs follow new labels instead of a blind schedule. The matches claimed by a
+run that fails are pending again on the next poll.
+
+Usage:
+    python -m flow.trigger [--once]
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+
+from prefect.client.orchestration import get_client
+from prefect.deployments import run_deployment
+from prefect.exceptions import ObjectNotFound
+
+from src.data_preprocessing.fetch_data import get_db_connection
+from src.utils.config_manager import load_model_configs
+from src.utils.pending_matches import (
+    claim_pending_matches,
+    get_pending_matches,
+    get_trigger_settings,
+    list_claims,
+    record_claims,
+    release_claims,
+    should_trigger,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEPLOYMENT_NAME = "Monitoring Flow/monitoring-flow"
+
+
+async def read_flow_run_state(flow_run_id: str):
+    """
+    Read the state of a flow run from the Prefect API, or None if the run was deleted.
+    """
+    async with get_client() as client:
+        try:
+            return (await client.read_flow_run(flow_run_id)).state
+        except ObjectNotFound:
+            return None
+
+
+def settle_claims(db) -> None:
+    """
+    Release the claims of the flow runs that finished since the last poll. The matches of a run that didn't complete,
+    or was deleted, are pending again.
+    """
+    for claim in list_claims(db):
+        state = asyncio.run(read_flow_run_state(claim["_id"]))
+        if state is not None and not state.is_final():
+            continue
+        failed = state is None or not state.is_completed()
+        release_claims(db, claim, failed)
+        if failed:
+            logger.warning(f"Flow run {claim['_id']} did not complete, its matches are pending again")
+
+
+def check_and_trigger(db, configs: list) -> bool:
+    """
+    Start a run of the monitoring flow if the pending matches of a model reach the thresholds. As the run processes
+    every model, the pending matches of every model are claimed until the run finishes. Return whether a run was
+    started.
+    """
+    settle_claims(db)
+    now = datetime.now(timezone.utc)
+    pending = {
+        config["model_config"]["model_id"]: get_pending_matches(db, config["model_config"]["model_id"])
+        for config in configs
+    }
+    triggered = [
+        config["model_config"]["model_id"]
+        for config in configs
+        if should_trigger(pending[config["model_config"]["model_id"]], get_trigger_settings(config), now)
+    ]
+    if not triggered:
+        return False
+    # the run is only scheduled here, the agent runs one flow at a time
+    flow_run = run_deployment(DEPLOYMENT_NAME, timeout=0)
+    claimed = {
+        model_id: model_pending for model_id, model_pending in pending.items() if model_pending.get("count", 0) > 0
+    }
+    # recorded before the counts are claimed, so that a failed run gives them back even if the trigger restarts
+    record_claims(db, str(flow_run.id), claimed)
+    for model_id, model_pending in claimed.items():
+        claim_pending_matches(db, model_id, model_pending["count"])
+    logger.info(f"Started flow run {flow_run.name} for the pending matches of {', '.join(triggered)}")
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the monitoring flow when enough matched rows are waiting.")
+    parser.add_argument("--once", action="store_true", help="Check the pending matches once and exit.")
+    args = parser.parse_args()
+
+    configs = [config for config in load_model_configs() if get_trigger_settings(config)["enabled"]]
+    if not configs:
+        logger.info("The flow trigger is disabled in the config.")
+        return
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_URI environment variable is not set")
+    db = get_db_connection(mongo_uri)
+    poll_seconds = min(get_trigger_settings(config)["poll_seconds"] for config in configs)
+
+    while True:
+        try:
+            check_and_trigger(db, configs)
+        except Exception as e:
+            logger.error(f"Error checking the pending matches: {e}")
+        if args.once:
+            break
+        time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    main()
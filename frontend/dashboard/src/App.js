@@ -1,5 +1,5 @@
 import React, { useState, useEffect, lazy, Suspense } from 'react';
-import { BrowserRouter as Router, Route, Routes, Navigate } from 'react-router-dom';
+import { BrowserRouter as Router, Route, Routes, Navigate, useSearchParams } from 'react-router-dom';
 import { CircularProgress, Box } from '@mui/material';
 
 const FilterOverlay = lazy(() => import('./FilterOverlay'));
@@ -8,6 +8,9 @@ const DashboardComponent = lazy(() => import('./DashboardComponent'));
 const AppContent = () => {
   const [dashboardUrl, setDashboardUrl] = useState('');
   const [isLoading, setIsLoading] = useState(true);
+  // the view project of the filters applied in this tab, as returned by /apply_filters
+  const [searchParams] = useSearchParams();
+  const viewUrl = searchParams.get('view');
 
   const colors = {
     primary: '#02B3E6',
@@ -19,8 +22,14 @@ const AppContent = () => {
   const dashboard_url = process.env.REACT_APP_DASHBOARD_API_URL || 'http://localhost:5002';
 
 
-  // Fetch the initial dashboard URL when the component mounts
+  // Fetch the initial dashboard URL when the component mounts, unless the tab shows a filtered view
   useEffect(() => {
+    if (viewUrl) {
+      setDashboardUrl(viewUrl);
+      setIsLoading(false);
+      return;
+    }
+
     const fetchDashboardUrl = async () => {
       try {
         const response = await fetch(`${dashboard_url}/get_dashboard_url`);
@@ -38,7 +47,7 @@ const AppContent = () => {
     };
 
     fetchDashboardUrl();
-  }, []);
+  }, [viewUrl]);
 
   const handleApplyFilters = async (filters) => {
     setIsLoading(true);
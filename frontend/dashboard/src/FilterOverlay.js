@@ -46,10 +46,14 @@ const FilterOverlay = ({ onApplyFilters, colors }) => {
       headers: {
         'Content-Type': 'application/json',
       },
-      body: JSON.stringify(filters),
+      // the session id keeps this user's filters separate from other users' in the API
+      body: JSON.stringify({ ...filters, session_id: sessionStorage.getItem('sessionId') || undefined }),
     })
       .then(response => response.json())
       .then(data => {
+        if (data.session_id) {
+          sessionStorage.setItem('sessionId', data.session_id);
+        }
         if (data.filtered_url) {
           window.open(data.filtered_url, '_blank');
         }
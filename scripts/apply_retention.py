@@ -0,0 +1,41 @@
+"""
+Script for reporting and applying the snapshot retention policy from the config.
+
+Usage:
+    python -m scripts.apply_retention [--apply] [--model ID]
+
+Without --apply, only the dry-run report is printed. Applying it deletes the results of the batches of the removed
+runs, see the retention section of config/README.md.
+"""
+
+import argparse
+import logging
+
+from src.dashboard.retention import apply_retention
+from src.dashboard.workspace_manager import WorkspaceManager
+from src.utils.config_manager import get_model_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report or apply the snapshot retention policy.")
+    parser.add_argument("--apply", action="store_true", help="Remove the superseded runs instead of a dry run.")
+    parser.add_argument("--model", help="Model ID to apply the policy to, required if several models are monitored.")
+    args = parser.parse_args()
+
+    config = get_model_config(args.model)
+    workspace = WorkspaceManager.get_instance().get_workspace()
+    projects = workspace.search_project(config["info"]["project_name"])
+    project = projects[0] if projects else None
+    report = apply_retention(config, workspace, project, dry_run=not args.apply)
+
+    print(f"{'Would remove' if not args.apply else 'Removed'} {len(report['runs_removed'])} runs:")
+    for run in report["runs_removed"]:
+        print(f"  {run}")
+    print(f"Kept {len(report['runs_kept'])} runs, freed {report['bytes_removed'] / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
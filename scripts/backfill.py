@@ -0,0 +1,245 @@
+"""
+Script for backfilling the history of the dashboard, e.g. after the tests config changed or a metric was added. The
+matched data is read from the database (or a CSV file), sliced into time windows by the configured timestamp column,
+and the reports and tests of every window are generated in a process pool. Each window is written as a run stamped
+with the start of the window, so the dashboard shows the history as a series of runs.
+
+Usage:
+    python -m scripts.backfill [--freq 1D] [--from 2024-01-01] [--to 2025-01-01] [--workers 8] [--input FILE] [--force]
+        [--model ID] [--force-legacy]
+
+Windows whose run directory already exists are skipped unless --force is given, so an interrupted backfill can be
+resumed. The runs whose rows all lie in the backfilled period, e.g. the flow runs over the same rows, are replaced by
+the backfilled windows, so no row is shown twice. Runs from before the time ranges were recorded are only removed with
+--force-legacy, by their run time. Failed tests are not emailed. With retention enabled, backfilled runs are thinned
+like any other run.
+"""
+
+import argparse
+import logging
+import multiprocessing
+import os
+import shutil
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from scripts.data_details import get_details_path, load_details
+from src.dashboard.create_project import create_or_update, get_snapshots_dir, load_run_range, save_run_range
+from src.dashboard.retention import parse_run_timestamp
+from src.dashboard.rebuild import get_workers
+from src.dashboard.workspace_manager import WorkspaceManager
+from src.data_preprocessing.etl import reference_load_and_validate
+from src.data_preprocessing.fetch_data import fetch_matched_range, get_timestamp_col
+from src.monitoring.metrics import generate_report
+from src.monitoring.stratify import DataSplitter
+from src.monitoring.tests import generate_tests
+from src.utils.config_manager import get_model_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+DEFAULT_FREQ = "1D"
+
+
+def load_input_data(file_path: str, config: dict, start: str = None, end: str = None) -> pd.DataFrame:
+    """
+    Load matched data from a CSV file, between start (inclusive) and end (exclusive).
+    """
+    timestamp_col = get_timestamp_col(config)
+    data = pd.read_csv(file_path, parse_dates=[timestamp_col])
+    if start:
+        data = data[data[timestamp_col] >= pd.Timestamp(start)]
+    if end:
+        data = data[data[timestamp_col] < pd.Timestamp(end)]
+    return data
+
+
+def get_windows(data: pd.DataFrame, config: dict, freq: str = DEFAULT_FREQ, min_rows: int = 1) -> list:
+    """
+    Slice the data into windows of the given pandas frequency. Return the (timestamp, data) of every window with at
+    least min_rows rows, in time order, stamped with the start of the window.
+    """
+    timestamp_col = get_timestamp_col(config)
+    timestamps = pd.to_datetime(data[timestamp_col])
+    windows = []
+    for start, window in data.groupby(timestamps.dt.floor(freq), sort=True):
+        if len(window) >= min_rows:
+            windows.append((start.strftime(TIMESTAMP_FORMAT), window.reset_index(drop=True)))
+    return windows
+
+
+def backfill_window(timestamp: str, data: pd.DataFrame, reference_data: pd.DataFrame, config: dict, details: dict):
+    """
+    Generate the reports and tests of every stratum of a window. Return the timestamp, the number of strata and the
+    time it took.
+    """
+    warnings.simplefilter(action="ignore")
+    start = time.perf_counter()
+    timestamps = data[get_timestamp_col(config)]
+    save_run_range(get_snapshots_dir(config), timestamp, timestamps.min(), timestamps.max())
+    model_type = config["model_config"]["model_type"]
+    report_stratifications = DataSplitter().split_data(data, config, details, "report")
+    for key, data_stratification in report_stratifications.items():
+        generate_report(
+            data_stratification,
+            reference_data,
+            config,
+            model_type,
+            folder_path=f"/reports/{key}",
+            timestamp=timestamp,
+            details=details,
+        )
+    test_stratifications = DataSplitter().split_data(data, config, details, "test")
+    for key, data_stratification in test_stratifications.items():
+        generate_tests(
+            data_stratification,
+            reference_data,
+            config,
+            model_type,
+            folder_path=f"/tests/{key}",
+            timestamp=timestamp,
+            details=details,
+            alerts=False,
+        )
+    return timestamp, len(report_stratifications) + len(test_stratifications), time.perf_counter() - start
+
+
+def run_backfill(
+    windows: list, reference_data: pd.DataFrame, config: dict, details: dict, workers: int = None, force: bool = False
+) -> list:
+    """
+    Backfill the windows in a pool of worker processes. Return the timestamps of the backfilled windows.
+    """
+    snapshots_dir = get_snapshots_dir(config)
+    if not force:
+        skipped = [timestamp for timestamp, _ in windows if os.path.exists(os.path.join(snapshots_dir, timestamp))]
+        if skipped:
+            logger.info(f"Skipping {len(skipped)} windows that already have a run, use --force to redo them.")
+        windows = [(timestamp, data) for timestamp, data in windows if timestamp not in skipped]
+    if not windows:
+        return []
+
+    workers = min(get_workers(workers), len(windows))
+    logger.info(f"Backfilling {len(windows)} windows with {workers} worker processes.")
+    start = time.perf_counter()
+    done = []
+    # spawn rather than fork, so the workers don't inherit the locks of the parent's threads
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        futures = {
+            executor.submit(backfill_window, timestamp, data, reference_data, config, details): timestamp
+            for timestamp, data in windows
+        }
+        for future in as_completed(futures):
+            try:
+                timestamp, n_strata, duration = future.result()
+            except Exception as e:
+                logger.error(f"Error backfilling the window {futures[future]}: {e}")
+                continue
+            done.append(timestamp)
+            elapsed = time.perf_counter() - start
+            logger.info(
+                f"Backfilled {timestamp} ({n_strata} strata, {duration:.1f}s): {len(done)}/{len(windows)} windows in "
+                f"{elapsed:.0f}s"
+            )
+    return sorted(done)
+
+
+def remove_replaced_runs(windows: list, done: list, config: dict, force_legacy: bool = False) -> list:
+    """
+    Remove the runs whose rows all lie between the first and the last row of the backfilled windows, such as the flow
+    runs over the same rows or the windows of an earlier backfill with another frequency. Older runs without a
+    recorded time range are kept, since their run time doesn't tell which rows they hold, unless force_legacy is set:
+    then those whose run time lies in the backfilled period are removed. Their snapshots leave the workspace when the
+    project is updated. Return the removed runs.
+    """
+    timestamp_col = get_timestamp_col(config)
+    backfilled = [data[timestamp_col] for timestamp, data in windows if timestamp in done]
+    if not backfilled:
+        return []
+    start = min(timestamps.min() for timestamps in backfilled)
+    end = max(timestamps.max() for timestamps in backfilled)
+
+    snapshots_dir = get_snapshots_dir(config)
+    windows = {timestamp for timestamp, _ in windows}
+    removed, legacy = [], []
+    for run in sorted(os.listdir(snapshots_dir)):
+        if run.startswith(".") or run in windows:
+            continue
+        run_range = load_run_range(snapshots_dir, run)
+        if run_range is None:
+            run_time = parse_run_timestamp(run)
+            if run_time is None:
+                continue
+            if not force_legacy:
+                if start <= pd.Timestamp(run_time) <= end:
+                    legacy.append(run)
+                continue
+            run_range = (run_time, run_time)
+        run_start, run_end = pd.Timestamp(run_range[0]), pd.Timestamp(run_range[1])
+        if start <= run_start and run_end <= end:
+            shutil.rmtree(os.path.join(snapshots_dir, run), ignore_errors=True)
+            removed.append(run)
+        elif run_start <= end and start <= run_end:
+            logger.warning(f"The run {run} is only partly covered by the backfill and is kept.")
+    if removed:
+        logger.info(f"Removed {len(removed)} runs replaced by the backfill: {removed}")
+    if legacy:
+        logger.warning(
+            f"Kept {len(legacy)} runs in the backfilled period without a recorded time range, their rows may be shown "
+            f"twice. Use --force-legacy to remove them: {legacy}"
+        )
+    return removed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backfill the reports and tests of historical time windows.")
+    parser.add_argument("--freq", default=DEFAULT_FREQ, help="Window length, as a pandas frequency, e.g. 1D or 7D.")
+    parser.add_argument("--from", dest="start", help="Start of the backfilled period (inclusive).")
+    parser.add_argument("--to", dest="end", help="End of the backfilled period (exclusive).")
+    parser.add_argument("--min-rows", type=int, default=1, help="Skip windows with fewer rows.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes, defaults to the number of CPUs.")
+    parser.add_argument("--input", help="CSV file of matched data to backfill instead of the database.")
+    parser.add_argument("--force", action="store_true", help="Redo the windows that already have a run.")
+    parser.add_argument("--model", help="Model ID to backfill, required if several models are monitored.")
+    parser.add_argument(
+        "--force-legacy",
+        action="store_true",
+        help="Also remove the runs without a recorded time range whose run time lies in the backfilled period.",
+    )
+    args = parser.parse_args()
+
+    config = get_model_config(args.model)
+    details = load_details(get_details_path(config))
+    if args.input:
+        data = load_input_data(args.input, config, args.start, args.end)
+    else:
+        data = fetch_matched_range(config, args.start, args.end)
+    if data.empty:
+        logger.info("No matched data in the backfilled period.")
+        return
+
+    windows = get_windows(data, config, args.freq, args.min_rows)
+    if not windows:
+        logger.info(f"No window has {args.min_rows} rows or more.")
+        return
+    # as in the flow, the first window becomes the reference if there is none yet
+    reference_data = reference_load_and_validate(config, windows[0][1])
+    done = run_backfill(windows, reference_data, config, details, args.workers, args.force)
+    if not done:
+        return
+    remove_replaced_runs(windows, done, config, args.force_legacy)
+
+    workspace_instance = WorkspaceManager.get_instance()
+    with workspace_instance.write_lock():
+        create_or_update(workspace_instance.get_workspace(), config)
+        workspace_instance.mark_changed()
+    logger.info(f"Backfilled {len(done)} windows from {done[0]} to {done[-1]}.")
+
+
+if __name__ == "__main__":
+    main()
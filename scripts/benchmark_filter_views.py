@@ -0,0 +1,100 @@
+"""
+Script for benchmarking the latency of filter changes on the dashboard. The first request for a filter set creates its
+view project, with the panels built from the compiled dashboard template or taken prebuilt from the panel cache; later
+requests only look up the view. Every pass creates the views in a new temporary workspace.
+
+Usage:
+    python -m scripts.benchmark_filter_views [--repeat 20] [--all-panels] [--model ID]
+
+With --all-panels, the config lists every panel and test of the mappings, the worst case of a full dashboard.
+"""
+
+import argparse
+import logging
+import tempfile
+import time
+
+import numpy as np
+from evidently.ui.workspace import Workspace
+
+from src.dashboard import create_project
+from src.dashboard.create_project import build_panels, load_json
+from src.dashboard.filter_views import create_view, get_view_id
+from src.utils.config_manager import get_model_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TAG_SETS = [["male", "single"], ["female", "single"], ["hospital1", "male"], ["[65+]", "single"]]
+
+
+def use_all_panels(config: dict) -> dict:
+    """
+    List every panel and test of the mappings in the config.
+    """
+    test_mapping = load_json("src/utils/tests_map.json")
+    tests = {f"{group}_tests": [{"name": name} for name in names] for group, names in test_mapping.items()}
+    panels = [{"name": name} for name in load_json("src/utils/panels_map.json")]
+    return {**config, "tests": tests, "dashboard_panels": panels}
+
+
+def time_filter_changes(config: dict, get_panels, repeat: int) -> tuple:
+    """
+    Time the creation of the view of every filter set with the panels returned by get_panels(tags), and the lookups of
+    the created views. Return the latencies of both.
+    """
+    created, looked_up = [], []
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as workspace_dir:
+            workspace = Workspace.create(workspace_dir)
+            workspace.create_project(config["info"]["project_name"])
+            for tags in TAG_SETS:
+                start = time.perf_counter()
+                create_view(workspace, config, tuple(tags), get_panels(tags))
+                created.append(time.perf_counter() - start)
+            for tags in TAG_SETS:
+                start = time.perf_counter()
+                get_view_id(workspace, config, tuple(tags))
+                looked_up.append(time.perf_counter() - start)
+    return np.array(created), np.array(looked_up)
+
+
+def print_latencies(name: str, latencies: np.ndarray) -> None:
+    """
+    Print the percentiles of latencies given in seconds.
+    """
+    latencies = latencies * 1000
+    print(
+        f"{name:>30}: p50 {np.percentile(latencies, 50):.2f} ms, p95 {np.percentile(latencies, 95):.2f} ms, "
+        f"mean {latencies.mean():.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark filter changes through the dashboard view projects.")
+    parser.add_argument("--repeat", type=int, default=20, help="Number of passes over the filter sets.")
+    parser.add_argument("--all-panels", action="store_true", help="Use every panel and test of the mappings.")
+    parser.add_argument("--model", help="Model ID to benchmark, required if several models are monitored.")
+    args = parser.parse_args()
+    # the panel functions log the filters, and the missing fact card, on every build
+    logging.disable(logging.WARNING)
+
+    config = get_model_config(args.model)
+    if args.all_panels:
+        config = use_all_panels(config)
+
+    create_project._templates.clear()
+    cached = {tuple(tags): build_panels(config, tags) for tags in TAG_SETS}
+    variants = {
+        "compiled template": lambda tags: build_panels(config, tags),
+        "panel cache": lambda tags: cached[tuple(tags)],
+    }
+    print(f"{len(cached[tuple(TAG_SETS[0])])} panels, {len(TAG_SETS) * args.repeat} filter changes per variant")
+    for name, get_panels in variants.items():
+        created, looked_up = time_filter_changes(config, get_panels, args.repeat)
+        print_latencies(f"new view, {name}", created)
+        print_latencies(f"known view, {name}", looked_up)
+
+
+if __name__ == "__main__":
+    main()
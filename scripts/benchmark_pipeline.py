@@ -0,0 +1,204 @@
+"""
+Script for benchmarking the monitoring pipeline end to end on synthetic data: deduplication and merge, validation,
+dtype compaction, stratification, metric reports, test suites and dashboard registration, at several row counts. The timings of every
+stage are saved with the current commit, so runs can be compared across commits.
+
+Usage:
+    python -m scripts.benchmark_pipeline [--rows 10000,100000,1000000] [--strata main] [--baseline FILE]
+
+The reports and tests of the benchmark are written to the snapshots directory under a dedicated run, which is removed
+afterwards, so run it outside of the Docker containers of a live deployment.
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+from datetime import datetime
+from unittest.mock import patch
+
+from evidently.ui.workspace import Workspace
+
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+from src.dashboard.create_project import iter_snapshot_files
+from src.dashboard.rebuild import register_snapshots
+from src.data_preprocessing.dtypes import get_memory_mb, normalize_dtypes
+from src.data_preprocessing.validate import validate_data
+from src.monitoring.instrumentation import format_summary, get_records, stage, start_run
+from src.monitoring.metrics import generate_report
+from src.monitoring.stratify import DataSplitter
+from src.monitoring.tests import generate_tests
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_ROWS = "10000,100000,1000000"
+STAGES = ["merge", "validate", "dtypes", "stratify", "metrics", "tests", "register"]
+REFERENCE_ROWS = 10000
+# a run timestamp that can't be mistaken for a real run
+BENCHMARK_TIMESTAMP = "2000-01-01T00:00:00"
+
+
+def get_commit() -> str:
+    """
+    Get the current commit, with a suffix if the working tree has changes.
+    """
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+        status = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True
+        )
+        return commit.stdout.strip() + ("-dirty" if status.stdout.strip() else "")
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def get_snapshots_root() -> str:
+    """
+    Get the snapshots directory the reports and tests are written to.
+    """
+    return "/app/snapshots" if os.path.exists("/app") else "snapshots"
+
+
+def run_benchmark(n_rows: int, stages: list, strata: str, drift: float, seed: int) -> list:
+    """
+    Run the stages of the pipeline on n_rows synthetic rows and return the stage records.
+    """
+    start_run()
+    config = generate_config()
+    model_type = config["model_config"]["model_type"]
+    with stage("generate") as record:
+        results, labels = generate_data(config, n_rows, duplicate_rate=0.01, drift=drift, seed=seed)
+        reference_results, reference_labels = generate_data(config, min(n_rows, REFERENCE_ROWS), seed=seed + 1)
+        record["rows"] = len(results) + len(labels)
+
+    with stage("merge", rows=len(results) + len(labels)):
+        data = merge_results_and_labels(results, labels, config)
+        reference_data = merge_results_and_labels(reference_results, reference_labels, config)
+    details = generate_details(data, config)
+
+    if "validate" in stages:
+        with stage("validate", rows=len(data)):
+            validate_data(data, config)
+
+    if "dtypes" in stages:
+        with stage("dtypes", rows=len(data) + len(reference_data)) as record:
+            record["memory_before_mb"] = get_memory_mb(data) + get_memory_mb(reference_data)
+            data, reference_data = normalize_dtypes(data, reference_data, config, details)
+            record["memory_after_mb"] = get_memory_mb(data) + get_memory_mb(reference_data)
+
+    with stage("stratify", rows=len(data)) as record:
+        stratifications = DataSplitter().split_data(data, config, details, "report")
+        record["strata"] = len(stratifications)
+    if strata == "main":
+        stratifications = {"main_report": stratifications["main_report"]}
+
+    snapshots_root = get_snapshots_root()
+    created_root = not os.path.exists(snapshots_root)
+    run_dir = os.path.join(snapshots_root, BENCHMARK_TIMESTAMP)
+    try:
+        # failed tests of the synthetic data must not send email alerts
+        with patch("src.monitoring.alerts.send_email_alert"):
+            for key, data_stratification in stratifications.items():
+                if "metrics" in stages:
+                    with stage(f"metrics.{key}", rows=len(data_stratification)):
+                        generate_report(
+                            data_stratification,
+                            reference_data,
+                            config,
+                            model_type,
+                            f"/reports/{key}",
+                            BENCHMARK_TIMESTAMP,
+                            details,
+                        )
+                if "tests" in stages:
+                    test_key = key.replace("_report", "_test")
+                    with stage(f"tests.{test_key}", rows=len(data_stratification)):
+                        generate_tests(
+                            data_stratification,
+                            reference_data,
+                            config,
+                            model_type,
+                            f"/tests/{test_key}",
+                            BENCHMARK_TIMESTAMP,
+                            details,
+                        )
+
+        if "register" in stages and os.path.exists(run_dir):
+            pending = [
+                (relative_path, full_path)
+                for relative_path, full_path in iter_snapshot_files(snapshots_root)
+                if relative_path.startswith(BENCHMARK_TIMESTAMP)
+            ]
+            with tempfile.TemporaryDirectory() as workspace_dir, stage("register", rows=len(pending)):
+                workspace = Workspace.create(workspace_dir)
+                project = workspace.create_project(config["info"]["project_name"])
+                for _ in register_snapshots(project, workspace, pending):
+                    pass
+    finally:
+        shutil.rmtree(snapshots_root if created_root else run_dir, ignore_errors=True)
+    return get_records()
+
+
+def compare(results: dict, baseline: dict) -> None:
+    """
+    Print the wall time of every stage against the baseline run.
+    """
+    print(f"\nAgainst {baseline['commit']}:")
+    for n_rows, records in results.items():
+        baseline_records = {record["stage"]: record for record in baseline["results"].get(n_rows, [])}
+        for record in records:
+            previous = baseline_records.get(record["stage"])
+            if previous and previous["wall_time"] > 0:
+                ratio = record["wall_time"] / previous["wall_time"]
+                print(
+                    f"{n_rows:>9} {record['stage'][:40]:<40} {previous['wall_time']:>9.2f}s -> "
+                    f"{record['wall_time']:>9.2f}s ({ratio:.2f}x)"
+                )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the monitoring pipeline on synthetic data.")
+    parser.add_argument("--rows", default=DEFAULT_ROWS, help="Comma-separated row counts.")
+    parser.add_argument("--stages", default=",".join(STAGES), help="Comma-separated stages to run.")
+    parser.add_argument("--strata", choices=["main", "all"], default="main", help="Run the reports for all strata.")
+    parser.add_argument("--drift", type=float, default=0.3, help="Drift injected in the current data.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--output-dir", default="data/benchmarks", help="Directory of the timing files.")
+    parser.add_argument("--baseline", help="Timing file of a previous run to compare with.")
+    args = parser.parse_args()
+
+    stages = args.stages.split(",")
+    commit = get_commit()
+    results = {}
+    for n_rows in [int(rows) for rows in args.rows.split(",")]:
+        logger.info(f"Benchmarking {n_rows} rows...")
+        records = run_benchmark(n_rows, stages, args.strata, args.drift, args.seed)
+        results[str(n_rows)] = records
+        print(f"\n{n_rows} rows:\n{format_summary(records)}")
+        for record in records:
+            if record["stage"] == "dtypes":
+                print(
+                    f"Memory of the current and reference data: {record['memory_before_mb']:.1f} MB -> "
+                    f"{record['memory_after_mb']:.1f} MB"
+                )
+
+    timestamp = datetime.now().strftime("%Y-%m-%dT%H-%M-%S")
+    os.makedirs(args.output_dir, exist_ok=True)
+    output_path = os.path.join(args.output_dir, f"{timestamp}_{commit}.json")
+    with open(output_path, "w") as file:
+        json.dump(
+            {"commit": commit, "timestamp": timestamp, "strata": args.strata, "results": results}, file, indent=2
+        )
+    logger.info(f"Saved the timings to {output_path}")
+
+    if args.baseline:
+        with open(args.baseline, "r") as file:
+            compare(results, json.load(file))
+
+
+if __name__ == "__main__":
+    main()
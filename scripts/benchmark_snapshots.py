@@ -0,0 +1,157 @@
+"""
+Script for benchmarking the snapshot formats: write time, read time and on-disk size of Evidently's pretty JSON against
+compact orjson with and without compression.
+
+Usage:
+    python -m scripts.benchmark_snapshots [--snapshots-dir snapshots] [--limit 200] [--repeat 3]
+
+Without a snapshots directory, the benchmark runs on a report generated from synthetic data.
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from evidently.utils import NumpyEncoder
+
+from src.monitoring.snapshots import (
+    EXTENSIONS,
+    is_snapshot_file,
+    read_snapshot_data,
+    write_snapshot_data,
+    zstandard,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def load_snapshots(snapshots_dir: str, limit: int) -> list:
+    """
+    Load up to limit existing snapshots as dictionaries.
+    """
+    snapshots = []
+    for root, dirs, files in os.walk(snapshots_dir):
+        dirs[:] = [directory for directory in dirs if not directory.startswith(".")]
+        for file_name in sorted(files):
+            if is_snapshot_file(file_name):
+                snapshots.append(read_snapshot_data(os.path.join(root, file_name)))
+                if len(snapshots) >= limit:
+                    return snapshots
+    return snapshots
+
+
+def generate_snapshot() -> dict:
+    """
+    Generate a data quality and regression report on synthetic data.
+    """
+    from evidently.report import Report
+    from evidently.metric_preset import DataDriftPreset, DataQualityPreset, RegressionPreset
+
+    rng = np.random.default_rng(0)
+    n = 5000
+    reference = pd.DataFrame(
+        {
+            "age": rng.normal(60, 15, n),
+            "sex": rng.choice(["M", "F"], n),
+            "hospital": rng.choice(["hospital1", "hospital2", "hospital3"], n),
+            "target": rng.normal(60, 15, n),
+            "prediction": rng.normal(60, 15, n),
+        }
+    )
+    current = reference.sample(frac=1, random_state=1).reset_index(drop=True)
+    current.loc[: n // 10, "age"] = np.nan
+    report = Report(metrics=[DataQualityPreset(), DataDriftPreset(), RegressionPreset()])
+    report.run(reference_data=reference, current_data=current)
+    return report._get_snapshot().dict()
+
+
+def write_evidently(snapshot_data: dict, output_path: str) -> str:
+    """
+    Write a snapshot the way Evidently's save does.
+    """
+    with open(output_path, "w") as file:
+        json.dump(snapshot_data, file, indent=2, cls=NumpyEncoder)
+    return output_path
+
+
+def read_evidently(file_path: str) -> dict:
+    """
+    Read a snapshot the way log_snapshots used to.
+    """
+    with open(file_path, "r") as file:
+        return json.load(file)
+
+
+def benchmark(snapshots: list, repeat: int) -> list:
+    """
+    Time writing and reading every snapshot in each format and measure the total size on disk.
+    """
+    formats = {"evidently json": (write_evidently, read_evidently)}
+    for compression in EXTENSIONS:
+        if compression == "zstd" and zstandard is None:
+            logger.warning("zstandard is not installed, skipping the zstd format.")
+            continue
+        formats[f"orjson {compression}"] = (
+            lambda data, path, compression=compression: write_snapshot_data(data, path, compression),
+            read_snapshot_data,
+        )
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, (write, read) in formats.items():
+            write_times, read_times = [], []
+            for _ in range(repeat):
+                paths = []
+                start = time.perf_counter()
+                for i, snapshot_data in enumerate(snapshots):
+                    paths.append(write(snapshot_data, os.path.join(tmp_dir, f"snapshot_{i}.json")))
+                write_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                for path in paths:
+                    read(path)
+                read_times.append(time.perf_counter() - start)
+
+            size = sum(os.path.getsize(path) for path in paths)
+            for path in paths:
+                os.remove(path)
+            results.append(
+                {"format": name, "write_s": min(write_times), "read_s": min(read_times), "size_bytes": size}
+            )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the snapshot formats.")
+    parser.add_argument("--snapshots-dir", help="Directory of existing snapshots to benchmark on.")
+    parser.add_argument("--limit", type=int, default=200, help="Maximum number of snapshots to load.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of repetitions, the fastest is reported.")
+    args = parser.parse_args()
+
+    if args.snapshots_dir:
+        snapshots = load_snapshots(args.snapshots_dir, args.limit)
+    else:
+        snapshots = [generate_snapshot()]
+    if not snapshots:
+        logger.error("No snapshots to benchmark.")
+        return
+
+    results = benchmark(snapshots, args.repeat)
+    baseline = results[0]
+    print(f"{len(snapshots)} snapshot(s), best of {args.repeat}")
+    print(f"{'format':<16} {'write (s)':>10} {'read (s)':>10} {'size (MB)':>10} {'size ratio':>11}")
+    for result in results:
+        print(
+            f"{result['format']:<16} {result['write_s']:>10.3f} {result['read_s']:>10.3f} "
+            f"{result['size_bytes'] / 1e6:>10.2f} {result['size_bytes'] / baseline['size_bytes']:>11.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
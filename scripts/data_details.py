@@ -7,12 +7,23 @@ import os
 import pandas as pd
 import json
 
+from src.utils.config_manager import get_data_dir
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 DETAILS_FILE_PATH = "src/utils/details.json"
 
 
+def get_details_path(config: dict = None) -> str:
+    """
+    Get the details file of the model of the config. A model with a namespace keeps it in its data directory.
+    """
+    if not (config or {}).get("namespace"):
+        return DETAILS_FILE_PATH
+    return os.path.join(get_data_dir(config), "details.json")
+
+
 def load_details(file_path=DETAILS_FILE_PATH) -> dict:
     """
     Load the details JSON file. If the file doesn't exist, create it with a default structure.
@@ -27,6 +38,7 @@ def load_details(file_path=DETAILS_FILE_PATH) -> dict:
     }
 
     if not os.path.exists(file_path):
+        os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
         with open(file_path, "w") as file:
             json.dump(default_content, file, indent=2)
             logger.info(f"Created new details file at {file_path}")
@@ -60,7 +72,6 @@ def update_details(data: pd.DataFrame, config: dict, details: dict) -> dict:
     return details
 
 
-
 def update_unique_values(data: pd.DataFrame, config: dict, details: dict) -> None:
     """
     Update the unique values for the categorical columns in the details dictionary.
@@ -0,0 +1,86 @@
+"""
+Script for load testing the filter changes of a running dashboard API with concurrent clients. Every client applies
+random filters in its own session and checks that the API returns its own filters, before and after the others' changes.
+
+Usage:
+    python -m scripts.load_test_dashboard [--url http://localhost:5002] [--clients 50] [--requests 10]
+"""
+
+import argparse
+import logging
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+from src.dashboard.panel_cache import normalize_tags
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_filter_choices(url: str) -> list:
+    """
+    Get the single-value filter choices from the filter options of the API.
+    """
+    options = requests.get(f"{url}/get_filter_options", timeout=30).json()
+    return [{}] + [{"filter1": value} for values in options.values() for value in values]
+
+
+def run_client(url: str, choices: list, n_requests: int, seed: int) -> dict:
+    """
+    Apply random filters in one session and check the filters returned by the API.
+    """
+    rng = random.Random(seed)
+    session = requests.Session()
+    session_id = None
+    latencies = []
+    errors = 0
+    for _ in range(n_requests):
+        filters = dict(rng.choice(choices))
+        tags = list(filters.values()) + (["single"] if len(filters) == 1 else [])
+        if session_id:
+            filters["session_id"] = session_id
+        start = time.perf_counter()
+        response = session.post(f"{url}/apply_filters", json=filters, timeout=60)
+        latencies.append(time.perf_counter() - start)
+        data = response.json()
+        session_id = data.get("session_id", session_id)
+        if response.status_code != 200 or tuple(data.get("tags", [])) != normalize_tags(tags):
+            errors += 1
+
+    view = session.get(f"{url}/get_view", params={"session_id": session_id}, timeout=60).json()
+    if tuple(view.get("tags", [])) != normalize_tags(tags):
+        errors += 1
+    return {"latencies": latencies, "errors": errors}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dashboard API filter changes.")
+    parser.add_argument("--url", default="http://localhost:5002", help="URL of the dashboard API.")
+    parser.add_argument("--clients", type=int, default=50, help="Number of concurrent clients.")
+    parser.add_argument("--requests", type=int, default=10, help="Number of filter changes per client.")
+    args = parser.parse_args()
+
+    choices = get_filter_choices(args.url)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.clients) as executor:
+        results = list(
+            executor.map(lambda seed: run_client(args.url, choices, args.requests, seed), range(args.clients))
+        )
+    elapsed = time.perf_counter() - start
+
+    latencies = np.concatenate([result["latencies"] for result in results])
+    errors = sum(result["errors"] for result in results)
+    print(f"{len(latencies)} filter changes from {args.clients} clients in {elapsed:.1f}s")
+    print(
+        f"latency p50 {np.percentile(latencies, 50) * 1000:.0f} ms, p95 {np.percentile(latencies, 95) * 1000:.0f} ms, "
+        f"max {latencies.max() * 1000:.0f} ms"
+    )
+    print(f"incorrect responses: {errors}")
+
+
+if __name__ == "__main__":
+    main()
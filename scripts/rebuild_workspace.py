@@ -0,0 +1,55 @@
+"""
+Script for rebuilding the Evidently workspace from the snapshots directory, e.g. after the workspace volume was lost.
+
+Usage:
+    python -m scripts.rebuild_workspace [--workers 8] [--batch-size 50] [--force] [--model ID]
+
+With --force, every snapshot is registered again even if the manifest lists it.
+"""
+
+import argparse
+import logging
+import os
+
+from src.dashboard.create_project import (
+    MANIFEST_FILE_NAME,
+    create_or_update,
+    get_snapshots_dir,
+    log_snapshots,
+)
+from src.dashboard.rebuild import BATCH_SIZE
+from src.dashboard.workspace_manager import WorkspaceManager
+from src.utils.config_manager import get_model_config
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the Evidently workspace from the snapshots directory.")
+    parser.add_argument("--workers", type=int, help="Number of worker processes, defaults to the number of CPUs.")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Snapshots added between progress logs.")
+    parser.add_argument("--force", action="store_true", help="Register every snapshot again.")
+    parser.add_argument("--model", help="Model ID to rebuild, required if several models are monitored.")
+    args = parser.parse_args()
+
+    config = get_model_config(args.model)
+    workspace = WorkspaceManager.get_instance().get_workspace()
+    snapshots_dir = get_snapshots_dir(config)
+    if args.force:
+        manifest_path = os.path.join(snapshots_dir, MANIFEST_FILE_NAME)
+        if os.path.exists(manifest_path):
+            os.remove(manifest_path)
+
+    projects = workspace.search_project(config["info"]["project_name"])
+    if not projects:
+        # creating the project registers every snapshot
+        create_or_update(workspace, config)
+        return
+    log_snapshots(
+        projects[0], workspace, workers=args.workers, batch_size=args.batch_size, snapshots_dir=snapshots_dir
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+Script for generating deterministic synthetic hospital data: model results and labels in the layout of the ingestion
+API and config/schema.json, with a matching config. The generator controls the row count, the number of hospitals,
+instrument types and patient classes, the feature count, the label delay, the duplicate rate and injected drift.
+
+Usage:
+    python -m scripts.synthetic_data --rows 100000 [--hospitals 5] [--features 10] [--drift 0.5] [--output-dir data]
+
+The results, labels and config are written to synthetic_results.csv, synthetic_labels.csv and synthetic_config.json.
+"""
+
+import argparse
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from scripts.data_details import update_details
+from src.data_preprocessing.fetch_data import process_duplicates
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+START_DATE = "2024-08-01"
+PATIENT_CLASSES = ["inpatient", "outpatient", "emergency", "day_surgery", "observation"]
+# every CATEGORICAL_EVERY-th feature is categorical
+CATEGORICAL_EVERY = 4
+CATEGORIES = ["a", "b", "c", "d"]
+
+
+def generate_config(
+    n_features: int = 5,
+    instrument_type: bool = True,
+    patient_class: bool = True,
+    regression: bool = True,
+    classification: bool = True,
+) -> dict:
+    """
+    Generate a config whose columns match the generated data.
+    """
+    return {
+        "model_config": {
+            "model_id": "synthetic",
+            "model_type": {"regression": regression, "binary_classification": classification},
+        },
+        "columns": {
+            "study_id": "StudyID",
+            "sex": "sex",
+            "hospital": "hospital",
+            "age": "age",
+            "instrument_type": "instrument_type" if instrument_type else None,
+            "patient_class": "patient_class" if patient_class else None,
+            "predictions": {
+                "regression_prediction": "age_pred" if regression else None,
+                "classification_prediction": "class_pred" if classification else None,
+            },
+            "labels": {
+                "regression_label": "age_true" if regression else None,
+                "classification_label": "class_true" if classification else None,
+            },
+            "features": [f"feature_{i}" for i in range(1, n_features + 1)],
+            "timestamp": "timestamp",
+        },
+        "age_filtering": {"filter_type": "default", "custom_ranges": []},
+        "tests": {
+            "data_quality_tests": [{"name": "num_rows"}, {"name": "num_empty_rows"}],
+            "data_drift_tests": [{"name": "share_drifted_cols"}],
+            "regression_tests": [{"name": "mae"}, {"name": "rmse"}] if regression else [],
+            "classification_tests": [{"name": "accuracy"}, {"name": "f1"}] if classification else [],
+        },
+        "dashboard_panels": [{"name": "rmse"}, {"name": "accuracy"}, {"name": "share_drifted_cols"}],
+        "info": {
+            "project_name": "Synthetic Model",
+            "project_description": "Synthetic data benchmark",
+            "model_developer": "",
+            "contact_name": "",
+            "contact_email": "",
+            "references": [],
+            "disclaimer": "",
+            "fact_card": None,
+        },
+        "alerts": {"emails": []},
+    }
+
+
+def generate_data(
+    config: dict,
+    n_rows: int,
+    n_hospitals: int = 3,
+    n_instrument_types: int = 2,
+    n_patient_classes: int = 3,
+    label_delay_days: int = 0,
+    duplicate_rate: float = 0.0,
+    drift: float = 0.0,
+    n_days: int = 7,
+    seed: int = 0,
+) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Generate the results and labels of n_rows studies. A share duplicate_rate of the studies is sent twice, the
+    earlier copy with other values, as the ingestion deduplication keeps the latest. Drift shifts the feature and age
+    distributions and biases the predictions, in standard deviations.
+    """
+    rng = np.random.default_rng(seed)
+    columns = config["columns"]
+    model_type = config["model_config"]["model_type"]
+    timestamps = pd.Timestamp(START_DATE) + pd.to_timedelta(rng.integers(0, n_days * 86400, n_rows), unit="s")
+
+    results = pd.DataFrame(
+        {
+            columns["study_id"]: np.arange(1, n_rows + 1),
+            columns["sex"]: rng.choice(["F", "M"], n_rows),
+            columns["hospital"]: rng.choice([f"hospital{i}" for i in range(1, n_hospitals + 1)], n_rows),
+            columns["age"]: np.clip(rng.normal(50 + 10 * drift, 20, n_rows), 0, 100).round(1),
+        }
+    )
+    if columns["instrument_type"]:
+        results[columns["instrument_type"]] = rng.choice(
+            [f"instrument{i}" for i in range(1, n_instrument_types + 1)], n_rows
+        )
+    if columns["patient_class"]:
+        classes = (PATIENT_CLASSES * (n_patient_classes // len(PATIENT_CLASSES) + 1))[:n_patient_classes]
+        results[columns["patient_class"]] = rng.choice(classes, n_rows)
+
+    for i, feature in enumerate(columns["features"], start=1):
+        if i % CATEGORICAL_EVERY == 0:
+            # drift moves the categories towards the last one
+            weights = np.array([1.0, 1.0, 1.0, 1.0 + 3 * drift])
+            results[feature] = rng.choice(CATEGORIES, n_rows, p=weights / weights.sum())
+        else:
+            results[feature] = rng.normal(drift, 1, n_rows).round(4)
+
+    labels = pd.DataFrame({columns["study_id"]: results[columns["study_id"]]})
+    age = results[columns["age"]].to_numpy()
+    if model_type["regression"]:
+        # the model predicts the age, with an error biased by the drift
+        results[columns["predictions"]["regression_prediction"]] = (age + rng.normal(5 * drift, 5, n_rows)).round(1)
+        labels[columns["labels"]["regression_label"]] = age
+    if model_type["binary_classification"]:
+        positive = (age > 60).astype(int)
+        flip = rng.random(n_rows) < 0.1 + 0.2 * drift
+        results[columns["predictions"]["classification_prediction"]] = np.where(flip, 1 - positive, positive)
+        labels[columns["labels"]["classification_label"]] = positive
+
+    results[columns["timestamp"]] = timestamps
+    labels[columns["timestamp"]] = timestamps + pd.Timedelta(days=label_delay_days)
+
+    n_duplicates = int(n_rows * duplicate_rate)
+    if n_duplicates:
+        duplicates = results.sample(n_duplicates, random_state=seed).copy()
+        duplicates[columns["timestamp"]] -= pd.Timedelta(hours=1)
+        duplicates[columns["age"]] = np.clip(duplicates[columns["age"]] + rng.normal(0, 5, n_duplicates), 0, 100)
+        results = pd.concat([results, duplicates], ignore_index=True)
+
+    return results, labels
+
+
+def generate_details(data: pd.DataFrame, config: dict) -> dict:
+    """
+    Generate the data details of the generated data, as the ETL would store them.
+    """
+    details = {
+        "num_rows": 0,
+        "hospital_unique_values": [],
+        "sex_unique_values": [],
+        "instrument_type_unique_values": [],
+        "patient_class_unique_values": [],
+        "categorical_columns": [],
+    }
+    details = update_details(data, config, details)
+    # the unique values are collected in sets, sort them so the strata are deterministic
+    for key in ["hospital", "sex", "instrument_type", "patient_class"]:
+        details[f"{key}_unique_values"] = sorted(details[f"{key}_unique_values"])
+    return details
+
+
+def merge_results_and_labels(results: pd.DataFrame, labels: pd.DataFrame, config: dict) -> pd.DataFrame:
+    """
+    Deduplicate and merge the results and labels, as the ETL does with the collections of the database.
+    """
+    results = process_duplicates(results.copy(), config)
+    labels = process_duplicates(labels.copy(), config).drop(columns=[config["columns"]["timestamp"]])
+    return pd.merge(results, labels, on=config["columns"]["study_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic hospital data.")
+    parser.add_argument("--rows", type=int, default=10000, help="Number of studies.")
+    parser.add_argument("--hospitals", type=int, default=3, help="Number of hospitals.")
+    parser.add_argument("--instrument-types", type=int, default=2, help="Number of instrument types, 0 for none.")
+    parser.add_argument("--patient-classes", type=int, default=3, help="Number of patient classes, 0 for none.")
+    parser.add_argument("--features", type=int, default=5, help="Number of features.")
+    parser.add_argument("--label-delay", type=int, default=0, help="Days between a result and its label.")
+    parser.add_argument("--duplicate-rate", type=float, default=0.0, help="Share of studies sent twice.")
+    parser.add_argument("--drift", type=float, default=0.0, help="Injected drift, in standard deviations.")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed.")
+    parser.add_argument("--output-dir", default="data", help="Directory of the generated files.")
+    args = parser.parse_args()
+
+    config = generate_config(args.features, args.instrument_types > 0, args.patient_classes > 0)
+    results, labels = generate_data(
+        config,
+        args.rows,
+        n_hospitals=args.hospitals,
+        n_instrument_types=args.instrument_types,
+        n_patient_classes=args.patient_classes,
+        label_delay_days=args.label_delay,
+        duplicate_rate=args.duplicate_rate,
+        drift=args.drift,
+        seed=args.seed,
+    )
+    os.makedirs(args.output_dir, exist_ok=True)
+    results.to_csv(os.path.join(args.output_dir, "synthetic_results.csv"), index=False)
+    labels.to_csv(os.path.join(args.output_dir, "synthetic_labels.csv"), index=False)
+    with open(os.path.join(args.output_dir, "synthetic_config.json"), "w") as file:
+        json.dump(config, file, indent=2)
+    logger.info(f"Generated {len(results)} results and {len(labels)} labels in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
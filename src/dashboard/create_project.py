@@ -2,10 +2,21 @@
 This script creates a new Evidently AI project in the workspace.
 """
 
-from src.utils.config_manager import load_config
+from src.utils.config_manager import load_config, namespaced
+from src.monitoring.bootstrap import get_intervals_path, load_intervals
+from src.monitoring.cache import write_json_atomic
+from src.monitoring.snapshots import is_snapshot_file
+from src.dashboard.rebuild import BATCH_SIZE, register_snapshots
+from src.dashboard.fact_card import get_fact_card_url
+from src.dashboard.filter_views import sync_views
+import hashlib
 import json
 import logging
+import threading
+import uuid
+from collections import OrderedDict
 from evidently.ui.dashboards import (
+    DashboardConfig,
     DashboardPanelPlot,
     DashboardPanelCounter,
     PanelValue,
@@ -18,13 +29,24 @@ from evidently.ui.dashboards import (
 )
 from evidently.renderers.html_widgets import WidgetSize
 from evidently import metrics
-from evidently.suite.base_suite import Snapshot
 import os
-import base64
+import shutil
+from types import SimpleNamespace
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+MANIFEST_FILE_NAME = ".manifest.json"
+RUN_FILE_NAME = ".run.json"
+# stands for the filter tags in the tag filters of the compiled dashboard template
+TAG_PLACEHOLDER = "$tags"
+# one template per monitored model, plus the edited config of a model until the old one is evicted
+MAX_CACHED_TEMPLATES = 8
+
+# compiled dashboard templates by config hash, least recently used first
+_templates = OrderedDict()
+_templates_lock = threading.Lock()
+
 
 def load_json(file_path: str) -> dict:
     """
@@ -42,8 +64,6 @@ THP Colors:
     - Turquoise: #5AC3B3
 """
 
-MAX_URI_SIZE = 2 * 1024 * 1024
-
 
 def create_summary_panels(config: dict, tags: list, project) -> None:
     """
@@ -96,6 +116,13 @@ def create_summary_panels(config: dict, tags: list, project) -> None:
             size=WidgetSize.HALF,
         )
     )
+    project.dashboard.add_panel(create_filters_panel(tags))
+
+
+def create_filters_panel(tags: list) -> DashboardPanelCounter:
+    """
+    Create the panel showing the applied filters.
+    """
     if "single" in tags:
         filters = ", ".join([tag for tag in tags if tag != "single"])
     else:
@@ -117,14 +144,12 @@ def create_summary_panels(config: dict, tags: list, project) -> None:
         """
     )
 
-    project.dashboard.add_panel(
-        DashboardPanelCounter(
-            filter=ReportFilter(metadata_values={}, tag_values=[]),
-            agg=CounterAgg.NONE,
-            text="",
-            title=filters_text,
-            size=WidgetSize.FULL,
-        )
+    return DashboardPanelCounter(
+        filter=ReportFilter(metadata_values={}, tag_values=[]),
+        agg=CounterAgg.NONE,
+        text="",
+        title=filters_text,
+        size=WidgetSize.FULL,
     )
 
 
@@ -435,6 +460,49 @@ def create_test_panels(config: dict, tags: list, project) -> None:
     )
 
 
+def get_stratum_key(tags: list) -> str:
+    """
+    Get the stratum key (e.g. hospital1_male) from the dashboard filter tags.
+    """
+    strata_tags = [tag for tag in tags if tag != "single"]
+    return "_".join(sorted(strata_tags)) if strata_tags else "main"
+
+
+def create_interval_panel(config: dict, tags: list) -> DashboardPanelCounter:
+    """
+    Create the confidence interval panel, or None if the latest run has no intervals for the filtered stratum.
+    """
+    intervals = load_intervals(get_intervals_path(config)).get("strata", {}).get(get_stratum_key(tags))
+    if not intervals:
+        return None
+
+    confidence = config.get("bootstrap", {}).get("confidence", 0.95)
+    rows = "".join(
+        [
+            f"<tr><td>{metric.upper()}</td><td>{interval['value']:.3f}</td>"
+            f"<td>[{interval['lower']:.3f}, {interval['upper']:.3f}]</td><td>{interval['n']}</td></tr>"
+            for metric, interval in intervals.items()
+        ]
+    )
+    intervals_table = f"""
+    <div style='background-color: #f0f8ff; padding: 13px; border-radius: 5px;'>
+        <h4 style='color: #02B3E6;'> Latest Metrics with {confidence:.0%} Confidence Intervals</h4>
+        <table style='width: 100%; text-align: center; font-size: 16px; color: #00599D;'>
+            <tr><th>Metric</th><th>Value</th><th>Confidence Interval</th><th>Rows</th></tr>
+            {rows}
+        </table>
+    </div>
+    """
+
+    return DashboardPanelCounter(
+        filter=ReportFilter(metadata_values={}, tag_values=[]),
+        agg=CounterAgg.NONE,
+        text="",
+        title=intervals_table,
+        size=WidgetSize.FULL,
+    )
+
+
 def create_bottom_panels(config: dict, tags: list, project) -> None:
     """
     Create the bottom panels for the dashboard.
@@ -463,25 +531,6 @@ def create_bottom_panels(config: dict, tags: list, project) -> None:
         )
     )
 
-    def image_to_data_uri(file_path):
-        """
-        Convert an image to a data URI.
-        """
-        with open(file_path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode("utf-8")
-            file_extension = os.path.splitext(file_path)[1].lower()
-            mime_type = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}.get(
-                file_extension, "application/octet-stream"
-            )
-            data_uri = f"data:{mime_type};base64,{encoded_string}"
-
-            if len(data_uri) > MAX_URI_SIZE:
-                raise ValueError(
-                    f"Data URI size ({len(data_uri)} bytes) exceeds the maximum allowed size ({MAX_URI_SIZE} bytes)"
-                )
-
-        return data_uri
-
     disclaimer = config["info"]["disclaimer"]
     disclaimer_text = f"""
     <div style='background-color: #f0f8ff; padding: 1px; border-radius: 5px;'>
@@ -490,26 +539,16 @@ def create_bottom_panels(config: dict, tags: list, project) -> None:
     """
 
     if config["info"]["fact_card"]:
-        # Check if the file exists in the public folder
-        full_path = os.path.join("/app/frontend/dashboard/public/images/", config["info"]["fact_card"])
-        if os.path.exists(full_path):
-            # Check if the image is jpg, jpeg, or png
-            if full_path.lower().endswith((".jpg", ".jpeg", ".png")):
-                try:
-                    data_uri = image_to_data_uri(full_path)
-                    disclaimer_text = f"""
-                    <div style='background-color: #f0f8ff; padding: 1px; border-radius: 5px;'>
-                        <img src='{data_uri}' alt='disclaimer' style='width: 100%; height: auto;'>
-                    </div>
-                    """
-                except ValueError as e:
-                    logger.warning(f"Image data URI too large: {e}... using text disclaimer")
-                except Exception as e:
-                    logger.warning(f"Error converting image to data URI: {e}... using text disclaimer")
-            else:
-                logger.warning(f"Invalid image file type: {full_path}... using text disclaimer")
-        else:
-            logger.warning(f"Image file not found: {full_path}... using text disclaimer")
+        try:
+            fact_card_url = get_fact_card_url(config)
+            if fact_card_url:
+                disclaimer_text = f"""
+                <div style='background-color: #f0f8ff; padding: 1px; border-radius: 5px;'>
+                    <img src='{fact_card_url}' alt='disclaimer' style='width: 100%; height: auto;'>
+                </div>
+                """
+        except Exception as e:
+            logger.warning(f"Error preparing the fact card: {e}... using text disclaimer")
 
     project.dashboard.add_panel(
         DashboardPanelCounter(
@@ -522,19 +561,85 @@ def create_bottom_panels(config: dict, tags: list, project) -> None:
     )
 
 
-def log_snapshots(project, workspace):
+def get_snapshots_dir(config: dict = None) -> str:
     """
-    Log the JSON snapshots to the workspace.
+    Get the snapshots directory of the model of the config, in the Docker volume if it exists.
     """
     docker_snapshots_dir = "/app/snapshots"
     local_snapshots_dir = os.path.abspath(os.path.join(__file__, "..", "../../snapshots"))
 
     # Determine which directory to use
     if os.path.exists(docker_snapshots_dir):
-        snapshots_dir = docker_snapshots_dir
-    else:
-        snapshots_dir = local_snapshots_dir
+        return namespaced(docker_snapshots_dir, config)
+    return namespaced(local_snapshots_dir, config)
+
+
+def save_run_range(snapshots_dir: str, run: str, start, end, complete: bool = True) -> None:
+    """
+    Record the time range of the rows a run was generated from, so that a backfill can replace the runs it regenerates.
+    A flow run is recorded as incomplete until its rows were moved to the matched collection.
+    """
+    run_path = os.path.join(snapshots_dir, run)
+    os.makedirs(run_path, exist_ok=True)
+    write_json_atomic(
+        os.path.join(run_path, RUN_FILE_NAME), {"start": str(start), "end": str(end), "complete": complete}
+    )
+
+
+def load_run_range(snapshots_dir: str, run: str):
+    """
+    Load the time range of the rows of a run as a (start, end) tuple of strings, or None if it wasn't recorded.
+    """
+    try:
+        run_range = load_json(os.path.join(snapshots_dir, run, RUN_FILE_NAME))
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+    return run_range["start"], run_range["end"]
+
+
+def mark_run_complete(snapshots_dir: str, run: str) -> None:
+    """
+    Record that the rows of a run were moved to the matched collection, so no later run generates them again.
+    """
+    start, end = load_run_range(snapshots_dir, run)
+    save_run_range(snapshots_dir, run, start, end)
+
+
+def get_failed_runs(snapshots_dir: str, run: str) -> list:
+    """
+    List the incomplete runs before the given run. Their rows weren't moved to the matched collection, so the run
+    generates them again.
+    """
+    failed = []
+    for previous in sorted(os.listdir(snapshots_dir)):
+        if previous.startswith(".") or previous >= run:
+            continue
+        try:
+            run_range = load_json(os.path.join(snapshots_dir, previous, RUN_FILE_NAME))
+        except (FileNotFoundError, NotADirectoryError, json.JSONDecodeError):
+            continue
+        if not run_range.get("complete", True):
+            failed.append(previous)
+    return failed
+
+
+def remove_failed_runs(snapshots_dir: str, run: str) -> list:
+    """
+    Remove the incomplete runs before the given run. Their rows weren't moved to the matched collection, so the run
+    generated their snapshots again, from the cache for the unchanged strata. Return the removed runs.
+    """
+    removed = get_failed_runs(snapshots_dir, run)
+    for previous in removed:
+        shutil.rmtree(os.path.join(snapshots_dir, previous), ignore_errors=True)
+    if removed:
+        logger.info(f"Removed {len(removed)} failed runs generated again by {run}: {removed}")
+    return removed
 
+
+def iter_snapshot_files(snapshots_dir: str):
+    """
+    Yield the path relative to the snapshots directory and the full path of every snapshot file.
+    """
     for timestamp in os.listdir(snapshots_dir):
         if timestamp.startswith("."):
             continue
@@ -548,17 +653,79 @@ def log_snapshots(project, workspace):
                     continue
                 strata_path = os.path.join(operation_path, strata)
                 for output_file in os.listdir(strata_path):
-                    if output_file.startswith(".") or not output_file.endswith(".json"):
-                        continue
-                    output_path = os.path.join(strata_path, output_file)
-                    try:
-                        with open(output_path, "r") as f:
-                            snapshot_data = json.load(f)
-                        snapshot = Snapshot(**snapshot_data)
-                        workspace.add_snapshot(project.id, snapshot)
-                    except Exception as e:
-                        logger.error(f"Error loading snapshot: {e}")
+                    if not is_snapshot_file(output_file):
                         continue
+                    relative_path = os.path.join(timestamp, operation, strata, output_file)
+                    yield relative_path, os.path.join(strata_path, output_file)
+
+
+def load_manifest(snapshots_dir: str, project_id: str) -> dict:
+    """
+    Load the files already registered to the project. A manifest written for another project (e.g. after the workspace
+    was recreated) is ignored, so every snapshot is registered again.
+    """
+    manifest_path = os.path.join(snapshots_dir, MANIFEST_FILE_NAME)
+    try:
+        manifest = load_json(manifest_path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if manifest.get("project_id") != project_id:
+        return {}
+    return manifest.get("files", {})
+
+
+def save_manifest(snapshots_dir: str, project_id: str, files: dict) -> None:
+    """
+    Save the files registered to the project atomically.
+    """
+    manifest_path = os.path.join(snapshots_dir, MANIFEST_FILE_NAME)
+    write_json_atomic(manifest_path, {"project_id": project_id, "files": files})
+
+
+def log_snapshots(project, workspace, workers: int = None, batch_size: int = BATCH_SIZE, snapshots_dir: str = None):
+    """
+    Log the new JSON snapshots, compressed or not, to the workspace. Files already registered to the project are
+    listed in a manifest keyed by path, mtime and size (with their snapshot id), and are only read again if they
+    changed. A changed or deleted file, e.g. a run regenerated by a backfill, has its previous snapshot removed from
+    the workspace. Large backlogs, such as a full rebuild of a recreated project, are parsed in parallel and the
+    manifest is saved after every batch.
+    """
+    snapshots_dir = snapshots_dir or get_snapshots_dir()
+    project_id = str(project.id)
+    registered = load_manifest(snapshots_dir, project_id)
+
+    files = {}
+    pending = []
+    entries = {}
+    for relative_path, output_path in iter_snapshot_files(snapshots_dir):
+        stat = os.stat(output_path)
+        entry = {"mtime": stat.st_mtime, "size": stat.st_size}
+        previous = registered.get(relative_path, {})
+        if (previous.get("mtime"), previous.get("size")) == (entry["mtime"], entry["size"]):
+            files[relative_path] = previous
+        else:
+            pending.append((relative_path, output_path))
+            entries[relative_path] = entry
+
+    # the snapshots of changed and deleted files are replaced rather than shown twice
+    replaced = [entry["id"] for path, entry in registered.items() if path not in files and entry.get("id")]
+    for snapshot_id in replaced:
+        try:
+            workspace.delete_snapshot(project.id, snapshot_id)
+        except Exception as e:
+            logger.error(f"Error deleting snapshot {snapshot_id} from the workspace: {e}")
+
+    added = 0
+    for batch in register_snapshots(project, workspace, pending, workers, batch_size):
+        for relative_path, snapshot_id in batch:
+            # the id lets the retention remove the snapshot from the workspace without reading the file
+            files[relative_path] = {**entries[relative_path], "id": snapshot_id}
+        added += len(batch)
+        save_manifest(snapshots_dir, project_id, files)
+
+    # files deleted since the last run are dropped from the manifest
+    save_manifest(snapshots_dir, project_id, files)
+    logger.info(f"Logged {added} new snapshots, {len(files) - added} already registered, {len(replaced)} removed.")
 
 
 def create_project(workspace, config: dict) -> None:
@@ -568,9 +735,10 @@ def create_project(workspace, config: dict) -> None:
     try:
         project = workspace.create_project(config["info"]["project_name"])
         project.description = config["info"]["project_description"]
-        log_snapshots(project, workspace)
+        log_snapshots(project, workspace, snapshots_dir=get_snapshots_dir(config))
         update_panels(workspace, config, project=project)
         project.save()
+        sync_views(workspace, config, project, build_panels)
     except Exception as e:
         logger.error(f"Error creating project: {e}")
         return
@@ -585,9 +753,10 @@ def update_project(workspace, config: dict) -> None:
     try:
         project = workspace.search_project(config["info"]["project_name"])[0]
         project.description = config["info"]["project_description"]
-        log_snapshots(project, workspace)
+        log_snapshots(project, workspace, snapshots_dir=get_snapshots_dir(config))
         update_panels(workspace, config, project=project)
         project.save()
+        sync_views(workspace, config, project, build_panels)
     except Exception as e:
         logger.error(f"Error updating project: {e}")
         return
@@ -608,24 +777,98 @@ def create_or_update(workspace, config: dict) -> None:
         return
 
 
-def update_panels(workspace, config: dict, tags=["main", "single"], project=None) -> None:
+def new_view(config: dict) -> SimpleNamespace:
     """
-    Update the panels for the Evidently AI dashboard.
+    Create an empty dashboard that the panel functions can add panels to, outside of any project.
     """
-    try:
-        project = workspace.search_project(config["info"]["project_name"])[0]
-        # create the summary panels
-        create_summary_panels(config, tags, project)
+    return SimpleNamespace(dashboard=DashboardConfig(name=config["info"]["project_name"], panels=[]))
+
+
+def compile_dashboard(config: dict) -> list:
+    """
+    Compile the dashboard template of a config: the prebuilt panels, whose tag filters hold TAG_PLACEHOLDER in place
+    of the filter tags, and the functions building the panels whose content depends on the tags or on the latest run.
+    """
+    template = []
+    view = new_view(config)
+    create_summary_panels(config, [TAG_PLACEHOLDER], view)
+    # the last summary panel shows the applied filters
+    template += view.dashboard.panels[:-1]
+    template.append(lambda config, tags: [create_filters_panel(tags)])
+
+    view = new_view(config)
+    create_test_panels(config, [TAG_PLACEHOLDER], view)
+    create_metric_panels(config, [TAG_PLACEHOLDER], view)
+    template += view.dashboard.panels
+
+    template.append(lambda config, tags: [panel for panel in [create_interval_panel(config, tags)] if panel])
+
+    def bottom_panels(config: dict, tags: list) -> list:
+        view = new_view(config)
+        create_bottom_panels(config, tags, view)
+        return view.dashboard.panels
 
-        # create the test panels
-        create_test_panels(config, tags, project)
+    # the fact card URL changes with the image, and is memoised, so the bottom panels stay dynamic
+    template.append(bottom_panels)
+    return template
 
-        # create the metric panels
-        create_metric_panels(config, tags, project)
 
-        # create the bottom panels
-        create_bottom_panels(config, tags, project)
+def get_config_hash(config: dict) -> str:
+    """
+    Hash the config to identify its compiled dashboard template.
+    """
+    return hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def get_dashboard_template(config: dict) -> list:
+    """
+    Get the compiled dashboard template of the config, compiling it on the first call for each config. The templates
+    of the MAX_CACHED_TEMPLATES most recently used configs are kept, so the models of a flow run don't evict each other.
+    """
+    config_hash = get_config_hash(config)
+    with _templates_lock:
+        if config_hash in _templates:
+            _templates.move_to_end(config_hash)
+        else:
+            _templates[config_hash] = compile_dashboard(config)
+            if len(_templates) > MAX_CACHED_TEMPLATES:
+                _templates.popitem(last=False)
+        return _templates[config_hash]
 
+
+def apply_tags(panel, tags: list):
+    """
+    Get a copy of a template panel with the filter tags in place of TAG_PLACEHOLDER, or the panel itself if its filter
+    doesn't depend on the tags.
+    """
+    if TAG_PLACEHOLDER not in panel.filter.tag_values:
+        return panel
+    tag_values = [tag for value in panel.filter.tag_values for tag in (tags if value == TAG_PLACEHOLDER else [value])]
+    return panel.copy(update={"id": uuid.uuid4(), "filter": panel.filter.copy(update={"tag_values": tag_values})})
+
+
+def build_panels(config: dict, tags=["main", "single"]) -> list:
+    """
+    Build the panels of the dashboard for a set of tags, without touching the workspace, from the compiled template.
+    """
+    panels = []
+    for entry in get_dashboard_template(config):
+        if callable(entry):
+            panels += entry(config, list(tags))
+        else:
+            panels.append(apply_tags(entry, list(tags)))
+    return panels
+
+
+def update_panels(workspace, config: dict, tags=["main", "single"], project=None, panels: list = None) -> None:
+    """
+    Update the panels for the Evidently AI dashboard. Prebuilt panels, e.g. from the panel cache, are used as is.
+    """
+    try:
+        project = workspace.search_project(config["info"]["project_name"])[0]
+        if panels is None:
+            panels = build_panels(config, tags)
+        project.dashboard.panels = list(panels)
         project.save()
     except Exception as e:
         logger.error(f"Error updating panels: {e}")
@@ -0,0 +1,80 @@
+"""
+Script for starting the Evidently UI on the workspace with the dashboard view projects left out of the project list.
+The views are still served by their URL, which the dashboard frontend opens when a filter is applied.
+
+Usage:
+    python -m src.dashboard.evidently_ui [--host 0.0.0.0] [--port 8000] [--workspace /app/workspace]
+"""
+
+import argparse
+import logging
+
+from evidently.ui.app import get_config, run
+from evidently.ui.base import ProjectManager
+from evidently.ui.components.storage import LocalStorageComponent
+from evidently.ui.storage.common import NoopAuthManager
+from evidently.ui.storage.local import start_workspace_watchdog
+from evidently.ui.storage.local.base import (
+    FSSpecBlobStorage,
+    InMemoryDataStorage,
+    JsonFileMetadataStorage,
+    LocalState,
+)
+from fsspec.implementations.local import LocalFileSystem
+
+from src.dashboard.filter_views import is_view_name
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class ViewHidingProjectManager(ProjectManager):
+    def list_projects(self, user_id, team_id, org_id) -> list:
+        """
+        List the projects of the workspace without the dashboard view projects.
+        """
+        return [
+            project for project in super().list_projects(user_id, team_id, org_id) if not is_view_name(project.name)
+        ]
+
+
+def create_project_manager(path: str, autorefresh: bool) -> ProjectManager:
+    """
+    Create the project manager of a local workspace, as the Evidently UI does, hiding the view projects.
+    """
+    state = LocalState.load(path, None)
+    project_manager = ViewHidingProjectManager(
+        metadata=JsonFileMetadataStorage(path=path, local_state=state),
+        blob=FSSpecBlobStorage(base_path=path),
+        data=InMemoryDataStorage(path=path, local_state=state),
+        auth=NoopAuthManager(),
+    )
+    state.project_manager = project_manager
+    if autorefresh and isinstance(state.location.fs, LocalFileSystem):
+        start_workspace_watchdog(path, state)
+    return project_manager
+
+
+class ViewHidingStorageComponent(LocalStorageComponent):
+    def dependency_factory(self):
+        """
+        Create the project manager of the workspace, hiding the view projects.
+        """
+        return lambda: create_project_manager(self.path, self.autorefresh)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Start the Evidently UI without the view projects in the list.")
+    parser.add_argument("--host", default="0.0.0.0", help="Service host.")
+    parser.add_argument("--port", type=int, default=8000, help="Service port.")
+    parser.add_argument("--workspace", default="workspace", help="Path to the workspace.")
+    args = parser.parse_args()
+
+    config = get_config(host=args.host, port=args.port, workspace=args.workspace)
+    config.storage = ViewHidingStorageComponent(path=args.workspace)
+    logger.info(f"Starting the Evidently UI on {args.workspace}")
+    run(config)
+
+
+if __name__ == "__main__":
+    main()
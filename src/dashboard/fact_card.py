@@ -0,0 +1,143 @@
+"""
+Model fact card asset. The fact card image is resized and recompressed to a size budget once, stored under a name
+derived from its content hash, and served by the dashboard API, so the dashboard panel only holds a short, stable URL
+instead of a base64 data URI that was re-encoded and saved into the project on every filter change.
+"""
+
+import hashlib
+import io
+import logging
+import os
+import uuid
+
+from src.utils.config_manager import get_data_dir
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+FACT_CARD_DIR = "/app/frontend/dashboard/public/images/"
+IMAGE_EXTENSIONS = {".jpg": "JPEG", ".jpeg": "JPEG", ".png": "PNG"}
+MAX_FACT_CARD_BYTES = 512 * 1024
+MAX_FACT_CARD_WIDTH = 1600
+MIN_FACT_CARD_WIDTH = 400
+JPEG_QUALITIES = (90, 80, 70, 60, 50)
+
+# fact card URLs by (source path, mtime, size), so unchanged images are not hashed again on every panel update
+_urls = {}
+
+
+def get_fact_card_cache_dir() -> str:
+    """
+    Get the directory of the prepared fact card assets.
+    """
+    return os.path.join(get_data_dir(), "fact_cards")
+
+
+def get_source_path(config: dict) -> str:
+    """
+    Get the path of the fact card image from the config, or None if there is no valid image.
+    """
+    if not config["info"].get("fact_card"):
+        return None
+    full_path = os.path.join(FACT_CARD_DIR, config["info"]["fact_card"])
+    if not os.path.exists(full_path):
+        logger.warning(f"Image file not found: {full_path}... using text disclaimer")
+        return None
+    if os.path.splitext(full_path)[1].lower() not in IMAGE_EXTENSIONS:
+        logger.warning(f"Invalid image file type: {full_path}... using text disclaimer")
+        return None
+    return full_path
+
+
+def get_asset_name(content: bytes, extension: str) -> str:
+    """
+    Get the asset name of an image from its content and the size budget, which both change the prepared asset.
+    """
+    digest = hashlib.sha256(content)
+    digest.update(f"{MAX_FACT_CARD_BYTES}:{MAX_FACT_CARD_WIDTH}".encode())
+    return f"{digest.hexdigest()[:16]}{extension}"
+
+
+def encode_image(image, image_format: str, quality: int) -> bytes:
+    """
+    Encode an image in the given format.
+    """
+    buffer = io.BytesIO()
+    if image_format == "JPEG":
+        image.convert("RGB").save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
+
+
+def optimize_image(content: bytes, image_format: str) -> bytes:
+    """
+    Resize and recompress an image until it fits the size budget, lowering the JPEG quality first and then the width.
+    Without Pillow, the image is kept as is.
+    """
+    if Image is None:
+        logger.warning("Pillow is not installed, serving the fact card without resizing it.")
+        return content
+
+    image = Image.open(io.BytesIO(content))
+    image.load()
+    if image.width > MAX_FACT_CARD_WIDTH:
+        image = image.resize((MAX_FACT_CARD_WIDTH, round(image.height * MAX_FACT_CARD_WIDTH / image.width)))
+
+    qualities = JPEG_QUALITIES if image_format == "JPEG" else (None,)
+    while True:
+        for quality in qualities:
+            encoded = encode_image(image, image_format, quality)
+            if len(encoded) <= MAX_FACT_CARD_BYTES:
+                return encoded
+        width = int(image.width * 0.8)
+        if width < MIN_FACT_CARD_WIDTH:
+            logger.warning(f"Fact card is still {len(encoded)} bytes at its smallest size, above the budget.")
+            return encoded
+        image = image.resize((width, round(image.height * width / image.width)))
+
+
+def prepare_fact_card(config: dict, cache_dir: str = None) -> str:
+    """
+    Prepare the fact card asset if it doesn't exist yet, and return its name, or None if there is no valid image.
+    """
+    source_path = get_source_path(config)
+    if source_path is None:
+        return None
+    with open(source_path, "rb") as file:
+        content = file.read()
+    extension = os.path.splitext(source_path)[1].lower()
+    asset_name = get_asset_name(content, extension)
+
+    cache_dir = cache_dir or get_fact_card_cache_dir()
+    asset_path = os.path.join(cache_dir, asset_name)
+    if not os.path.exists(asset_path):
+        optimized = optimize_image(content, IMAGE_EXTENSIONS[extension])
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{asset_path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, "wb") as file:
+            file.write(optimized)
+        os.replace(tmp_path, asset_path)
+        logger.info(f"Prepared fact card {asset_name}: {len(content)} -> {len(optimized)} bytes")
+    return asset_name
+
+
+def get_fact_card_url(config: dict, cache_dir: str = None) -> str:
+    """
+    Get the URL of the fact card served by the dashboard API, or None if there is no valid image.
+    """
+    source_path = get_source_path(config)
+    if source_path is None:
+        return None
+    stat = os.stat(source_path)
+    key = (source_path, stat.st_mtime_ns, stat.st_size, cache_dir)
+    if key not in _urls:
+        asset_name = prepare_fact_card(config, cache_dir)
+        api_url = os.environ.get("DASHBOARD_API_URL", "http://localhost:5002")
+        _urls[key] = f"{api_url}/fact_card/{asset_name}"
+    return _urls[key]
@@ -0,0 +1,233 @@
+"""
+Prebuilt dashboard views, one Evidently project per normalised filter set. A view project holds the panels of its
+filter set and hard links to the snapshots of the main project that these panels read, so applying a filter is a
+lookup of the view's URL, never a rewrite of a project another user is looking at. Views are created on the first
+request for their filter set and refreshed by the flow after every run. At most max_views views are kept, the least
+recently used is deleted first. View project names start with VIEW_NAME_PREFIX, so the Evidently UI can leave them out
+of the project list.
+"""
+
+import json
+import logging
+import os
+import shutil
+import time
+
+from evidently.ui.base import Project
+from evidently.ui.storage.local.base import METADATA_PATH, SNAPSHOTS
+
+from src.dashboard.panel_cache import DEFAULT_TAGS
+from src.monitoring.cache import write_json_atomic
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+VIEWS_FILE_NAME = ".views.json"
+VIEW_NAME_PREFIX = "View: "
+MAX_VIEWS = 64
+# the last use of a view is recorded at most once per this many seconds, so that lookups rarely write the registry
+VIEW_USE_RESOLUTION = 3600
+
+
+def get_views_path(workspace) -> str:
+    """
+    Get the path of the registry of view projects, next to the projects in the workspace directory.
+    """
+    return os.path.join(workspace.path, VIEWS_FILE_NAME)
+
+
+def read_views_file(workspace) -> dict:
+    """
+    Read the registry of the view projects of every project.
+    """
+    try:
+        with open(get_views_path(workspace), "r") as file:
+            return json.load(file)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def load_views(workspace, config: dict) -> dict:
+    """
+    Load the view projects of the project of the config, as a mapping of view project id to filter tags.
+    """
+    return {project_id: tags for project_id, (tags, _) in load_view_entries(workspace, config).items()}
+
+
+def load_view_entries(workspace, config: dict) -> dict:
+    """
+    Load the view projects of the project of the config, as a mapping of view project id to the filter tags and the
+    time the view was last used. Views registered without a last use count as never used.
+    """
+    views = read_views_file(workspace).get(config["info"]["project_name"], {})
+    entries = {}
+    for project_id, entry in views.items():
+        if isinstance(entry, list):
+            entry = {"tags": entry}
+        entries[project_id] = (tuple(entry["tags"]), entry.get("last_used", 0.0))
+    return entries
+
+
+def save_views(workspace, config: dict, entries: dict) -> None:
+    """
+    Save the view projects of the project of the config, given as a mapping of view project id to filter tags and last
+    use, keeping the views of the other projects.
+    """
+    views = read_views_file(workspace)
+    views[config["info"]["project_name"]] = {
+        project_id: {"tags": list(tags), "last_used": last_used} for project_id, (tags, last_used) in entries.items()
+    }
+    write_json_atomic(get_views_path(workspace), views)
+
+
+def get_view_id(workspace, config: dict, tags: tuple) -> str:
+    """
+    Get the id of the project showing the normalised filter tags, or None if no view was created for them yet. The
+    default tags are shown by the main project.
+    """
+    if tuple(tags) == DEFAULT_TAGS:
+        return str(workspace.search_project(config["info"]["project_name"])[0].id)
+    for project_id, view_tags in load_views(workspace, config).items():
+        if view_tags == tuple(tags):
+            return project_id
+    return None
+
+
+def get_view_name(config: dict, tags: tuple) -> str:
+    """
+    Get the name of the view project of the filter tags.
+    """
+    return f"{VIEW_NAME_PREFIX}{config['info']['project_name']} [{', '.join(tags)}]"
+
+
+def is_view_name(name: str) -> bool:
+    """
+    Check if a project name is the name of a view project.
+    """
+    return name.startswith(VIEW_NAME_PREFIX)
+
+
+def is_view_use_stale(workspace, config: dict, view_id: str) -> bool:
+    """
+    Check if the recorded last use of a view is older than VIEW_USE_RESOLUTION, so that touch_view should record the
+    new use. The main project isn't a view and is never stale.
+    """
+    entry = load_view_entries(workspace, config).get(view_id)
+    return entry is not None and time.time() - entry[1] > VIEW_USE_RESOLUTION
+
+
+def touch_view(workspace, config: dict, view_id: str) -> None:
+    """
+    Record the use of a view, which delays its eviction. Must be called with the workspace write lock held.
+    """
+    entries = load_view_entries(workspace, config)
+    if view_id in entries:
+        entries[view_id] = (entries[view_id][0], time.time())
+        save_views(workspace, config, entries)
+
+
+def evict_views(workspace, entries: dict, max_views: int) -> list:
+    """
+    Delete the least recently used view projects beyond max_views and remove them from the entries. Return the ids of
+    the deleted views.
+    """
+    evicted = sorted(entries, key=lambda project_id: entries[project_id][1])[: max(len(entries) - max_views, 0)]
+    for project_id in evicted:
+        try:
+            workspace.delete_project(project_id)
+        except Exception as e:
+            logger.error(f"Error deleting the view project {project_id}: {e}")
+        del entries[project_id]
+    return evicted
+
+
+def needs_snapshot(panels: list, snapshot_tags: list) -> bool:
+    """
+    Check if any panel reads the snapshot: Evidently shows a snapshot in a panel if the snapshot has every tag of the
+    panel filter. Panels without tags only show text.
+    """
+    snapshot_tags = set(snapshot_tags)
+    return any(panel.filter.tag_values and set(panel.filter.tag_values) <= snapshot_tags for panel in panels)
+
+
+def link_file(source: str, target: str) -> None:
+    """
+    Hard link a snapshot file into a view project, copying it if the file system doesn't support links.
+    """
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def link_snapshots(workspace, project, view, panels: list) -> int:
+    """
+    Link the snapshots of the project read by the panels into the view project, and remove the links to the snapshots
+    deleted from the project or no longer read. Return the number of snapshots linked or removed.
+    """
+    source_dir = os.path.join(workspace.path, str(project.id), SNAPSHOTS)
+    view_dir = os.path.join(workspace.path, str(view.id), SNAPSHOTS)
+    os.makedirs(view_dir, exist_ok=True)
+    wanted = {str(snapshot.id) for snapshot in project.list_snapshots() if needs_snapshot(panels, snapshot.tags)}
+    linked = {file_name[: -len(".json")] for file_name in os.listdir(view_dir) if file_name.endswith(".json")}
+
+    for snapshot_id in wanted - linked:
+        link_file(os.path.join(source_dir, f"{snapshot_id}.json"), os.path.join(view_dir, f"{snapshot_id}.json"))
+    for snapshot_id in linked - wanted:
+        os.remove(os.path.join(view_dir, f"{snapshot_id}.json"))
+    return len(wanted ^ linked)
+
+
+def create_view(workspace, config: dict, tags: tuple, panels: list) -> str:
+    """
+    Create the view project of the filter tags with prebuilt panels, link its snapshots and register it, deleting the
+    least recently used views beyond the configured maximum. Must be called with the workspace write lock held. Return
+    the id of the view project.
+    """
+    project = workspace.search_project(config["info"]["project_name"])[0]
+    view = workspace.create_project(get_view_name(config, tags))
+    view.description = config["info"]["project_description"]
+    view.dashboard.panels = list(panels)
+    view.save()
+    link_snapshots(workspace, project, view, panels)
+
+    entries = load_view_entries(workspace, config)
+    entries[str(view.id)] = (tuple(tags), time.time())
+    evicted = evict_views(workspace, entries, config.get("dashboard_views", {}).get("max_views", MAX_VIEWS))
+    save_views(workspace, config, entries)
+    logger.info(f"Created the dashboard view of {list(tags)}, evicted {len(evicted)} views")
+    return str(view.id)
+
+
+def get_view_project(workspace, view_id: str):
+    """
+    Get a view project, adding it to the loaded workspace if another process created it since the workspace was
+    loaded: creating a view doesn't make the readers of the workspace reload it. Return None if the view was deleted.
+    """
+    view = workspace.get_project(view_id)
+    metadata_path = os.path.join(workspace.path, view_id, METADATA_PATH)
+    if view is None and os.path.exists(metadata_path):
+        view = workspace.add_project(Project.parse_file(metadata_path))
+    return view
+
+
+def sync_views(workspace, config: dict, project, build_panels) -> None:
+    """
+    Refresh every view project of the project after a run: rebuild its panels with build_panels(config, tags), which
+    depend on the latest run, and link the new snapshots. Views whose project was deleted are forgotten, and created
+    again on the next request for their filter set.
+    """
+    entries = load_view_entries(workspace, config)
+    for view_id, (tags, _) in list(entries.items()):
+        view = get_view_project(workspace, view_id)
+        if view is None:
+            del entries[view_id]
+            save_views(workspace, config, entries)
+            continue
+        panels = build_panels(config, list(tags))
+        # views created before the name convention are renamed, so that the Evidently UI hides them
+        view.name = get_view_name(config, tags)
+        view.description = config["info"]["project_description"]
+        view.dashboard.panels = list(panels)
+        view.save()
+        link_snapshots(workspace, project, view, panels)
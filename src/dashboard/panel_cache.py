@@ -0,0 +1,78 @@
+"""
+LRU cache of dashboard panel sets, keyed by the normalised filter tags. Applying a filter that was already built since
+the last flow run is a lookup instead of a rebuild of every panel.
+"""
+
+import logging
+import threading
+from collections import OrderedDict
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAGS = ("main", "single")
+MAX_CACHED_VIEWS = 32
+
+
+def normalize_tags(tags: list) -> tuple:
+    """
+    Normalise filter tags into a cache key. Evidently matches tags as a set, so order and duplicates don't matter.
+    """
+    tags = tuple(sorted({tag for tag in tags if tag}))
+    return tags or DEFAULT_TAGS
+
+
+class PanelCache:
+    def __init__(self, max_size: int = MAX_CACHED_VIEWS):
+        """
+        Initialize an empty cache holding at most max_size panel sets.
+        """
+        self.max_size = max_size
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+        self._panels = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = {}
+
+    def _lookup(self, key: tuple, version):
+        """
+        Get the cached panels for a key, dropping the whole cache if the version changed.
+        """
+        with self._lock:
+            if version != self.version:
+                self._panels.clear()
+                self.version = version
+            panels = self._panels.get(key)
+            if panels is not None:
+                self._panels.move_to_end(key)
+            return panels
+
+    def get_or_build(self, tags: list, builder, version=None) -> list:
+        """
+        Get the panels for the tags, building them with builder(tags) on a miss. The version identifies the data the
+        panels were built from, e.g. the latest flow run; a new version invalidates every cached panel set.
+        """
+        key = normalize_tags(tags)
+        panels = self._lookup(key, version)
+        if panels is not None:
+            self.hits += 1
+            return panels
+
+        with self._lock:
+            build_lock = self._build_locks.setdefault(key, threading.Lock())
+        # concurrent requests for the same filter wait for a single build
+        with build_lock:
+            panels = self._lookup(key, version)
+            if panels is not None:
+                self.hits += 1
+                return panels
+            self.misses += 1
+            panels = builder(list(key))
+            with self._lock:
+                if version == self.version:
+                    self._panels[key] = panels
+                    while len(self._panels) > self.max_size:
+                        evicted, _ = self._panels.popitem(last=False)
+                        logger.debug(f"Evicted cached panels for {evicted}")
+        return panels
@@ -0,0 +1,89 @@
+"""
+Parallel snapshot loading for workspace rebuilds. When a project is recreated, every snapshot ever written has to be
+parsed and validated again; the parsing is spread over a process pool and the snapshots are added to the workspace in
+batches, with progress and throughput logged after every batch.
+"""
+
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from evidently.suite.base_suite import Snapshot
+
+from src.monitoring.snapshots import read_snapshot_data
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# below this many new snapshots, starting the worker processes costs more than it saves
+PARALLEL_MIN_SNAPSHOTS = 100
+BATCH_SIZE = 50
+CHUNK_SIZE = 8
+
+
+def parse_snapshot(output_path: str) -> tuple:
+    """
+    Read and validate a snapshot file. Return the snapshot and None, or None and the error message.
+    """
+    try:
+        return Snapshot(**read_snapshot_data(output_path)), None
+    except Exception as e:
+        return None, str(e)
+
+
+def get_workers(workers: int = None) -> int:
+    """
+    Get the number of worker processes, by default one per CPU.
+    """
+    return max(1, workers or os.cpu_count() or 1)
+
+
+def parse_snapshots(output_paths: list, workers: int = None):
+    """
+    Yield the parsed snapshots in order, in a process pool if there are enough of them and more than one worker.
+    """
+    workers = get_workers(workers)
+    if workers == 1 or len(output_paths) < PARALLEL_MIN_SNAPSHOTS:
+        yield from map(parse_snapshot, output_paths)
+        return
+
+    logger.info(f"Parsing {len(output_paths)} snapshots with {workers} worker processes.")
+    # spawn rather than fork, as the flow runs this from a task thread
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+        yield from executor.map(parse_snapshot, output_paths, chunksize=CHUNK_SIZE)
+
+
+def register_snapshots(project, workspace, pending: list, workers: int = None, batch_size: int = BATCH_SIZE):
+    """
+    Parse the pending (relative_path, output_path) snapshot files and add them to the workspace. Yield the relative
+    paths and snapshot ids added after every batch, so the caller can record progress.
+    """
+    total = len(pending)
+    start = time.perf_counter()
+    done = 0
+    batch = []
+    snapshots = parse_snapshots([output_path for _, output_path in pending], workers)
+    for (relative_path, _), (snapshot, error) in zip(pending, snapshots):
+        done += 1
+        if snapshot is None:
+            logger.error(f"Error loading snapshot {relative_path}: {error}")
+        else:
+            try:
+                workspace.add_snapshot(project.id, snapshot)
+                batch.append((relative_path, str(snapshot.id)))
+            except Exception as e:
+                logger.error(f"Error adding snapshot {relative_path}: {e}")
+
+        if done % batch_size == 0 or done == total:
+            elapsed = time.perf_counter() - start
+            if total > batch_size:
+                logger.info(f"Registered {done}/{total} snapshots ({done / elapsed:.1f} snapshots/s)")
+            yield batch
+            batch = []
+
+    if total:
+        elapsed = time.perf_counter() - start
+        logger.info(f"Registered {total} snapshots in {elapsed:.1f}s ({total / elapsed:.1f} snapshots/s)")
@@ -0,0 +1,192 @@
+"""
+Snapshot retention. Runs are kept according to their age: every run for keep_all_days, then the latest run of each day
+until daily_days, then the latest run of each ISO week until weekly_days (forever if null). Superseded runs are removed
+from the snapshots directory, the workspace, the manifest and the snapshot cache. A dry run only reports what would be removed.
+
+Each flow run holds the reports and tests of its own batch of rows, so removing a run deletes the results of that batch:
+the kept run of a day or week does not cover the rows of the runs it supersedes. Retention is off by default. To keep
+the results of every row, backfill the period as daily or weekly windows (scripts.backfill) before it is thinned.
+"""
+
+import logging
+import os
+import shutil
+from datetime import datetime, timedelta
+
+from src.dashboard.create_project import get_snapshots_dir, load_manifest, save_manifest
+from src.monitoring.cache import CACHE_DIR_NAME, prune_cache
+from src.monitoring.snapshots import is_snapshot_file, read_snapshot_data
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S"
+DEFAULT_POLICY = {"keep_all_days": 14, "daily_days": 180, "weekly_days": None}
+
+
+def get_retention_policy(config: dict) -> dict:
+    """
+    Get the retention policy from the config, with the defaults for missing settings.
+    """
+    settings = config.get("retention", {})
+    policy = {key: settings.get(key, default) for key, default in DEFAULT_POLICY.items()}
+    if policy["keep_all_days"] > policy["daily_days"]:
+        raise ValueError("retention.keep_all_days must not be greater than retention.daily_days")
+    if policy["weekly_days"] is not None and policy["daily_days"] > policy["weekly_days"]:
+        raise ValueError("retention.daily_days must not be greater than retention.weekly_days")
+    return policy
+
+
+def parse_run_timestamp(run: str):
+    """
+    Parse the timestamp of a run directory, or return None if it is not a run.
+    """
+    try:
+        return datetime.strptime(run, TIMESTAMP_FORMAT)
+    except ValueError:
+        return None
+
+
+def select_runs(runs: list, policy: dict, now: datetime) -> tuple:
+    """
+    Split the run directory names into the runs to keep and the runs to remove under the policy.
+    """
+    keep, remove = set(), set()
+    latest = {}
+    for run in runs:
+        timestamp = parse_run_timestamp(run)
+        if timestamp is None:
+            continue
+        age = now - timestamp
+        if age < timedelta(days=policy["keep_all_days"]):
+            keep.add(run)
+            continue
+        if age < timedelta(days=policy["daily_days"]):
+            bucket = ("day", timestamp.date())
+        elif policy["weekly_days"] is None or age < timedelta(days=policy["weekly_days"]):
+            bucket = ("week", timestamp.isocalendar()[:2])
+        else:
+            remove.add(run)
+            continue
+        # the latest run of each bucket supersedes the others
+        previous = latest.get(bucket)
+        if previous is None or timestamp > parse_run_timestamp(previous):
+            if previous is not None:
+                remove.add(previous)
+            latest[bucket] = run
+        else:
+            remove.add(run)
+    keep.update(latest.values())
+    return keep, remove
+
+
+def list_run_files(run_path: str) -> list:
+    """
+    List the files of a run directory, relative to the snapshots directory.
+    """
+    snapshots_dir = os.path.dirname(run_path)
+    files = []
+    for root, _, file_names in os.walk(run_path):
+        for file_name in file_names:
+            files.append(os.path.relpath(os.path.join(root, file_name), snapshots_dir))
+    return files
+
+
+def plan_retention(config: dict, now: datetime = None, snapshots_dir: str = None) -> dict:
+    """
+    Build the retention report: the runs kept and removed, the number of files and bytes removed, and the number of
+    snapshot cache entries pointing into the removed runs.
+    """
+    snapshots_dir = snapshots_dir or get_snapshots_dir(config)
+    now = now or datetime.now()
+    runs = [run for run in os.listdir(snapshots_dir) if not run.startswith(".")]
+    keep, remove = select_runs(runs, get_retention_policy(config), now)
+
+    files = []
+    for run in sorted(remove):
+        files.extend(list_run_files(os.path.join(snapshots_dir, run)))
+    return {
+        "runs_kept": sorted(keep),
+        "runs_removed": sorted(remove),
+        "files_removed": files,
+        "bytes_removed": sum(os.path.getsize(os.path.join(snapshots_dir, file)) for file in files),
+        "cache_entries_removed": prune_cache(
+            os.path.join(snapshots_dir, CACHE_DIR_NAME),
+            [os.path.join(snapshots_dir, run) for run in remove],
+            dry_run=True,
+        ),
+    }
+
+
+def get_snapshot_id(snapshots_dir: str, relative_path: str, manifest: dict):
+    """
+    Get the snapshot id of a file from the manifest, reading the file if the manifest doesn't have it.
+    """
+    snapshot_id = manifest.get(relative_path, {}).get("id")
+    if snapshot_id is not None:
+        return snapshot_id
+    try:
+        return read_snapshot_data(os.path.join(snapshots_dir, relative_path))["id"]
+    except Exception as e:
+        logger.warning(f"Could not read the snapshot id of {relative_path}: {e}")
+        return None
+
+
+def apply_retention(
+    config: dict, workspace=None, project=None, dry_run: bool = False, now: datetime = None, snapshots_dir: str = None
+) -> dict:
+    """
+    Remove the runs superseded under the retention policy from the snapshots directory and, if a project is given,
+    from the workspace. Return the retention report.
+    """
+    snapshots_dir = snapshots_dir or get_snapshots_dir(config)
+    report = plan_retention(config, now, snapshots_dir)
+    report["dry_run"] = dry_run
+    logger.info(
+        f"Retention{' (dry run)' if dry_run else ''}: keeping {len(report['runs_kept'])} runs, removing "
+        f"{len(report['runs_removed'])} runs ({len(report['files_removed'])} files, "
+        f"{report['bytes_removed'] / 1e6:.1f} MB, {report['cache_entries_removed']} cache entries)"
+    )
+    if dry_run or not report["runs_removed"]:
+        return report
+    logger.warning(f"The results of the batches of the removed runs are deleted: {report['runs_removed']}")
+
+    manifest = load_manifest(snapshots_dir, str(project.id)) if project is not None else {}
+    if project is not None:
+        for relative_path in report["files_removed"]:
+            if not is_snapshot_file(os.path.basename(relative_path)):
+                continue
+            snapshot_id = get_snapshot_id(snapshots_dir, relative_path, manifest)
+            if snapshot_id is None:
+                continue
+            try:
+                workspace.delete_snapshot(project.id, snapshot_id)
+            except Exception as e:
+                logger.error(f"Error deleting snapshot {snapshot_id} from the workspace: {e}")
+
+    for run in report["runs_removed"]:
+        shutil.rmtree(os.path.join(snapshots_dir, run), ignore_errors=True)
+    # a cache hit would otherwise point at a removed snapshot
+    prune_cache(
+        os.path.join(snapshots_dir, CACHE_DIR_NAME),
+        [os.path.join(snapshots_dir, run) for run in report["runs_removed"]],
+    )
+
+    if project is not None:
+        removed = set(report["files_removed"])
+        files = {path: entry for path, entry in manifest.items() if path not in removed}
+        save_manifest(snapshots_dir, str(project.id), files)
+    return report
+
+
+def enforce_retention(workspace, config: dict):
+    """
+    Apply the retention policy after a flow run if it is enabled in the config, off by default since the removed runs
+    take the results of their batches with them.
+    """
+    settings = config.get("retention", {})
+    if not settings.get("enabled", False):
+        return None
+    projects = workspace.search_project(config["info"]["project_name"])
+    project = projects[0] if projects else None
+    return apply_retention(config, workspace, project, dry_run=settings.get("dry_run", False))
@@ -0,0 +1,50 @@
+"""
+Per-session dashboard views. Each session keeps its own normalised filter tags, and is shown the prebuilt view project
+of these tags, so concurrent users never see each other's filters.
+"""
+
+import logging
+import threading
+import uuid
+from collections import OrderedDict
+
+from src.dashboard.panel_cache import DEFAULT_TAGS
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MAX_SESSIONS = 1000
+
+
+class SessionViews:
+    def __init__(self, max_sessions: int = MAX_SESSIONS):
+        """
+        Initialize the registry of session views, keeping at most max_sessions sessions.
+        """
+        self.max_sessions = max_sessions
+        self._views = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def new_session_id() -> str:
+        """
+        Generate a new session id.
+        """
+        return uuid.uuid4().hex
+
+    def set(self, session_id: str, tags: tuple) -> None:
+        """
+        Set the filter tags of a session, evicting the least recently active session if there are too many.
+        """
+        with self._lock:
+            self._views[session_id] = tags
+            self._views.move_to_end(session_id)
+            while len(self._views) > self.max_sessions:
+                self._views.popitem(last=False)
+
+    def get(self, session_id: str) -> tuple:
+        """
+        Get the filter tags of a session, the default tags for an unknown session.
+        """
+        with self._lock:
+            return self._views.get(session_id, DEFAULT_TAGS)
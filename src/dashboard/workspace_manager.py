@@ -1,11 +1,42 @@
 from evidently.ui.workspace import Workspace, WorkspaceBase
+from contextlib import contextmanager
+import fcntl
 import os
+import threading
+import uuid
 
 WORKSPACE_NAME = "/app/workspace"
+LOCK_FILE_NAME = ".lock"
+GENERATION_FILE_NAME = ".generation"
+
+
+def read_generation(workspace_name: str = None) -> str:
+    """
+    Read the workspace generation marker, or None if the flow has not written one yet.
+    """
+    try:
+        with open(os.path.join(workspace_name or WORKSPACE_NAME, GENERATION_FILE_NAME), "r") as file:
+            return file.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def write_generation(workspace_name: str = None) -> str:
+    """
+    Write a new workspace generation marker atomically, telling the readers of the workspace to reload it.
+    """
+    generation = uuid.uuid4().hex
+    marker_path = os.path.join(workspace_name or WORKSPACE_NAME, GENERATION_FILE_NAME)
+    tmp_path = f"{marker_path}.{generation}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(generation)
+    os.replace(tmp_path, marker_path)
+    return generation
 
 
 class WorkspaceManager:
     _instance = None
+    _instance_lock = threading.Lock()
 
     @staticmethod
     def get_instance():
@@ -13,7 +44,9 @@ class WorkspaceManager:
         Get the singleton instance of the WorkspaceManager.
         """
         if WorkspaceManager._instance is None:
-            WorkspaceManager()
+            with WorkspaceManager._instance_lock:
+                if WorkspaceManager._instance is None:
+                    WorkspaceManager()
         return WorkspaceManager._instance
 
     def __init__(self):
@@ -21,7 +54,9 @@ class WorkspaceManager:
             raise Exception("This class is a singleton")
         else:
             WorkspaceManager._instance = self
-            self.workspace = self.load_or_create_workspace(WORKSPACE_NAME)
+            self._write_lock = threading.RLock()
+            self._reload_lock = threading.Lock()
+            self.reload_workspace()
 
     def load_or_create_workspace(self, workspace_name: str) -> WorkspaceBase:
         """
@@ -33,8 +68,41 @@ class WorkspaceManager:
         """
         Reload the workspace.
         """
+        self.generation = read_generation()
         self.workspace = self.load_or_create_workspace(WORKSPACE_NAME)
 
+    def get_workspace(self) -> WorkspaceBase:
+        """
+        Get the workspace, reloading it only if the flow wrote a new generation marker since the last load.
+        """
+        if read_generation() != self.generation:
+            with self._reload_lock:
+                if read_generation() != self.generation:
+                    self.reload_workspace()
+        return self.workspace
+
+    def mark_changed(self) -> str:
+        """
+        Write a new generation marker after the flow changed the workspace, so that the other processes reload it and
+        drop the caches of the previous run. New view projects are found through the view registry instead.
+        """
+        self.generation = write_generation()
+        return self.generation
+
+    @contextmanager
+    def write_lock(self):
+        """
+        Hold the workspace write lock: a thread lock for the requests of this process and a file lock shared with the
+        flow and the other API workers, which write to the same workspace volume.
+        """
+        with self._write_lock:
+            with open(os.path.join(WORKSPACE_NAME, LOCK_FILE_NAME), "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield self.workspace
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
 
 def ensure_directory(directory: str) -> None:
     """
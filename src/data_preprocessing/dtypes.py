@@ -0,0 +1,189 @@
+"""
+Compact dtypes for the current and reference data. The strata columns (sex, hospital, instrument type and patient
+class) and the categorical features arrive as object columns of strings, and are converted to categoricals with the
+categories from the data details. Integer features and classification columns are downcast to the smallest integer
+type holding their values. Floats stay float64, as float32 arithmetic would change Evidently's statistics.
+
+The same dtypes are applied to the current and reference data, so both have the same categories.
+"""
+
+import logging
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+STRATA_COLUMNS = ["sex", "hospital", "instrument_type", "patient_class"]
+INTEGER_TYPES = [np.int8, np.int16, np.int32, np.int64]
+
+# wide frames by the id of their compact frame, with a weak reference to it so that a reused id isn't mistaken for it
+_wide_frames = {}
+# one lock per compact frame, so that a frame is widened once while other frames are widened in parallel
+_widen_locks = {}
+_wide_lock = threading.Lock()
+
+
+def get_categorical_columns(config: dict, details: dict) -> dict:
+    """
+    Get the categorical columns with the categories known from the data details.
+    """
+    columns = config["columns"]
+    categorical = {}
+    for key in STRATA_COLUMNS:
+        if columns.get(key):
+            categorical[columns[key]] = list(details.get(f"{key}_unique_values", []))
+    for feature in columns["features"]:
+        if feature in details.get("categorical_columns", []) and feature not in categorical:
+            categorical[feature] = []
+    return categorical
+
+
+def get_integer_columns(config: dict) -> list:
+    """
+    Get the columns that can be downcast: the features and the classification prediction and label. The regression
+    columns are left as they are, as their errors are computed in their own dtype.
+    """
+    columns = list(config["columns"]["features"])
+    if config["model_config"]["model_type"]["binary_classification"]:
+        columns.append(config["columns"]["predictions"]["classification_prediction"])
+        columns.append(config["columns"]["labels"]["classification_label"])
+    return columns
+
+
+def get_integer_type(minimum, maximum):
+    """
+    Get the smallest integer type holding the range.
+    """
+    for integer_type in INTEGER_TYPES:
+        info = np.iinfo(integer_type)
+        if info.min <= minimum and maximum <= info.max:
+            return integer_type
+    return np.int64
+
+
+def plan_dtypes(frames: list, config: dict, details: dict) -> dict:
+    """
+    Plan the compact dtype of every column shared by the frames.
+    """
+    dtypes = {}
+    for column, known in get_categorical_columns(config, details).items():
+        series = [frame[column] for frame in frames if column in frame.columns]
+        if not series or not all(s.dtype == object for s in series):
+            continue
+        # the values seen in the data but not yet in the details are kept, so no value becomes missing
+        categories = list(dict.fromkeys(known))
+        seen = set(categories)
+        observed = {value for s in series for value in s.dropna().unique()}
+        categories.extend(sorted(observed - seen, key=str))
+        dtypes[column] = pd.CategoricalDtype(categories)
+
+    for column in get_integer_columns(config):
+        if column in dtypes:
+            continue
+        series = [frame[column] for frame in frames if column in frame.columns]
+        if not series or not all(pd.api.types.is_integer_dtype(s.dtype) for s in series):
+            continue
+        non_empty = [s for s in series if len(s)]
+        if not non_empty:
+            continue
+        minimum = min(s.min() for s in non_empty)
+        maximum = max(s.max() for s in non_empty)
+        dtypes[column] = get_integer_type(minimum, maximum)
+    return dtypes
+
+
+def apply_dtypes(data: pd.DataFrame, dtypes: dict) -> pd.DataFrame:
+    """
+    Convert the columns of the data to the planned dtypes.
+    """
+    return data.astype({column: dtype for column, dtype in dtypes.items() if column in data.columns}, copy=False)
+
+
+def get_memory_mb(data: pd.DataFrame) -> float:
+    """
+    Get the memory used by the data, including the strings of object columns, in MB.
+    """
+    return data.memory_usage(deep=True).sum() / (1024 * 1024)
+
+
+def normalize_dtypes(data: pd.DataFrame, reference_data: pd.DataFrame, config: dict, details: dict) -> tuple:
+    """
+    Convert the current and reference data to compact dtypes. Return both.
+    """
+    dtypes = plan_dtypes([data, reference_data], config, details)
+    return apply_dtypes(data, dtypes), apply_dtypes(reference_data, dtypes)
+
+
+def widen_dtypes(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Convert the compact columns of a frame, e.g. of a stratum, back to the dtypes the data arrives with. Evidently lists
+    every category of a categorical column in its distributions and reports the dtypes in its summaries, so it runs on
+    the frames as they were before the conversion and its outputs don't change. The wide frame only lives for the run.
+    """
+    wide = {}
+    for column, series in data.items():
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            wide[column] = series.astype(series.cat.categories.dtype)
+        elif pd.api.types.is_signed_integer_dtype(series.dtype) and series.dtype != np.int64:
+            wide[column] = series.astype(np.int64)
+    return data.assign(**wide) if wide else data
+
+
+def lookup_wide(data: pd.DataFrame):
+    """
+    Get the wide frame of a frame if it was widened, or None.
+    """
+    with _wide_lock:
+        entry = _wide_frames.get(id(data))
+    if entry is None or entry[0]() is not data:
+        return None
+    return data if entry[1] is None else entry[1]
+
+
+def forget_wide(key: int) -> None:
+    """
+    Drop the wide frame and the lock of a garbage collected frame.
+    """
+    with _wide_lock:
+        _wide_frames.pop(key, None)
+        _widen_locks.pop(key, None)
+
+
+def widen_once(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Widen a frame once and reuse the wide frame for every Evidently run on the same frame, e.g. the reference data of
+    every report and test suite of a run, or the stratum of the suites of a stratum. The wide frame is kept until the
+    compact frame is garbage collected or released with release_wide.
+    """
+    wide = lookup_wide(data)
+    if wide is not None:
+        return wide
+
+    key = id(data)
+    with _wide_lock:
+        widen_lock = _widen_locks.setdefault(key, threading.Lock())
+    # concurrent runs on the same frame wait for a single conversion, outside the lock of every frame
+    with widen_lock:
+        wide = lookup_wide(data)
+        if wide is not None:
+            return wide
+        wide = widen_dtypes(data)
+        with _wide_lock:
+            # a frame without compact columns is its own wide frame, and mustn't be kept alive by the entry
+            _wide_frames[key] = (weakref.ref(data), None if wide is data else wide)
+        weakref.finalize(data, forget_wide, key)
+    return wide
+
+
+def release_wide(data: pd.DataFrame) -> None:
+    """
+    Drop the wide frame of a frame once no more Evidently runs need it, e.g. after the suites of a stratum.
+    """
+    with _wide_lock:
+        entry = _wide_frames.get(id(data))
+        if entry is not None and entry[0]() is data:
+            del _wide_frames[id(data)]
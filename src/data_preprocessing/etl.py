@@ -5,9 +5,20 @@ ETL pipeline script. This script is responsible for loading, validating, and spl
 import os
 
 from pendulum import local
-from src.data_preprocessing.fetch_data import fetch_and_merge
-from src.data_preprocessing.validate import validate_data
-from scripts.data_details import data_details
+from src.data_preprocessing.fetch_data import fetch_and_merge, move_rejected
+from src.data_preprocessing.validate import get_invalid_rows, validate_data
+from src.data_preprocessing.dtypes import get_memory_mb, normalize_dtypes
+from src.data_preprocessing.reference_manager import update_reference
+from src.data_preprocessing.reference_store import (
+    convert_legacy_reference,
+    get_reference_path,
+    is_validated,
+    read_reference,
+    stamp_validated,
+    write_reference,
+)
+from scripts.data_details import data_details, get_details_path, load_details
+from src.monitoring.instrumentation import stage
 import pandas as pd
 import logging
 
@@ -17,35 +28,39 @@ logger = logging.getLogger(__name__)
 
 def main_load_and_validate(config: dict) -> pd.DataFrame:
     """
-    Load and validate data from the database
+    Load and validate data from the database. Rows that fail validation are moved to the rejected collection before
+    the error is raised.
     """
     data = fetch_and_merge(config)
 
     # Validate the data
-    if not validate_data(data, config):
-        return None
+    with stage("etl.validate", config=config, rows=len(data)):
+        try:
+            if not validate_data(data, config):
+                return None
+        except ValueError:
+            # rows failing the schema are moved out of the pending collections, so that the next run goes on
+            rejected = get_invalid_rows(data, config)
+            if not rejected.empty:
+                logger.error(f"Moving {len(rejected)} rows that failed validation to the rejected collection.")
+                move_rejected(config, rejected[config["columns"]["study_id"]].tolist())
+            raise
     return data
 
 
 def reference_load_and_validate(config: dict, data: pd.DataFrame) -> pd.DataFrame:
     """
-    Load and validate reference data from the database or the provided data.
+    Load and validate reference data from the Parquet file or the provided data. Reference data that passed validation
+    unchanged, with the same config and schema, isn't validated again.
     """
-    reference_data = None
-    docker_reference_path = "/app/data/reference_data.csv"
-    local_reference_path = "data/reference_data.csv"
-    if os.path.exists(docker_reference_path):
-        reference_path = docker_reference_path
-    else:
-        reference_path = local_reference_path
-
-    os.makedirs(os.path.dirname(reference_path), exist_ok=True)
+    with stage("etl.convert_reference", config=config):
+        convert_legacy_reference(config)
+    reference_path = get_reference_path(config)
 
     if os.path.exists(reference_path):
-        if config["columns"]["timestamp"]:
-            reference_data = pd.read_csv(reference_path, parse_dates=[config["columns"]["timestamp"]])
-        else:
-            reference_data = pd.read_csv(reference_path)
+        with stage("etl.load_reference", config=config) as record:
+            reference_data = read_reference(reference_path)
+            record["rows"] = len(reference_data)
 
         # If the reference data is smaller than 50 rows, log a warning
         if len(reference_data) < 50:
@@ -53,12 +68,19 @@ def reference_load_and_validate(config: dict, data: pd.DataFrame) -> pd.DataFram
     else:
         logger.info("Reference data not found or empty, copying the current data.")
         reference_data = data.copy()
-        reference_data.to_csv(reference_path, index=False)
+        write_reference(reference_data, reference_path)
+
+    if is_validated(reference_path, config):
+        logger.info("Reference data is unchanged since it was validated, skipping validation.")
+        return reference_data
     try:
-        validate_data(reference_data, config)
+        with stage("etl.validate_reference", config=config, rows=len(reference_data)):
+            valid = validate_data(reference_data, config)
     except ValueError as e:
         logger.error(f"Reference data validation failed: {e}")
         raise
+    if valid:
+        stamp_validated(reference_path, config, len(reference_data))
     return reference_data
 
 
@@ -66,7 +88,21 @@ def set_details(data: pd.DataFrame, config: dict) -> None:
     """
     Get details about the data and store them in a JSON file.
     """
-    data_details(data, config)
+    with stage("etl.details", config=config, rows=len(data)):
+        data_details(data, config, get_details_path(config))
+
+
+def compact_data(data: pd.DataFrame, reference_data: pd.DataFrame, config: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Convert the current and reference data to compact dtypes, with the categories of the updated details.
+    """
+    with stage("etl.dtypes", config=config, rows=len(data) + len(reference_data)) as record:
+        memory_before = get_memory_mb(data) + get_memory_mb(reference_data)
+        data, reference_data = normalize_dtypes(data, reference_data, config, load_details(get_details_path(config)))
+        record["memory_before_mb"] = round(memory_before, 1)
+        record["memory_after_mb"] = round(get_memory_mb(data) + get_memory_mb(reference_data), 1)
+    logger.info(f"Data compacted from {record['memory_before_mb']} MB to {record['memory_after_mb']} MB.")
+    return data, reference_data
 
 
 def etl_pipeline(config: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
@@ -79,8 +115,11 @@ def etl_pipeline(config: dict) -> tuple[pd.DataFrame, pd.DataFrame]:
         logger.info("No new data available. Pipeline will exit normally.")
         return None, None
     logger.info("Data loaded and validated successfully.")
+    with stage("etl.update_reference", config=config):
+        update_reference(config, data)
     reference_data = reference_load_and_validate(config, data)
     logger.info("Reference data loaded and validated successfully.")
     set_details(data, config)
     logger.info("Details updated and saved successfully.")
+    data, reference_data = compact_data(data, reference_data, config)
     return data, reference_data
@@ -7,6 +7,7 @@ from pymongo import MongoClient
 from pymongo.errors import OperationFailure
 import logging
 import os
+from src.monitoring.instrumentation import stage
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -44,6 +45,29 @@ def get_timestamp_col(config: dict) -> str:
     return timestamp_col
 
 
+def fetch_matched_range(config: dict, start=None, end=None) -> pd.DataFrame:
+    """
+    Fetch the matched data of the model with a timestamp between start (inclusive) and end (exclusive). The timestamp
+    column is indexed, so the range is read without scanning the whole archive.
+    """
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_URI environment variable is not set")
+    db = get_db_connection(mongo_uri)
+    timestamp_col = get_timestamp_col(config)
+    collection = db[f"{config['model_config']['model_id']}_matched"]
+    collection.create_index(timestamp_col)
+
+    query = {}
+    if start is not None or end is not None:
+        query[timestamp_col] = {}
+        if start is not None:
+            query[timestamp_col]["$gte"] = pd.Timestamp(start).to_pydatetime()
+        if end is not None:
+            query[timestamp_col]["$lt"] = pd.Timestamp(end).to_pydatetime()
+    return pd.DataFrame(list(collection.find(query, {"_id": 0})))
+
+
 def process_duplicates(df: pd.DataFrame, config: dict) -> pd.DataFrame:
     """
     Process duplicates in the DataFrame based on the timestamp column.
@@ -92,9 +116,33 @@ def move_matched_data(
         logger.error(f"Error moving matched data: {e}")
 
 
+def merge_fetched(results: pd.DataFrame, labels: pd.DataFrame, config: dict) -> pd.DataFrame:
+    """
+    Merge the deduplicated results and labels fetched from MongoDB on the study id, dropping their MongoDB ids in place.
+    """
+    # Drop the _id columns from MongoDB
+    results.drop(columns=["_id"], inplace=True)
+    labels.drop(columns=["_id"], inplace=True)
+
+    # Drop the timestamp column from the labels
+    timestamp_col = get_timestamp_col(config)
+    if timestamp_col not in labels.columns:
+        timestamp_col = "timestamp"
+        if timestamp_col not in labels.columns:
+            logger.error(f"Timestamp column not found in the DataFrame.")
+        else:
+            labels.drop(columns=[timestamp_col], inplace=True)
+    else:
+        labels.drop(columns=[timestamp_col], inplace=True)
+
+    # Merge results and labels data
+    return pd.merge(results, labels, on=config["columns"]["study_id"])
+
+
 def fetch_and_merge(config: dict) -> pd.DataFrame:
     """
-    Fetch data from the MongoDB database and merge it into a single DataFrame.
+    Fetch data from the MongoDB database and merge it into a single DataFrame. The rows stay in the results and labels
+    collections until move_matched moves them, once the run over them succeeded.
     """
     mongo_uri = os.getenv("MONGO_URI")
     if not mongo_uri:
@@ -111,8 +159,10 @@ def fetch_and_merge(config: dict) -> pd.DataFrame:
 
     # Fetch results and labels data
     try:
-        results = fetch_data(db, f"{model_id}_results")
-        labels = fetch_data(db, f"{model_id}_labels")
+        with stage("etl.fetch", config=config) as record:
+            results = fetch_data(db, f"{model_id}_results")
+            labels = fetch_data(db, f"{model_id}_labels")
+            record["rows"] = len(results) + len(labels)
     except OperationFailure as e:
         logger.error(f"Error fetching data: {e}")
         return pd.DataFrame()
@@ -124,42 +174,60 @@ def fetch_and_merge(config: dict) -> pd.DataFrame:
         return pd.DataFrame()
 
     # Process duplicates
-    results = process_duplicates(results, config)
-    labels = process_duplicates(labels, config)
+    with stage("etl.dedup", config=config) as record:
+        results = process_duplicates(results, config)
+        labels = process_duplicates(labels, config)
+        record["rows"] = len(results) + len(labels)
+
+    with stage("etl.merge", config=config) as record:
+        merged_data = merge_fetched(results, labels, config)
+        record["rows"] = len(merged_data)
+    return merged_data
 
-    # Drop the _id columns from MongoDB
-    results.drop(columns=["_id"], inplace=True)
-    labels.drop(columns=["_id"], inplace=True)
 
-    # Drop the timestamp column from the labels
-    timestamp_col = get_timestamp_col(config)
-    if timestamp_col not in labels.columns:
-        timestamp_col = "timestamp"
-        if timestamp_col not in labels.columns:
-            logger.error(f"Timestamp column not found in the DataFrame.")
-        else:
-            labels.drop(columns=[timestamp_col], inplace=True)
-    else:
-        labels.drop(columns=[timestamp_col], inplace=True)
+def move_rows(config: dict, study_ids: list, destination: str) -> None:
+    """
+    Move the merged rows of the study ids from the results and labels collections of the model to its destination
+    collection, e.g. "matched".
+    """
+    mongo_uri = os.getenv("MONGO_URI")
+    if not mongo_uri:
+        raise ValueError("MONGO_URI environment variable is not set")
 
-    # Merge results and labels data
-    study_id_col = config["columns"]["study_id"]
-
-    merged_data = pd.merge(
-        results,
-        labels,
-        on=study_id_col,
-    )
-
-    # Move matched data to a new collection
-    matched_ids = merged_data[study_id_col].tolist()
-    move_matched_data(
-        db,
-        merged_data,
-        matched_ids,
-        f"{model_id}_results",
-        f"{model_id}_labels",
-        f"{model_id}_matched",
-        config,
-    )
-    return merged_data
+    db = get_db_connection(mongo_uri)
+    model_id = config["model_config"]["model_id"]
+    query = {config["columns"]["study_id"]: {"$in": study_ids}}
+
+    with stage(f"etl.move_{destination}", config=config, rows=len(study_ids)):
+        results = pd.DataFrame(list(db[f"{model_id}_results"].find(query)))
+        labels = pd.DataFrame(list(db[f"{model_id}_labels"].find(query)))
+        if results.empty or labels.empty:
+            logger.info(f"No {destination} rows left to move.")
+            return
+        merged_data = merge_fetched(process_duplicates(results, config), process_duplicates(labels, config), config)
+        move_matched_data(
+            db,
+            merged_data,
+            study_ids,
+            f"{model_id}_results",
+            f"{model_id}_labels",
+            f"{model_id}_{destination}",
+            config,
+        )
+
+
+def move_matched(config: dict, matched_ids: list) -> None:
+    """
+    Move the matched rows of the study ids from the results and labels collections to the matched collection. The flow
+    calls it once the snapshots of a run were generated, so a failed run is retried on the same rows and reuses the
+    cached snapshots of its unchanged strata.
+    """
+    move_rows(config, matched_ids, "matched")
+
+
+def move_rejected(config: dict, rejected_ids: list) -> None:
+    """
+    Move the rows of the study ids that failed validation to the rejected collection, where they can be inspected and
+    ingested again once fixed. Left pending, they would be fetched and fail the validation of every run.
+    """
+    move_rows(config, rejected_ids, "rejected")
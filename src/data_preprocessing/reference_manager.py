@@ -0,0 +1,172 @@
+"""
+Management of the reference data of a model by strategy. With the default fixed strategy, the reference data is the
+first batch of data, or the reference data placed in the data directory, and is never replaced. The windowed strategies
+select the reference rows from the archive of matched data by timestamp:
+
+- last_n_days: the matched rows of the last N days.
+- same_period_last_year: the matched rows of the same N days one year ago, for data with seasonal patterns.
+
+The windows are aligned to days, so the reference data changes once a day and the snapshot cache stays valid between
+the runs of a day. The reference data of every window is cached per strategy, and is swapped in between runs by
+replacing the reference data file atomically.
+"""
+
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+from pymongo.errors import PyMongoError
+
+from src.data_preprocessing.fetch_data import fetch_matched_range
+from src.data_preprocessing.reference_store import (
+    get_reference_dir,
+    get_reference_path,
+    hash_file,
+    write_reference,
+)
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REFERENCE_CACHE_DIR = "references"
+STRATEGIES = ["fixed", "last_n_days", "same_period_last_year"]
+DEFAULT_REFERENCE = {
+    "strategy": "fixed",
+    "days": 30,
+    "min_rows": 50,
+}
+
+
+def get_reference_settings(config: dict) -> dict:
+    """
+    Get the reference settings from the config, with the defaults for missing settings.
+    """
+    settings = config.get("reference", {})
+    settings = {key: settings.get(key, default) for key, default in DEFAULT_REFERENCE.items()}
+    if settings["strategy"] not in STRATEGIES:
+        raise ValueError(f"Unknown reference strategy {settings['strategy']}, use one of {', '.join(STRATEGIES)}.")
+    return settings
+
+
+def get_reference_window(settings: dict, now: datetime = None) -> tuple:
+    """
+    Get the start (inclusive) and end (exclusive) of the reference window of a windowed strategy, aligned to days.
+    """
+    now = pd.Timestamp(now or datetime.now(timezone.utc))
+    if now.tzinfo is not None:
+        # MongoDB stores the timestamps in UTC without a time zone
+        now = now.tz_convert("UTC").tz_localize(None)
+    end = now.floor("D")
+    if settings["strategy"] == "same_period_last_year":
+        end = end - pd.DateOffset(years=1)
+    return end - pd.Timedelta(days=settings["days"]), end
+
+
+def get_cache_paths(config: dict, strategy: str) -> tuple:
+    """
+    Get the cached reference data of a strategy and its metadata file.
+    """
+    cache_dir = os.path.join(get_reference_dir(config), REFERENCE_CACHE_DIR)
+    return os.path.join(cache_dir, f"{strategy}.parquet"), os.path.join(cache_dir, f"{strategy}.json")
+
+
+def load_cache_metadata(metadata_path: str) -> dict:
+    """
+    Load the metadata of a cached reference data, or an empty dict if there is none.
+    """
+    if not os.path.exists(metadata_path):
+        return {}
+    try:
+        with open(metadata_path, "r") as file:
+            return json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read the reference metadata {metadata_path}: {e}")
+        return {}
+
+
+def save_cache_metadata(metadata: dict, metadata_path: str) -> None:
+    """
+    Save the metadata of a cached reference data atomically.
+    """
+    tmp_path = f"{metadata_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(metadata, file, indent=2)
+    os.replace(tmp_path, metadata_path)
+
+
+def build_reference(config: dict, start, end, exclude_ids: list = None) -> pd.DataFrame:
+    """
+    Select the matched rows of the window from the archive, without the rows of the current data.
+    """
+    reference_data = fetch_matched_range(config, start, end)
+    if exclude_ids is not None and not reference_data.empty:
+        study_id_col = config["columns"]["study_id"]
+        reference_data = reference_data[~reference_data[study_id_col].isin(exclude_ids)].reset_index(drop=True)
+    return reference_data
+
+
+def swap_reference(cache_path: str, reference_path: str) -> None:
+    """
+    Replace the reference data with the cached reference data of a strategy. The copy is renamed over the reference
+    data, so a run reads either the previous or the new reference data.
+    """
+    os.makedirs(os.path.dirname(reference_path), exist_ok=True)
+    tmp_path = f"{reference_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        shutil.copyfile(cache_path, tmp_path)
+        os.replace(tmp_path, reference_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def update_reference(config: dict, data: pd.DataFrame, now: datetime = None) -> bool:
+    """
+    Select the reference data of the configured strategy and swap it in if it changed. A window with fewer than
+    min_rows rows keeps the previous reference data. Return whether the reference data was replaced.
+    """
+    settings = get_reference_settings(config)
+    if settings["strategy"] == "fixed":
+        return False
+    start, end = get_reference_window(settings, now)
+    cache_path, metadata_path = get_cache_paths(config, settings["strategy"])
+    metadata = load_cache_metadata(metadata_path)
+
+    window = {"start": start.isoformat(), "end": end.isoformat(), "days": settings["days"]}
+    if any(metadata.get(key) != value for key, value in window.items()) or not os.path.exists(cache_path):
+        try:
+            reference_data = build_reference(config, start, end, data[config["columns"]["study_id"]].tolist())
+        except PyMongoError as e:
+            logger.error(f"Error fetching the reference data, keeping the previous reference data: {e}")
+            return False
+        if len(reference_data) < settings["min_rows"]:
+            logger.warning(
+                f"The {settings['strategy']} reference window from {window['start']} to {window['end']} has "
+                f"{len(reference_data)} matched rows, fewer than {settings['min_rows']}. Keeping the previous "
+                "reference data."
+            )
+            return False
+        write_reference(reference_data, cache_path)
+        metadata = {
+            **window,
+            "strategy": settings["strategy"],
+            "rows": len(reference_data),
+            "file_hash": hash_file(cache_path),
+            "built_at": datetime.now(timezone.utc).isoformat(),
+        }
+        save_cache_metadata(metadata, metadata_path)
+        logger.info(f"Built the {settings['strategy']} reference data with {len(reference_data)} rows.")
+
+    reference_path = get_reference_path(config)
+    if os.path.exists(reference_path) and hash_file(reference_path) == metadata["file_hash"]:
+        return False
+    swap_reference(cache_path, reference_path)
+    logger.info(
+        f"Swapped in the {settings['strategy']} reference data from {metadata['start']} to {metadata['end']} "
+        f"({metadata['rows']} rows)."
+    )
+    return True
@@ -0,0 +1,142 @@
+"""
+Storage of the reference data of a model as Parquet, a columnar binary format that keeps the dtypes, so loading it is a
+fast columnar read without parsing text or dates. Next to the file, a validation stamp records the hash of the file
+that passed validation, with the hashes of the config and the JSON schema it was validated against. While neither
+changed, the reference data isn't validated again.
+
+A reference_data.csv placed in the data directory, e.g. the reference data of an older version, is converted to
+Parquet on the next run and renamed to reference_data.csv.bak.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.utils.config_manager import get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+REFERENCE_FILE = "reference_data.parquet"
+LEGACY_REFERENCE_FILE = "reference_data.csv"
+STAMP_FILE = "reference_data.stamp.json"
+SCHEMA_PATH = "config/schema.json"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def get_reference_dir(config: dict = None) -> str:
+    """
+    Get the data directory of the model, where its reference data is kept.
+    """
+    return get_data_dir(config)
+
+
+def get_reference_path(config: dict = None) -> str:
+    """
+    Get the Parquet file of the reference data of the model.
+    """
+    return os.path.join(get_reference_dir(config), REFERENCE_FILE)
+
+
+def hash_file(file_path: str) -> str:
+    """
+    Hash the contents of a file, reading it in chunks.
+    """
+    hasher = hashlib.sha256()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def hash_validation_rules(config: dict) -> str:
+    """
+    Hash the config and the JSON schema the reference data is validated against.
+    """
+    hasher = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode("utf-8"))
+    if os.path.exists(SCHEMA_PATH):
+        hasher.update(hash_file(SCHEMA_PATH).encode("utf-8"))
+    return hasher.hexdigest()
+
+
+def read_reference(file_path: str) -> pd.DataFrame:
+    """
+    Read the reference data from its Parquet file.
+    """
+    return pd.read_parquet(file_path)
+
+
+def write_reference(data: pd.DataFrame, file_path: str) -> None:
+    """
+    Write the reference data to its Parquet file atomically, so a run never reads a partly written file.
+    """
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        data.to_parquet(tmp_path, index=False)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def convert_legacy_reference(config: dict) -> bool:
+    """
+    Convert a reference_data.csv in the data directory of the model to Parquet, replacing the current reference data,
+    and rename the CSV so it is converted once. Return whether a CSV was converted.
+    """
+    reference_dir = get_reference_dir(config)
+    csv_path = os.path.join(reference_dir, LEGACY_REFERENCE_FILE)
+    if not os.path.exists(csv_path):
+        return False
+    timestamp_col = config["columns"]["timestamp"]
+    data = pd.read_csv(csv_path, parse_dates=[timestamp_col] if timestamp_col else False)
+    write_reference(data, os.path.join(reference_dir, REFERENCE_FILE))
+    os.replace(csv_path, f"{csv_path}.bak")
+    logger.info(f"Converted {csv_path} to Parquet, the CSV was renamed to {LEGACY_REFERENCE_FILE}.bak.")
+    return True
+
+
+def get_stamp_path(file_path: str) -> str:
+    """
+    Get the validation stamp of a reference data file.
+    """
+    return os.path.join(os.path.dirname(file_path), STAMP_FILE)
+
+
+def is_validated(file_path: str, config: dict) -> bool:
+    """
+    Check whether the reference data file, as it is now, passed validation with the current config and schema.
+    """
+    stamp_path = get_stamp_path(file_path)
+    if not os.path.exists(stamp_path):
+        return False
+    try:
+        with open(stamp_path, "r") as file:
+            stamp = json.load(file)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not read the validation stamp {stamp_path}: {e}")
+        return False
+    return stamp.get("file_hash") == hash_file(file_path) and stamp.get("rules_hash") == hash_validation_rules(config)
+
+
+def stamp_validated(file_path: str, config: dict, rows: int) -> None:
+    """
+    Record that the reference data file passed validation with the current config and schema.
+    """
+    stamp = {
+        "file_hash": hash_file(file_path),
+        "rules_hash": hash_validation_rules(config),
+        "rows": rows,
+        "validated_at": datetime.now(timezone.utc).isoformat(),
+    }
+    stamp_path = get_stamp_path(file_path)
+    tmp_path = f"{stamp_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(stamp, file, indent=2)
+    os.replace(tmp_path, stamp_path)
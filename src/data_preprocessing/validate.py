@@ -97,16 +97,22 @@ def validate_row(row: pd.Series, mapping: dict, schema: dict) -> bool:
         return False
 
 
-def validate_schema(data: pd.DataFrame, mapping: dict) -> bool:
+def get_valid_rows(data: pd.DataFrame, mapping: dict) -> pd.Series:
     """
-    Validate the data in a dataframe against the JSON schema
+    Validate each row of a dataframe against the JSON schema, return the mask of the valid rows.
     """
     # load the JSON schema file
     with open("config/schema.json", "r") as f:
         schema = json.load(f)
+    return data.apply(validate_row, axis=1, args=(mapping, schema))
+
 
+def validate_schema(data: pd.DataFrame, mapping: dict) -> bool:
+    """
+    Validate the data in a dataframe against the JSON schema
+    """
     # validate each row of the DataFrame
-    valid_rows = data.apply(validate_row, axis=1, args=(mapping, schema))
+    valid_rows = get_valid_rows(data, mapping)
     if not valid_rows.all():
         logger.error("Data validation failed.")
         raise ValueError("Data validation failed")
@@ -149,3 +155,13 @@ def validate_data(data: pd.DataFrame, config: dict) -> bool:
     # validate schema for each row of the DataFrame
     validate_schema(data, mapping)
     return True
+
+
+def get_invalid_rows(data: pd.DataFrame, config: dict) -> pd.DataFrame:
+    """
+    Return the rows of a DataFrame that fail the JSON schema, none if the DataFrame misses required columns.
+    """
+    mapping = config_mappings(config["columns"])
+    if not extract_columns(mapping, set(), config).issubset(data.columns):
+        return data.iloc[0:0]
+    return data[~get_valid_rows(data, mapping).astype(bool)]
@@ -0,0 +1,222 @@
+"""
+Persistent per-stratum metric accumulators. Each flow run adds the sufficient statistics of the new batch (counts, error
+sums, confusion matrix cells) to a small SQLite store, bucketed by run and day, so rolling RMSE, MAE, accuracy and F1
+over the last 7, 30 and 90 days can be published without reprocessing history.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from src.data_preprocessing.fetch_data import get_timestamp_col
+from src.utils.config_manager import get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ROLLING_WINDOWS = (7, 30, 90)
+
+STATISTICS = [
+    "regression_count",
+    "sum_error",
+    "sum_abs_error",
+    "sum_squared_error",
+    "classification_count",
+    "tp",
+    "fp",
+    "tn",
+    "fn",
+]
+
+
+def compute_statistics(data: pd.DataFrame, config: dict, run_day: str) -> pd.DataFrame:
+    """
+    Compute the sufficient statistics of a batch, one row per day. Rows without a timestamp are assigned to the run day.
+    """
+    timestamp_col = get_timestamp_col(config)
+    if timestamp_col in data.columns:
+        days = pd.to_datetime(data[timestamp_col], errors="coerce").dt.strftime("%Y-%m-%d").fillna(run_day)
+    else:
+        days = pd.Series(run_day, index=data.index)
+
+    statistics = pd.DataFrame({"day": days.to_numpy()})
+    for statistic in STATISTICS:
+        statistics[statistic] = 0.0
+
+    model_type = config["model_config"]["model_type"]
+    if model_type["regression"]:
+        prediction = pd.to_numeric(data[config["columns"]["predictions"]["regression_prediction"]], errors="coerce")
+        label = pd.to_numeric(data[config["columns"]["labels"]["regression_label"]], errors="coerce")
+        error = (prediction - label).to_numpy(dtype=float)
+        valid = ~np.isnan(error)
+        statistics["regression_count"] = valid.astype(float)
+        statistics["sum_error"] = np.where(valid, error, 0.0)
+        statistics["sum_abs_error"] = np.where(valid, np.abs(error), 0.0)
+        statistics["sum_squared_error"] = np.where(valid, np.square(error), 0.0)
+
+    if model_type["binary_classification"]:
+        prediction = pd.to_numeric(
+            data[config["columns"]["predictions"]["classification_prediction"]], errors="coerce"
+        )
+        label = pd.to_numeric(data[config["columns"]["labels"]["classification_label"]], errors="coerce")
+        valid = (prediction.notna() & label.notna()).to_numpy()
+        predicted_positive = (prediction == 1).to_numpy() & valid
+        predicted_negative = (prediction != 1).to_numpy() & valid
+        actual_positive = (label == 1).to_numpy() & valid
+        statistics["classification_count"] = valid.astype(float)
+        statistics["tp"] = (predicted_positive & actual_positive).astype(float)
+        statistics["fp"] = (predicted_positive & ~actual_positive).astype(float)
+        statistics["tn"] = (predicted_negative & ~actual_positive).astype(float)
+        statistics["fn"] = (predicted_negative & actual_positive).astype(float)
+
+    return statistics.groupby("day", as_index=False)[STATISTICS].sum()
+
+
+def metrics_from_statistics(statistics: dict) -> dict:
+    """
+    Compute the performance metrics from summed sufficient statistics.
+    """
+    metrics = {
+        "regression_count": int(statistics["regression_count"]),
+        "classification_count": int(statistics["classification_count"]),
+    }
+    n = statistics["regression_count"]
+    if n:
+        metrics["rmse"] = float(np.sqrt(statistics["sum_squared_error"] / n))
+        metrics["mae"] = float(statistics["sum_abs_error"] / n)
+        metrics["me"] = float(statistics["sum_error"] / n)
+
+    n = statistics["classification_count"]
+    if n:
+        tp, fp, tn, fn = (statistics[key] for key in ["tp", "fp", "tn", "fn"])
+        metrics["accuracy"] = float((tp + tn) / n)
+        metrics["precision"] = float(tp / (tp + fp)) if tp + fp else 0.0
+        metrics["recall"] = float(tp / (tp + fn)) if tp + fn else 0.0
+        metrics["f1"] = float(2 * tp / (2 * tp + fp + fn)) if tp + fp + fn else 0.0
+    return metrics
+
+
+class AccumulatorStore:
+    def __init__(self, db_path: str = None):
+        """
+        Open the accumulator store, creating the tables if they don't exist. The statistics are kept per run, so a
+        retried run replaces its own contribution and the contribution of a failed run can be removed.
+        """
+        self.db_path = db_path or os.path.join(get_data_dir(), "accumulators.db")
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path)
+        columns = ", ".join(f"{statistic} REAL NOT NULL DEFAULT 0" for statistic in STATISTICS)
+        with self.connection:
+            existing = [row[1] for row in self.connection.execute("PRAGMA table_info(accumulators)")]
+            if existing and "run" not in existing:
+                # stores from before the statistics were kept per run keep their sums as one unnamed run
+                self.connection.execute("ALTER TABLE accumulators RENAME TO legacy_accumulators")
+            self.connection.execute(
+                f"CREATE TABLE IF NOT EXISTS accumulators "
+                f"(stratum TEXT, run TEXT, day TEXT, {columns}, PRIMARY KEY (stratum, run, day))"
+            )
+            if existing and "run" not in existing:
+                self.connection.execute(
+                    f"INSERT INTO accumulators (stratum, run, day, {', '.join(STATISTICS)}) "
+                    f"SELECT stratum, '', day, {', '.join(STATISTICS)} FROM legacy_accumulators"
+                )
+                self.connection.execute("DROP TABLE legacy_accumulators")
+                self.connection.execute("DROP TABLE IF EXISTS batches")
+
+    def close(self) -> None:
+        """
+        Close the connection to the store.
+        """
+        self.connection.close()
+
+    def update(self, stratum: str, data: pd.DataFrame, config: dict, run: str) -> None:
+        """
+        Add a batch of a stratum to the accumulators as the contribution of the run, replacing the contribution the
+        run already added.
+        """
+        statistics = compute_statistics(data, config, run[:10])
+
+        placeholders = ", ".join("?" for _ in range(len(STATISTICS) + 3))
+        with self.connection:
+            self.connection.execute("DELETE FROM accumulators WHERE stratum = ? AND run = ?", (stratum, run))
+            self.connection.executemany(
+                f"INSERT INTO accumulators (stratum, run, day, {', '.join(STATISTICS)}) VALUES ({placeholders})",
+                [(stratum, run, *row) for row in statistics[["day"] + STATISTICS].itertuples(index=False)],
+            )
+
+    def delete_runs(self, runs: list) -> int:
+        """
+        Remove the contributions of the runs from the accumulators. Return the number of rows removed.
+        """
+        with self.connection:
+            return self.connection.executemany(
+                "DELETE FROM accumulators WHERE run = ?", [(run,) for run in runs]
+            ).rowcount
+
+    def rolling_metrics(self, stratum: str, end_day: str, windows: tuple = ROLLING_WINDOWS) -> dict:
+        """
+        Compute the metrics of a stratum over the rolling windows (in days) ending on end_day.
+        """
+        end = datetime.strptime(end_day, "%Y-%m-%d")
+        sums = ", ".join(f"COALESCE(SUM({statistic}), 0)" for statistic in STATISTICS)
+        rolling = {}
+        for window in windows:
+            start_day = (end - timedelta(days=window - 1)).strftime("%Y-%m-%d")
+            row = self.connection.execute(
+                f"SELECT {sums} FROM accumulators WHERE stratum = ? AND day >= ? AND day <= ?",
+                (stratum, start_day, end_day),
+            ).fetchone()
+            rolling[f"{window}d"] = metrics_from_statistics(dict(zip(STATISTICS, row)))
+        return rolling
+
+
+def update_accumulators(
+    stratifications: dict, config: dict, timestamp: str, db_path: str = None, replaced_runs: list = ()
+) -> dict:
+    """
+    Add the strata of a run to the accumulators and return the rolling metrics of every stratum. The contributions of
+    the replaced runs, the failed runs whose rows the run generated again, are removed first.
+    """
+    run_day = timestamp[:10]
+    store = AccumulatorStore(db_path)
+    rolling = {}
+    try:
+        if replaced_runs:
+            store.delete_runs(replaced_runs)
+        for key, data in stratifications.items():
+            stratum = key.rsplit("_", 1)[0]
+            store.update(stratum, data, config, timestamp)
+            rolling[stratum] = store.rolling_metrics(stratum, run_day)
+    finally:
+        store.close()
+    return rolling
+
+
+def delete_accumulated_runs(runs: list, db_path: str = None) -> None:
+    """
+    Remove the contributions of the runs from the accumulators, e.g. of the failed runs removed from the dashboard.
+    """
+    store = AccumulatorStore(db_path)
+    try:
+        deleted = store.delete_runs(runs)
+    finally:
+        store.close()
+    logger.info(f"Deleted {deleted} accumulator rows of the runs {runs}.")
+
+
+def save_rolling_metrics(rolling: dict, timestamp: str, file_path: str = None) -> None:
+    """
+    Save the rolling metrics of the run to a JSON file and log the metrics of the main stratum.
+    """
+    file_path = file_path or os.path.join(get_data_dir(), "rolling_metrics.json")
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "w") as file:
+        json.dump({"timestamp": timestamp, "strata": rolling}, file, indent=2)
+
+    for window, metrics in rolling.get("main", {}).items():
+        logger.info(f"Rolling {window} metrics (main): {metrics}")
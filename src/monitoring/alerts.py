@@ -42,6 +42,40 @@ def check_test_results(test_suite, tags):
     return False, []
 
 
+def check_interval_alerts(intervals, thresholds):
+    """
+    Check the metric confidence intervals against the thresholds. A stratum only fails when its whole interval is
+    beyond the threshold, so small strata with wide intervals don't trigger false alerts.
+    """
+    failed_tests = []
+    for stratum, metrics in intervals.items():
+        for metric, bounds in thresholds.items():
+            if metric not in metrics:
+                continue
+            interval = metrics[metric]
+            description = (
+                f"{metric} in stratum '{stratum}' is {interval['value']:.4f} "
+                f"(CI {interval['lower']:.4f} to {interval['upper']:.4f}, n={interval['n']})"
+            )
+            if "max" in bounds and interval["lower"] > bounds["max"]:
+                failed_tests.append(
+                    {
+                        "name": f"{metric} ({stratum})",
+                        "description": f"{description}, above {bounds['max']}",
+                        "status": "FAIL",
+                    }
+                )
+            elif "min" in bounds and interval["upper"] < bounds["min"]:
+                failed_tests.append(
+                    {
+                        "name": f"{metric} ({stratum})",
+                        "description": f"{description}, below {bounds['min']}",
+                        "status": "FAIL",
+                    }
+                )
+    return bool(failed_tests), failed_tests
+
+
 def generate_alert_message(all_failed_tests, config):
     """
     Generate an alert message for the failed tests.
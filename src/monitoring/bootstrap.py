@@ -0,0 +1,214 @@
+"""
+Vectorized bootstrap confidence intervals for the performance metrics of every stratum.
+
+The resampling matrix is drawn once per run as uniform numbers of shape (n_resamples, largest stratum size) and shared
+by all strata: a stratum of n rows uses floor(u * n) of its first n columns as resampling indices. The matrix is drawn
+and consumed chunk_size resamples at a time, which bounds memory to chunk_size * largest stratum size. By default the
+chunk size is derived from a memory budget per chunk, so all resamples are drawn at once only if they fit in it.
+"""
+
+import json
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.utils.config_manager import get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CHUNK_MEMORY_MB = 64
+# the uniform numbers (float32) and resampling indices (int64) of every resampled value
+INDEX_BYTES = 4 + 8
+
+
+def prepare_arrays(data: pd.DataFrame, config: dict) -> dict:
+    """
+    Extract the per-row arrays needed to compute the metrics of a stratum, grouped by model type. Rows with missing
+    values are dropped.
+    """
+    arrays = {}
+    model_type = config["model_config"]["model_type"]
+    if model_type["regression"]:
+        prediction = pd.to_numeric(data[config["columns"]["predictions"]["regression_prediction"]], errors="coerce")
+        label = pd.to_numeric(data[config["columns"]["labels"]["regression_label"]], errors="coerce")
+        error = (prediction - label).to_numpy(dtype=float)
+        arrays["regression"] = {"error": error[~np.isnan(error)]}
+
+    if model_type["binary_classification"]:
+        prediction = pd.to_numeric(
+            data[config["columns"]["predictions"]["classification_prediction"]], errors="coerce"
+        )
+        label = pd.to_numeric(data[config["columns"]["labels"]["classification_label"]], errors="coerce")
+        valid = (prediction.notna() & label.notna()).to_numpy()
+        predicted_positive = (prediction == 1).to_numpy()[valid]
+        actual_positive = (label == 1).to_numpy()[valid]
+        arrays["classification"] = {
+            "correct": predicted_positive == actual_positive,
+            "tp": predicted_positive & actual_positive,
+            "predicted_positive": predicted_positive,
+            "actual_positive": actual_positive,
+        }
+    return arrays
+
+
+def regression_metrics(error: np.ndarray) -> dict:
+    """
+    Compute the regression metrics along the last axis of an error array.
+    """
+    return {
+        "rmse": np.sqrt(np.mean(np.square(error), axis=-1)),
+        "mae": np.mean(np.abs(error), axis=-1),
+        "me": np.mean(error, axis=-1),
+    }
+
+
+def classification_metrics(correct, tp, predicted_positive, actual_positive) -> dict:
+    """
+    Compute the classification metrics along the last axis of indicator arrays.
+    """
+    tp = np.sum(tp, axis=-1, dtype=float)
+    predicted_positive = np.sum(predicted_positive, axis=-1, dtype=float)
+    actual_positive = np.sum(actual_positive, axis=-1, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return {
+            "accuracy": np.mean(correct, axis=-1),
+            "precision": np.nan_to_num(tp / predicted_positive),
+            "recall": np.nan_to_num(tp / actual_positive),
+            "f1": np.nan_to_num(2 * tp / (predicted_positive + actual_positive)),
+        }
+
+
+def group_metrics(group: str, arrays: dict, indices: np.ndarray = None) -> dict:
+    """
+    Compute the metrics of a model type group, on resampled rows if indices of shape (n_resamples, n) are given.
+    """
+    if indices is not None:
+        arrays = {name: values[indices] for name, values in arrays.items()}
+    if group == "regression":
+        return regression_metrics(arrays["error"])
+    return classification_metrics(
+        arrays["correct"], arrays["tp"], arrays["predicted_positive"], arrays["actual_positive"]
+    )
+
+
+def iter_uniform_chunks(n_resamples: int, size: int, chunk_size: int = None, seed: int = 0):
+    """
+    Yield the uniform resampling matrix in chunks of at most chunk_size resamples (all at once if chunk_size is None).
+    """
+    rng = np.random.default_rng(seed)
+    chunk_size = chunk_size or n_resamples
+    for start in range(0, n_resamples, chunk_size):
+        yield rng.random((min(chunk_size, n_resamples - start), size), dtype=np.float32)
+
+
+def get_chunk_size(n_resamples: int, size: int, bytes_per_value: int, memory_mb: float = CHUNK_MEMORY_MB) -> int:
+    """
+    Get the number of resamples per chunk that keeps a chunk of the largest stratum, taking bytes_per_value for every
+    resample and row, within memory_mb. All resamples are drawn at once if they fit.
+    """
+    budget = int(memory_mb * 1024 * 1024)
+    return int(max(1, min(n_resamples, budget // max(1, size * bytes_per_value))))
+
+
+def bootstrap_intervals(
+    stratifications: dict,
+    config: dict,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    chunk_size: int = None,
+    seed: int = 0,
+    memory_mb: float = CHUNK_MEMORY_MB,
+) -> dict:
+    """
+    Compute percentile bootstrap confidence intervals for the metrics of every stratum. Without chunk_size, the
+    resamples are processed in chunks of at most memory_mb.
+    """
+    arrays = {key.rsplit("_", 1)[0]: prepare_arrays(data, config) for key, data in stratifications.items()}
+    sizes = {
+        (stratum, group): len(next(iter(group_arrays.values())))
+        for stratum, stratum_arrays in arrays.items()
+        for group, group_arrays in stratum_arrays.items()
+    }
+    sizes = {key: size for key, size in sizes.items() if size > 0}
+    if not sizes:
+        return {}
+
+    if chunk_size is None:
+        # the resampled arrays of a group take the sum of their item sizes for every value
+        bytes_per_value = INDEX_BYTES + max(
+            sum(values.itemsize for values in group_arrays.values())
+            for stratum_arrays in arrays.values()
+            for group_arrays in stratum_arrays.values()
+        )
+        chunk_size = get_chunk_size(n_resamples, max(sizes.values()), bytes_per_value, memory_mb)
+
+    # draw the resampling matrix once, chunk by chunk, and apply each chunk to every stratum
+    resampled = {key: {} for key in sizes}
+    for uniform in iter_uniform_chunks(n_resamples, max(sizes.values()), chunk_size, seed):
+        for (stratum, group), n in sizes.items():
+            indices = (uniform[:, :n] * n).astype(np.int64)
+            # float32 rounding can produce n for values just below 1
+            np.minimum(indices, n - 1, out=indices)
+            for metric, values in group_metrics(group, arrays[stratum][group], indices).items():
+                resampled[(stratum, group)].setdefault(metric, []).append(values)
+
+    alpha = (1 - confidence) / 2
+    intervals = {}
+    for (stratum, group), n in sizes.items():
+        point_estimates = group_metrics(group, arrays[stratum][group])
+        for metric, value in point_estimates.items():
+            lower, upper = np.quantile(np.concatenate(resampled[(stratum, group)][metric]), [alpha, 1 - alpha])
+            intervals.setdefault(stratum, {})[metric] = {
+                "value": float(value),
+                "lower": float(lower),
+                "upper": float(upper),
+                "n": n,
+            }
+    return intervals
+
+
+def compute_intervals(stratifications: dict, config: dict) -> dict:
+    """
+    Compute the confidence intervals with the bootstrap settings from the config.
+    """
+    settings = config.get("bootstrap", {})
+    return bootstrap_intervals(
+        stratifications,
+        config,
+        n_resamples=settings.get("n_resamples", 1000),
+        confidence=settings.get("confidence", 0.95),
+        chunk_size=settings.get("chunk_size"),
+        seed=settings.get("seed", 0),
+        memory_mb=settings.get("chunk_memory_mb", CHUNK_MEMORY_MB),
+    )
+
+
+def get_intervals_path(config: dict = None) -> str:
+    """
+    Get the path of the JSON file with the confidence intervals of the latest run of the model.
+    """
+    return os.path.join(get_data_dir(config), "intervals.json")
+
+
+def save_intervals(intervals: dict, timestamp: str, file_path: str = None) -> None:
+    """
+    Save the confidence intervals of the run to a JSON file.
+    """
+    file_path = file_path or get_intervals_path()
+    os.makedirs(os.path.dirname(os.path.abspath(file_path)), exist_ok=True)
+    with open(file_path, "w") as file:
+        json.dump({"timestamp": timestamp, "strata": intervals}, file, indent=2)
+
+
+def load_intervals(file_path: str = None) -> dict:
+    """
+    Load the confidence intervals of the latest run, or an empty dictionary if there are none.
+    """
+    file_path = file_path or get_intervals_path()
+    if not os.path.exists(file_path):
+        return {}
+    with open(file_path, "r") as file:
+        return json.load(file)
@@ -0,0 +1,243 @@
+"""
+Content-addressed cache for stratum snapshots. A stratum whose rows, reference data and config are unchanged since a previous run reuses the stored snapshot instead of re-running Evidently.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import defaultdict
+
+import pandas as pd
+
+from src.monitoring.snapshots import get_compression, read_snapshot_data, write_snapshot_data
+from src.utils.config_manager import namespaced
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_NAME = ".cache"
+
+
+def get_cache_dir(config: dict = None) -> str:
+    """
+    Get the cache directory inside the snapshots folder of the model. The leading dot keeps it out of log_snapshots.
+    """
+    if os.path.exists("/app"):
+        return f"{namespaced('/app/snapshots', config)}/{CACHE_DIR_NAME}"
+    return f"{namespaced('snapshots', config)}/{CACHE_DIR_NAME}"
+
+
+def hash_dataframe(data: pd.DataFrame) -> str:
+    """
+    Hash the contents of a DataFrame. The hash ignores the index and the row order, so the same rows fetched in a different order produce the same hash.
+    """
+    hasher = hashlib.sha256()
+    hasher.update(json.dumps([str(col) for col in data.columns]).encode("utf-8"))
+    hasher.update(json.dumps([str(dtype) for dtype in data.dtypes]).encode("utf-8"))
+    if not data.empty:
+        row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+        row_hashes.sort()
+        hasher.update(row_hashes.tobytes())
+    return hasher.hexdigest()
+
+
+def hash_config(config: dict) -> str:
+    """
+    Hash the configuration. Any change to the config invalidates the cached snapshots.
+    """
+    try:
+        from evidently import __version__ as evidently_version
+    except ImportError:
+        evidently_version = "unknown"
+    payload = json.dumps({"config": config, "evidently": evidently_version}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def write_json_atomic(file_path: str, content: dict) -> None:
+    """
+    Write a JSON file atomically by writing to a temporary file and renaming it.
+    """
+    tmp_path = f"{file_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(content, file)
+    os.replace(tmp_path, file_path)
+
+
+class SnapshotCache:
+    def __init__(self, reference_data: pd.DataFrame, config: dict, cache_dir: str = None):
+        """
+        Initialize the cache with the hashes shared by every stratum in the run.
+        """
+        self.cache_dir = cache_dir or get_cache_dir(config)
+        self.reference_hash = hash_dataframe(reference_data)
+        self.config_hash = hash_config(config)
+        self.compression, self.level = get_compression(config)
+        self.hits = defaultdict(int)
+        self.misses = defaultdict(int)
+        self._data_hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _hash_data(self, data: pd.DataFrame) -> str:
+        """
+        Hash the stratum data, reusing the hash if the same DataFrame was already hashed in this run.
+        """
+        with self._lock:
+            cached = self._data_hashes.get(id(data))
+        # keep a reference to the DataFrame so its id cannot be reused by another object
+        if cached is not None and cached[0] is data:
+            return cached[1]
+        data_hash = hash_dataframe(data)
+        with self._lock:
+            self._data_hashes[id(data)] = (data, data_hash)
+        return data_hash
+
+    def make_key(self, data: pd.DataFrame, folder_path: str, output_name: str) -> str:
+        """
+        Build the cache key for one snapshot of a stratum.
+        """
+        parts = [output_name, folder_path, self._hash_data(data), self.reference_hash, self.config_hash]
+        return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        """
+        Get the path of the cache entry for a key.
+        """
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _record(self, output_name: str, hit: bool) -> None:
+        """
+        Record a cache hit or miss for the run statistics.
+        """
+        with self._lock:
+            if hit:
+                self.hits[output_name] += 1
+            else:
+                self.misses[output_name] += 1
+
+    def restore(self, key: str, output_path: str, timestamp: str, output_name: str) -> bool:
+        """
+        Copy the cached snapshot for the key to the output path with a new id and timestamp. Return False on a miss.
+        """
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, "r") as file:
+                cached_path = json.load(file)["path"]
+            snapshot_data = read_snapshot_data(cached_path)
+        except (FileNotFoundError, KeyError, ValueError):
+            self._record(output_name, hit=False)
+            return False
+
+        snapshot_data["id"] = str(uuid.uuid4())
+        snapshot_data["timestamp"] = timestamp
+        output_path = write_snapshot_data(snapshot_data, output_path, self.compression, self.level)
+        # the entry follows the latest copy, so it outlives the run it was generated in
+        self.store(key, output_path)
+
+        logger.debug(f"Reused cached snapshot {cached_path} for {output_path}")
+        self._record(output_name, hit=True)
+        return True
+
+    def store(self, key: str, output_path: str) -> None:
+        """
+        Store the path of a freshly generated snapshot under the key.
+        """
+        try:
+            write_json_atomic(self._entry_path(key), {"path": os.path.abspath(output_path)})
+        except Exception as e:
+            logger.warning(f"Error storing snapshot cache entry: {e}")
+
+    def deferred(self) -> "DeferredCache":
+        """
+        Get a view of the cache that holds back the stored entries until they are committed.
+        """
+        return DeferredCache(self)
+
+    def log_stats(self) -> None:
+        """
+        Log the cache hit rate of the run, per snapshot type.
+        """
+        total_hits = sum(self.hits.values())
+        total = total_hits + sum(self.misses.values())
+        if total == 0:
+            logger.info("Snapshot cache: no lookups this run.")
+            return
+        for output_name in sorted(set(self.hits) | set(self.misses)):
+            hits = self.hits[output_name]
+            lookups = hits + self.misses[output_name]
+            logger.info(f"Snapshot cache {output_name}: {hits}/{lookups} hits ({hits / lookups:.0%})")
+        logger.info(f"Snapshot cache total: {total_hits}/{total} hits ({total_hits / total:.0%})")
+
+
+class DeferredCache:
+    def __init__(self, cache: SnapshotCache):
+        """
+        Wrap a cache so that the entries stored through it are only written on commit, e.g. once the alerts of the
+        stored test suites were sent: a restored snapshot doesn't alert again.
+        """
+        self.cache = cache
+        self.pending = []
+
+    def make_key(self, data: pd.DataFrame, folder_path: str, output_name: str) -> str:
+        """
+        Build the cache key for one snapshot of a stratum.
+        """
+        return self.cache.make_key(data, folder_path, output_name)
+
+    def restore(self, key: str, output_path: str, timestamp: str, output_name: str) -> bool:
+        """
+        Copy the cached snapshot for the key to the output path. Return False on a miss.
+        """
+        return self.cache.restore(key, output_path, timestamp, output_name)
+
+    def store(self, key: str, output_path: str) -> None:
+        """
+        Hold back the entry of a freshly generated snapshot until commit.
+        """
+        self.pending.append((key, output_path))
+
+    def commit(self) -> None:
+        """
+        Write the held back entries.
+        """
+        for key, output_path in self.pending:
+            self.cache.store(key, output_path)
+        self.pending.clear()
+
+
+def is_within(path: str, directories: list) -> bool:
+    """
+    Check if the path lies inside any of the directories.
+    """
+    return any(path.startswith(os.path.join(os.path.abspath(directory), "")) for directory in directories)
+
+
+def prune_cache(cache_dir: str, removed_dirs: list = (), dry_run: bool = False) -> int:
+    """
+    Remove the cache entries whose snapshot lies in one of the removed directories or no longer exists. Return the
+    number of entries removed, or that would be removed on a dry run.
+    """
+    if not os.path.isdir(cache_dir):
+        return 0
+    pruned = 0
+    for file_name in os.listdir(cache_dir):
+        if not file_name.endswith(".json"):
+            continue
+        entry_path = os.path.join(cache_dir, file_name)
+        try:
+            with open(entry_path, "r") as file:
+                cached_path = json.load(file)["path"]
+        except (FileNotFoundError, KeyError, ValueError):
+            cached_path = None
+        if cached_path is not None and not is_within(cached_path, removed_dirs) and os.path.exists(cached_path):
+            continue
+        pruned += 1
+        if not dry_run:
+            try:
+                os.remove(entry_path)
+            except FileNotFoundError:
+                pass
+    return pruned
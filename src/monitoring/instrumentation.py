@@ -0,0 +1,207 @@
+"""
+Per-stage instrumentation of the monitoring flow. Each stage records its wall time, CPU time (of the thread running it,
+as the flow tasks run concurrently in threads), resident memory and row count. At the end of the run, the records are
+logged as a summary table and saved as a JSON file per run.
+
+Selected stages can also run under cProfile, e.g. with MONITORING_PROFILE="report.*,create_dashboard" or "all". Their
+.prof files and top functions by cumulative time are saved in a hidden .profile directory of the run's snapshots. The
+stages of a model with a namespace are prefixed with it, and profiled into the snapshots of the model.
+"""
+
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from fnmatch import fnmatch
+
+from src.utils.config_manager import get_data_dir, namespaced
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_ENV = "MONITORING_PROFILE"
+PROFILE_TOP_N = 30
+
+_records = []
+_records_lock = threading.Lock()
+_run = {"wall": None, "profile": [], "profile_dir": None}
+# whether a profiler is running in the thread, as a thread can only run one
+_profiling = threading.local()
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Get the peak resident memory of the process so far, in MB.
+    """
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def get_rss_mb() -> float:
+    """
+    Get the current resident memory of the process in MB, or None without psutil.
+    """
+    if psutil is None:
+        return None
+    return psutil.Process().memory_info().rss / (1024 * 1024)
+
+
+def get_profile_patterns(profile: str = None) -> list:
+    """
+    Get the patterns of the stages to profile from a comma-separated list, by default the MONITORING_PROFILE
+    environment variable. "all" profiles every stage.
+    """
+    profile = os.environ.get(PROFILE_ENV, "") if profile is None else profile
+    patterns = [pattern.strip() for pattern in profile.split(",") if pattern.strip()]
+    return ["*" if pattern == "all" else pattern for pattern in patterns]
+
+
+def get_profile_dir(timestamp: str, config: dict = None) -> str:
+    """
+    Get the profile directory of a run of the model of the config, hidden in its snapshots directory so the snapshot
+    registration skips it.
+    """
+    snapshots_dir = "/app/snapshots" if os.path.exists("/app") else "snapshots"
+    return f"{namespaced(snapshots_dir, config)}/{timestamp}/.profile"
+
+
+def stage_name(config: dict, name: str) -> str:
+    """
+    Prefix the name of a stage with the namespace of the model of the config, if it has one.
+    """
+    return f"{config['namespace']}.{name}" if (config or {}).get("namespace") else name
+
+
+def start_run(profile: str = None, profile_dir: str = None) -> None:
+    """
+    Forget the records of a previous run and start timing the new one. The stages matching the profile patterns are
+    profiled into profile_dir, or into profile_dir(config) for the config of the stage if it is a function.
+    """
+    with _records_lock:
+        _records.clear()
+        _run["wall"] = time.perf_counter()
+        _run["profile"] = get_profile_patterns(profile) if profile_dir else []
+        _run["profile_dir"] = profile_dir
+
+
+def start_profiler(name: str):
+    """
+    Start profiling a stage if it matches the profile patterns, unless an enclosing stage of the thread is already
+    being profiled. Return the profiler, or None.
+    """
+    if not any(fnmatch(name, pattern) for pattern in _run["profile"]) or getattr(_profiling, "active", False):
+        return None
+    _profiling.active = True
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def save_profile(profiler, name: str, profile_dir: str, top_n: int = PROFILE_TOP_N) -> str:
+    """
+    Save the profile of a stage as a .prof file and a summary of the top functions by cumulative time. Return the
+    path of the .prof file.
+    """
+    os.makedirs(profile_dir, exist_ok=True)
+    file_path = os.path.join(profile_dir, name.replace(os.sep, "_"))
+    profiler.dump_stats(f"{file_path}.prof")
+    summary = io.StringIO()
+    pstats.Stats(profiler, stream=summary).sort_stats("cumulative").print_stats(top_n)
+    with open(f"{file_path}.txt", "w") as file:
+        file.write(summary.getvalue())
+    return f"{file_path}.prof"
+
+
+@contextmanager
+def stage(name: str, config: dict = None, **fields):
+    """
+    Record the wall time, CPU time, memory and row count of a stage, of the model of the config if given. The row
+    count, and any other field, can be set on the yielded record. A profiled stage is slower, and records the path of
+    its profile.
+    """
+    name = stage_name(config, name)
+    record = {"stage": name, "rows": None, **fields}
+    rss_start = get_rss_mb()
+    wall_start = time.perf_counter()
+    cpu_start = time.thread_time()
+    profiler = start_profiler(name)
+    try:
+        yield record
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _profiling.active = False
+            try:
+                profile_dir = _run["profile_dir"]
+                profile_dir = profile_dir(config) if callable(profile_dir) else profile_dir
+                record["profile"] = save_profile(profiler, name, profile_dir)
+            except OSError as e:
+                logger.warning(f"Could not save the profile of {name}: {e}")
+        record["wall_time"] = time.perf_counter() - wall_start
+        record["cpu_time"] = time.thread_time() - cpu_start
+        # the high-water mark of the process: if the stage raised it, it is the peak of the stage
+        record["peak_rss_mb"] = get_peak_rss_mb()
+        rss_end = get_rss_mb()
+        record["rss_delta_mb"] = None if rss_start is None else rss_end - rss_start
+        with _records_lock:
+            _records.append(record)
+
+
+def get_records() -> list:
+    """
+    Get the records of the current run.
+    """
+    with _records_lock:
+        return list(_records)
+
+
+def format_summary(records: list) -> str:
+    """
+    Format the records as a table.
+    """
+    lines = [f"{'stage':<40} {'wall s':>9} {'cpu s':>9} {'peak MB':>9} {'rows':>10}"]
+    for record in records:
+        rows = "" if record["rows"] is None else record["rows"]
+        lines.append(
+            f"{record['stage'][:40]:<40} {record['wall_time']:>9.2f} {record['cpu_time']:>9.2f} "
+            f"{record['peak_rss_mb']:>9.0f} {rows:>10}"
+        )
+    return "\n".join(lines)
+
+
+def get_run_stats_dir() -> str:
+    """
+    Get the directory of the per-run instrumentation records, in the Docker volume if it exists.
+    """
+    return os.path.join(get_data_dir(), "run_stats")
+
+
+def finish_run(timestamp: str, output_dir: str = None) -> str:
+    """
+    Log the summary table of the run and save its records to a JSON file. Return the path of the file.
+    """
+    records = get_records()
+    logger.info(f"Run {timestamp} stages:\n{format_summary(records)}")
+
+    output_dir = output_dir or get_run_stats_dir()
+    os.makedirs(output_dir, exist_ok=True)
+    file_path = os.path.join(output_dir, f"{timestamp}.json")
+    wall_time = None if _run["wall"] is None else time.perf_counter() - _run["wall"]
+    with open(file_path, "w") as file:
+        json.dump(
+            {"timestamp": timestamp, "wall_time": wall_time, "peak_rss_mb": get_peak_rss_mb(), "stages": records},
+            file,
+            indent=2,
+        )
+    return file_path
@@ -0,0 +1,232 @@
+"""
+Store of the metric values of every run and stratum, so the dashboard API can serve per-stratum time series without
+parsing snapshots. Each flow run adds to a SQLite table indexed by (stratum, metric, timestamp):
+- the point estimates and confidence intervals of its strata, e.g. "rmse",
+- the drift of its reports: "share_of_drifted_columns", "number_of_drifted_columns", "dataset_drift" and the
+  "drift_score.<column>" of every column,
+- the outcomes of its test suites, "test.<test name>", 1 if the test passed and 0 if it failed or warned.
+"""
+
+import logging
+import os
+import pathlib
+import sqlite3
+
+from src.monitoring.snapshots import is_snapshot_file, read_snapshot_data
+from src.utils.config_manager import get_data_dir
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_SIZE = 500
+MAX_PAGE_SIZE = 5000
+COLUMNS = ["timestamp", "stratum", "metric", "value", "lower", "upper", "n"]
+DRIFT_METRIC = "DatasetDriftMetric"
+DRIFT_TABLE = "DataDriftTable"
+DRIFT_VALUES = ["share_of_drifted_columns", "number_of_drifted_columns", "dataset_drift"]
+TEST_OUTCOMES = {"SUCCESS": 1.0, "WARNING": 0.0, "FAIL": 0.0}
+
+
+def get_metric_store_path(config: dict = None) -> str:
+    """
+    Get the path of the SQLite metric store of the model.
+    """
+    return os.path.join(get_data_dir(config), "metrics.db")
+
+
+class MetricStore:
+    def __init__(self, db_path: str = None, read_only: bool = False):
+        """
+        Open the metric store, creating the table if it doesn't exist. A read-only store, e.g. of the dashboard API,
+        never writes to the database, which must exist.
+        """
+        self.db_path = db_path or get_metric_store_path()
+        if read_only:
+            self.connection = sqlite3.connect(f"{pathlib.Path(self.db_path).absolute().as_uri()}?mode=ro", uri=True)
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+        self.connection = sqlite3.connect(self.db_path)
+        with self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS metric_values (timestamp TEXT, stratum TEXT, metric TEXT, value REAL, "
+                "lower REAL, upper REAL, n INTEGER, PRIMARY KEY (stratum, metric, timestamp))"
+            )
+            # the version of the store, incremented by every write
+            self.connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+
+    def close(self) -> None:
+        """
+        Close the connection to the store.
+        """
+        self.connection.close()
+
+    def _bump_version(self) -> None:
+        """
+        Increment the version of the store, in the transaction of the write.
+        """
+        self.connection.execute(
+            "INSERT INTO meta (key, value) VALUES ('version', 1) ON CONFLICT (key) DO UPDATE SET value = value + 1"
+        )
+
+    def add_run(self, intervals: dict, timestamp: str) -> int:
+        """
+        Add the metric values of a run, replacing the values of the same run if it is added again. Return the number
+        of values added.
+        """
+        rows = [
+            (timestamp, stratum, metric, values["value"], values.get("lower"), values.get("upper"), values.get("n"))
+            for stratum, metrics in intervals.items()
+            for metric, values in metrics.items()
+        ]
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO metric_values ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                rows,
+            )
+            self._bump_version()
+        return len(rows)
+
+    def delete_runs(self, timestamps: list) -> int:
+        """
+        Delete the metric values of the runs. Return the number of values deleted.
+        """
+        with self.connection:
+            cursor = self.connection.executemany(
+                "DELETE FROM metric_values WHERE timestamp = ?", [(timestamp,) for timestamp in timestamps]
+            )
+            if cursor.rowcount:
+                self._bump_version()
+        return cursor.rowcount
+
+    def version(self) -> int:
+        """
+        Get the version of the store, which changes whenever values are added or deleted.
+        """
+        try:
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+        except sqlite3.OperationalError:
+            # a store written before the version was kept, read-only until the flow opens it
+            return 0
+        return row[0] if row else 0
+
+    def query(
+        self,
+        stratum: str,
+        metric: str = None,
+        start: str = None,
+        end: str = None,
+        limit: int = DEFAULT_PAGE_SIZE,
+        offset: int = 0,
+    ) -> dict:
+        """
+        Query the values of a stratum, optionally for one metric and between two timestamps (inclusive), ordered by
+        timestamp. Return a page of at most limit values and the offset of the next page, None on the last page.
+        """
+        conditions = ["stratum = ?"]
+        parameters = [stratum]
+        if metric:
+            conditions.append("metric = ?")
+            parameters.append(metric)
+        if start:
+            conditions.append("timestamp >= ?")
+            parameters.append(start)
+        if end:
+            conditions.append("timestamp <= ?")
+            parameters.append(end)
+
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        # one row more than the page tells whether there is a next page
+        rows = self.connection.execute(
+            f"SELECT {', '.join(COLUMNS)} FROM metric_values WHERE {' AND '.join(conditions)} "
+            "ORDER BY timestamp, metric LIMIT ? OFFSET ?",
+            (*parameters, limit + 1, offset),
+        ).fetchall()
+        return {
+            "values": [dict(zip(COLUMNS, row)) for row in rows[:limit]],
+            "next_offset": offset + limit if len(rows) > limit else None,
+        }
+
+
+def get_result_name(result: dict) -> str:
+    """
+    Get the class name of a metric from the type of its serialised result or definition.
+    """
+    return result.get("type", "").rsplit(".", 1)[-1]
+
+
+def get_snapshot_values(snapshot: dict) -> dict:
+    """
+    Get the drift values of a report snapshot and the test outcomes of a test suite snapshot, as a mapping of metric
+    name to value. Tests with the same name are numbered in the order of the suite.
+    """
+    suite = snapshot["suite"]
+    values = {}
+    for metric, result in zip(suite.get("metrics", []), suite.get("metric_results", [])):
+        if get_result_name(metric) == DRIFT_METRIC:
+            values.update({name: float(result[name]) for name in DRIFT_VALUES if result.get(name) is not None})
+        elif get_result_name(metric) == DRIFT_TABLE and not suite.get("tests"):
+            for column, column_drift in (result.get("drift_by_columns") or {}).items():
+                if column_drift.get("drift_score") is not None:
+                    values[f"drift_score.{column}"] = float(column_drift["drift_score"])
+
+    for result in suite.get("test_results", []):
+        outcome = TEST_OUTCOMES.get(result.get("status"))
+        if outcome is None:
+            continue
+        name = f"test.{result['name']}"
+        number = 2
+        while name in values:
+            name = f"test.{result['name']} ({number})"
+            number += 1
+        values[name] = outcome
+    return values
+
+
+def collect_run_values(run_dir: str) -> dict:
+    """
+    Collect the drift values and test outcomes of the snapshots of a run, by stratum, in the shape of the confidence
+    intervals. The stratum is the folder of the snapshot without its "_report" or "_test" suffix.
+    """
+    values = {}
+    for operation in ["reports", "tests"]:
+        operation_dir = os.path.join(run_dir, operation)
+        if not os.path.isdir(operation_dir):
+            continue
+        for folder in sorted(os.listdir(operation_dir)):
+            stratum = folder.rsplit("_", 1)[0]
+            folder_path = os.path.join(operation_dir, folder)
+            for file_name in sorted(os.listdir(folder_path)):
+                if not is_snapshot_file(file_name):
+                    continue
+                try:
+                    snapshot_values = get_snapshot_values(read_snapshot_data(os.path.join(folder_path, file_name)))
+                except Exception as e:
+                    logger.warning(f"Could not read the values of {operation}/{folder}/{file_name}: {e}")
+                    continue
+                stratum_values = values.setdefault(stratum, {})
+                stratum_values.update({metric: {"value": value} for metric, value in snapshot_values.items()})
+    return values
+
+
+def save_metric_values(intervals: dict, timestamp: str, db_path: str = None) -> None:
+    """
+    Add the metric values of the run to the metric store.
+    """
+    store = MetricStore(db_path)
+    try:
+        count = store.add_run(intervals, timestamp)
+    finally:
+        store.close()
+    logger.info(f"Stored {count} metric values for run {timestamp}.")
+
+
+def delete_metric_values(timestamps: list, db_path: str = None) -> None:
+    """
+    Delete the metric values of the runs from the metric store, e.g. of the failed runs generated again.
+    """
+    store = MetricStore(db_path)
+    try:
+        count = store.delete_runs(timestamps)
+    finally:
+        store.close()
+    logger.info(f"Deleted {count} metric values of the runs {timestamps}.")
@@ -17,6 +17,10 @@ from evidently.metrics import (
 )
 import logging
 import pandas as pd
+from src.monitoring.cache import SnapshotCache
+from src.data_preprocessing.dtypes import release_wide, widen_once
+from src.monitoring.snapshots import get_run_dir, save_snapshot
+from src.monitoring import sketches  # noqa: F401, registers the sketch-based stattests with Evidently
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -113,16 +117,41 @@ def setup_column_mapping(config: dict, report_type: str, details: dict) -> Colum
         raise ValueError(f"Missing config key: {e}. Please fix the config.") from e
 
 
+def get_drift_stattests(config: dict, data: pd.DataFrame) -> dict:
+    """
+    Get the drift stattests for the data report. Strata with at least min_rows rows use the approximate, sketch-based
+    stattests if approximate drift is enabled in the config, otherwise Evidently picks its exact defaults.
+    """
+    approximate_drift = config.get("approximate_drift", {})
+    if not approximate_drift.get("enabled", False) or len(data) < approximate_drift.get("min_rows", 1000000):
+        return {}
+    return {
+        "num_stattest": approximate_drift.get("numerical_stattest", "sketch_wasserstein"),
+        "cat_stattest": approximate_drift.get("categorical_stattest", "sketch_psi"),
+    }
+
+
 def data_report(
-    data: pd.DataFrame, reference_data: pd.DataFrame, config: dict, folder_path: str, timestamp: str, details: dict
+    data: pd.DataFrame,
+    reference_data: pd.DataFrame,
+    config: dict,
+    folder_path: str,
+    timestamp: str,
+    details: dict,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate data quality metrics report.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/data_quality_report.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "data_quality_report")
+        if cache.restore(cache_key, output_path, timestamp, "data_quality_report"):
+            return
     try:
         data_mapping = setup_column_mapping(config, "data", details)
     except Exception as e:
@@ -139,39 +168,57 @@ def data_report(
     if len(t) == 1:
         t.append("single")
     t.append("data")
+
+    # use the approximate stattests for very large strata
+    stattests = get_drift_stattests(config, data)
+    prediction_stattest = stattests.get(
+        "cat_stattest" if data_mapping.prediction in data_mapping.categorical else "num_stattest"
+    )
+    target_stattest = stattests.get(
+        "cat_stattest" if data_mapping.target in data_mapping.categorical else "num_stattest"
+    )
     data_quality_report = Report(
         metrics=[
             DatasetSummaryMetric(),
-            DatasetDriftMetric(),
-            DataDriftTable(),
-            ColumnDriftMetric(data_mapping.prediction),
-            ColumnDriftMetric(data_mapping.target),
+            DatasetDriftMetric(**stattests),
+            DataDriftTable(**stattests),
+            ColumnDriftMetric(data_mapping.prediction, stattest=prediction_stattest),
+            ColumnDriftMetric(data_mapping.target, stattest=target_stattest),
         ],
         tags=t,
         timestamp=timestamp,
     )
     data_quality_report.run(
-        reference_data=reference_data,
-        current_data=data,
+        reference_data=widen_once(reference_data),
+        current_data=widen_once(data),
         column_mapping=data_mapping,
     )
-    # check if in docker environment
-    if os.path.exists("/app"):
-        data_quality_report.save(f"/app/snapshots/{timestamp}/{folder_path}/data_quality_report.json")
-    else:
-        data_quality_report.save(f"snapshots/{timestamp}/{folder_path}/data_quality_report.json")
+    output_path = save_snapshot(data_quality_report, output_path, config)
+    if cache is not None:
+        cache.store(cache_key, output_path)
 
 
 def regression_report(
-    data: pd.DataFrame, reference_data: pd.DataFrame, config: dict, folder_path: str, timestamp: str, details: dict
+    data: pd.DataFrame,
+    reference_data: pd.DataFrame,
+    config: dict,
+    folder_path: str,
+    timestamp: str,
+    details: dict,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate regression metrics report.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/regression_report.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "regression_report")
+        if cache.restore(cache_key, output_path, timestamp, "regression_report"):
+            return
     try:
         regression_mapping = setup_column_mapping(config, "regression", details)
     except Exception as e:
@@ -199,27 +246,36 @@ def regression_report(
         timestamp=timestamp,
     )
     regression_report.run(
-        reference_data=reference_data,
-        current_data=data,
+        reference_data=widen_once(reference_data),
+        current_data=widen_once(data),
         column_mapping=regression_mapping,
     )
-    # check if in docker environment
-    if os.path.exists("/app"):
-        regression_report.save(f"/app/snapshots/{timestamp}/{folder_path}/regression_report.json")
-    else:
-        regression_report.save(f"snapshots/{timestamp}/{folder_path}/regression_report.json")
+    output_path = save_snapshot(regression_report, output_path, config)
+    if cache is not None:
+        cache.store(cache_key, output_path)
 
 
 def classification_report(
-    data: pd.DataFrame, reference_data: pd.DataFrame, config: dict, folder_path: str, timestamp: str, details: dict
+    data: pd.DataFrame,
+    reference_data: pd.DataFrame,
+    config: dict,
+    folder_path: str,
+    timestamp: str,
+    details: dict,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate classification metrics report.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/classification_report.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "classification_report")
+        if cache.restore(cache_key, output_path, timestamp, "classification_report"):
+            return
     try:
         classification_mapping = setup_column_mapping(config, "classification", details)
     except Exception as e:
@@ -244,15 +300,13 @@ def classification_report(
         timestamp=timestamp,
     )
     classification_report.run(
-        reference_data=reference_data,
-        current_data=data,
+        reference_data=widen_once(reference_data),
+        current_data=widen_once(data),
         column_mapping=classification_mapping,
     )
-    # check if in docker environment
-    if os.path.exists("/app"):
-        classification_report.save(f"/app/snapshots/{timestamp}/{folder_path}/classification_report.json")
-    else:
-        classification_report.save(f"snapshots/{timestamp}/{folder_path}/classification_report.json")
+    output_path = save_snapshot(classification_report, output_path, config)
+    if cache is not None:
+        cache.store(cache_key, output_path)
 
 
 def generate_report(
@@ -263,25 +317,29 @@ def generate_report(
     folder_path: str,
     timestamp: str,
     details: dict,
+    cache: SnapshotCache = None,
 ) -> None:
     """
-    Generate the metrics report based on the model type.
+    Generate the metrics report based on the model type. If a cache is given, unchanged strata reuse their previous snapshots.
     """
     try:
         # Generate the data quality report
-        data_report(data, reference_data, config, folder_path, timestamp, details)
+        data_report(data, reference_data, config, folder_path, timestamp, details, cache)
     except Exception as e:
         logger.error(f"Failed to generate data quality report: {e}")
 
     # Generate the regression and classification reports based on the model type
     if model_type["regression"]:
         try:
-            regression_report(data, reference_data, config, folder_path, timestamp, details)
+            regression_report(data, reference_data, config, folder_path, timestamp, details, cache)
         except Exception as e:
             logger.error(f"Failed to generate regression report: {e}")
 
     if model_type["binary_classification"]:
         try:
-            classification_report(data, reference_data, config, folder_path, timestamp, details)
+            classification_report(data, reference_data, config, folder_path, timestamp, details, cache)
         except Exception as e:
             logger.error(f"Failed to generate classification report: {e}")
+
+    # the reports of the stratum shared its wide frame, the wide reference data is shared by the whole run
+    release_wide(data)
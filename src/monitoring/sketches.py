@@ -0,0 +1,406 @@
+"""
+Mergeable streaming sketches for approximate drift detection on very large strata.
+
+- KLLSketch: quantile sketch for numerical columns. With the default k=200 the normalised rank error of a
+  single sketch is below 1% (at most 2% in the worst case checked by the tests), independent of the number of rows.
+- CountMinSketch: frequency sketch for categorical columns. Counts are never underestimated and are
+  overestimated by at most e / width * n with probability 1 - exp(-depth).
+
+The drift distances computed from two sketches inherit the errors of both sketches:
+- KS distance: within rank_error(reference) + rank_error(current) of the exact value.
+- Wasserstein distance (normed): within (rank_error(reference) + rank_error(current)) * (max - min) / std(reference).
+- PSI: uses the same Sturges equal-width bins as Evidently's "psi" stattest. Each bin share is within twice the rank
+  error, but nearly empty tail bins amplify that error through the log ratio, so the PSI is only within about 25% of the
+  exact value. Categorical PSI is exact as long as the count-min sketch has no collisions between the categories.
+
+The distances are registered as Evidently stattests ("sketch_ks", "sketch_wasserstein" and "sketch_psi"), so they can
+be used by name in DataDriftTable, DatasetDriftMetric and ColumnDriftMetric. The stattests build the sketch of a column
+once and reuse it, keyed by the hash of its values: the reference columns are shared by every stratum, and the same
+columns are sketched by both drift metrics of a report and by the drift tests.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from evidently.calculations.stattests.registry import StatTest, register_stattest
+from evidently.core import ColumnType
+
+CHUNK_SIZE = 65536
+MAX_CACHED_SKETCHES = 128
+
+# the sketches built by the stattests, by feature type and hash of the column values, least recently used first
+_sketches = OrderedDict()
+_sketches_lock = threading.Lock()
+
+
+class KLLSketch:
+    def __init__(self, k: int = 200, seed: int = 0):
+        """
+        Initialize an empty KLL quantile sketch. Level h holds items with a weight of 2**h.
+        """
+        self.k = k
+        self.n = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+        self._levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None
+
+    def _capacity(self, level: int) -> int:
+        """
+        Get the capacity of a level. Lower levels hold fewer items, shrinking geometrically by 2/3.
+        """
+        depth = len(self._levels) - level - 1
+        return max(int(np.ceil(self.k * (2 / 3) ** depth)), 2)
+
+    def _compact(self, level: int) -> None:
+        """
+        Sort a level and promote every other item to the next level, doubling its weight.
+        """
+        if level + 1 == len(self._levels):
+            self._levels.append(np.empty(0))
+        items = np.sort(self._levels[level])
+        # keep one item at this level if the number of items is odd
+        kept = items[: len(items) % 2]
+        offset = self._rng.integers(2)
+        promoted = items[len(kept) :][offset::2]
+        self._levels[level] = kept
+        self._levels[level + 1] = np.concatenate([self._levels[level + 1], promoted])
+
+    def _compress(self) -> None:
+        """
+        Compact the lowest level over its capacity until the sketch fits in its total capacity.
+        """
+        while self.num_retained() > sum(self._capacity(level) for level in range(len(self._levels))):
+            for level in range(len(self._levels)):
+                if len(self._levels[level]) > self._capacity(level):
+                    self._compact(level)
+                    break
+        self._sorted = None
+
+    def update(self, values) -> "KLLSketch":
+        """
+        Add values to the sketch. Missing values are ignored. The values are processed in chunks to bound memory.
+        """
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if values.size == 0:
+            return self
+
+        self.n += values.size
+        self.total += float(values.sum())
+        self.total_squares += float(np.square(values).sum())
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+
+        for start in range(0, values.size, CHUNK_SIZE):
+            self._levels[0] = np.concatenate([self._levels[0], values[start : start + CHUNK_SIZE]])
+            self._compress()
+        return self
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """
+        Merge another sketch into this one.
+        """
+        while len(self._levels) < len(other._levels):
+            self._levels.append(np.empty(0))
+        for level, items in enumerate(other._levels):
+            self._levels[level] = np.concatenate([self._levels[level], items])
+
+        self.n += other.n
+        self.total += other.total
+        self.total_squares += other.total_squares
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._compress()
+        return self
+
+    @property
+    def mean(self) -> float:
+        """
+        Exact mean of the values.
+        """
+        return self.total / self.n if self.n else np.nan
+
+    @property
+    def std(self) -> float:
+        """
+        Exact population standard deviation of the values.
+        """
+        if not self.n:
+            return np.nan
+        variance = self.total_squares / self.n - self.mean**2
+        return float(np.sqrt(max(variance, 0.0)))
+
+    def _weighted_items(self) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Get the retained items in sorted order with their cumulative weights.
+        """
+        if self._sorted is None:
+            items = np.concatenate(self._levels)
+            weights = np.concatenate([np.full(len(items), 2**level) for level, items in enumerate(self._levels)])
+            order = np.argsort(items, kind="stable")
+            self._sorted = (items[order], np.cumsum(weights[order], dtype=float))
+        return self._sorted
+
+    def cdf(self, x) -> np.ndarray:
+        """
+        Estimate the share of values less than or equal to x.
+        """
+        items, cumulative_weights = self._weighted_items()
+        positions = np.searchsorted(items, np.asarray(x, dtype=float), side="right")
+        cumulative = np.concatenate([[0.0], cumulative_weights])
+        return cumulative[positions] / self.n
+
+    def quantile(self, q) -> np.ndarray:
+        """
+        Estimate the q-th quantiles of the values.
+        """
+        items, cumulative_weights = self._weighted_items()
+        positions = np.searchsorted(cumulative_weights, np.asarray(q, dtype=float) * self.n, side="left")
+        return items[np.clip(positions, 0, len(items) - 1)]
+
+    def num_retained(self) -> int:
+        """
+        Get the number of items retained by the sketch.
+        """
+        return sum(len(items) for items in self._levels)
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 5, max_keys: int = 10000, seed: int = 0):
+        """
+        Initialize an empty count-min sketch. The distinct keys are tracked up to max_keys so the categories can be listed.
+        """
+        self.width = width
+        self.depth = depth
+        self.max_keys = max_keys
+        self.seed = seed
+        self.n = 0
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.keys = set()
+
+    def _indices(self, values: np.ndarray) -> np.ndarray:
+        """
+        Hash the values with one independent hash function per row.
+        """
+        indices = np.empty((self.depth, len(values)), dtype=np.int64)
+        for row in range(self.depth):
+            hashes = pd.util.hash_array(values, hash_key=f"{self.seed:08d}{row:08d}")
+            indices[row] = hashes % np.uint64(self.width)
+        return indices
+
+    @staticmethod
+    def _normalise(values) -> np.ndarray:
+        """
+        Drop missing values and convert to strings, so that e.g. 1 and "1" fall in the same category.
+        """
+        values = pd.Series(values)
+        return values[values.notna()].astype(str).to_numpy(dtype=object)
+
+    def update(self, values) -> "CountMinSketch":
+        """
+        Add values to the sketch. Missing values are ignored.
+        """
+        values = self._normalise(values)
+        if values.size == 0:
+            return self
+
+        self.n += values.size
+        for start in range(0, values.size, CHUNK_SIZE):
+            chunk = values[start : start + CHUNK_SIZE]
+            indices = self._indices(chunk)
+            for row in range(self.depth):
+                self.table[row] += np.bincount(indices[row], minlength=self.width)
+            if len(self.keys) < self.max_keys:
+                new_keys = set(pd.unique(chunk)) - self.keys
+                self.keys.update(sorted(new_keys)[: self.max_keys - len(self.keys)])
+        return self
+
+    def merge(self, other: "CountMinSketch") -> "CountMinSketch":
+        """
+        Merge another sketch into this one. Both sketches must use the same width, depth and seed.
+        """
+        if (self.width, self.depth, self.seed) != (other.width, other.depth, other.seed):
+            raise ValueError("Count-min sketches with different width, depth or seed cannot be merged.")
+        self.table += other.table
+        self.n += other.n
+        self.keys.update(sorted(other.keys - self.keys)[: max(self.max_keys - len(self.keys), 0)])
+        return self
+
+    def estimate(self, keys) -> np.ndarray:
+        """
+        Estimate the counts of the keys.
+        """
+        keys = np.asarray([str(key) for key in keys], dtype=object)
+        if keys.size == 0:
+            return np.zeros(0, dtype=np.int64)
+        indices = self._indices(keys)
+        return self.table[np.arange(self.depth)[:, None], indices].min(axis=0)
+
+    @property
+    def epsilon(self) -> float:
+        """
+        Bound on the overestimate of a count, as a share of the number of values.
+        """
+        return np.e / self.width
+
+
+def sketch_series(series: pd.Series, feature_type: ColumnType = ColumnType.Numerical, **kwargs):
+    """
+    Build the sketch that matches the feature type of a column.
+    """
+    if feature_type == ColumnType.Numerical:
+        return KLLSketch(**kwargs).update(pd.to_numeric(series, errors="coerce"))
+    return CountMinSketch(**kwargs).update(series)
+
+
+def get_sketch(series: pd.Series, feature_type: ColumnType = ColumnType.Numerical):
+    """
+    Get the sketch of a column, building it only if the same values weren't sketched recently. The values are hashed
+    in order, so a reused sketch is the one that would be built again. The returned sketch must not be updated.
+    """
+    hashes = pd.util.hash_pandas_object(series, index=False).to_numpy()
+    key = (feature_type == ColumnType.Numerical, hashlib.sha256(hashes.tobytes()).hexdigest())
+    with _sketches_lock:
+        sketch = _sketches.get(key)
+        if sketch is not None:
+            _sketches.move_to_end(key)
+            return sketch
+    sketch = sketch_series(series, feature_type)
+    with _sketches_lock:
+        _sketches[key] = sketch
+        while len(_sketches) > MAX_CACHED_SKETCHES:
+            _sketches.popitem(last=False)
+    return sketch
+
+
+def ks_distance(reference: KLLSketch, current: KLLSketch) -> float:
+    """
+    Estimate the Kolmogorov-Smirnov distance between the distributions of two sketches.
+    """
+    points = np.union1d(reference._weighted_items()[0], current._weighted_items()[0])
+    return float(np.max(np.abs(reference.cdf(points) - current.cdf(points))))
+
+
+def wasserstein_distance(reference: KLLSketch, current: KLLSketch, normed: bool = True) -> float:
+    """
+    Estimate the first Wasserstein distance between two sketches, by default normed by the reference standard deviation
+    like Evidently's "wasserstein" stattest.
+    """
+    points = np.union1d(reference._weighted_items()[0], current._weighted_items()[0])
+    cdf_difference = np.abs(reference.cdf(points[:-1]) - current.cdf(points[:-1]))
+    distance = float(np.sum(cdf_difference * np.diff(points)))
+    if normed:
+        distance /= max(reference.std, 0.001)
+    return distance
+
+
+def fill_zeroes(percents: np.ndarray) -> np.ndarray:
+    """
+    Replace empty bins by a small share, the same way Evidently does before computing the PSI.
+    """
+    percents = percents.copy()
+    non_zero = percents[percents > 0]
+    if non_zero.size:
+        smallest = non_zero.min()
+        percents[percents <= 0] = smallest / 10**6 if smallest <= 0.0001 else 0.0001
+    return percents
+
+
+def numerical_bin_percents(reference: KLLSketch, current: KLLSketch) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Estimate the share of values in each bin, using Sturges equal-width bins over the combined range.
+    """
+    n_bins = int(np.ceil(np.log2(reference.n + current.n) + 1))
+    lower, upper = min(reference.min, current.min), max(reference.max, current.max)
+    if lower == upper:
+        return np.ones(1), np.ones(1)
+    edges = np.linspace(lower, upper, n_bins + 1)
+    reference_cdf = np.concatenate([[0.0], reference.cdf(edges[1:-1]), [1.0]])
+    current_cdf = np.concatenate([[0.0], current.cdf(edges[1:-1]), [1.0]])
+    return np.diff(reference_cdf), np.diff(current_cdf)
+
+
+def categorical_percents(reference: CountMinSketch, current: CountMinSketch) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Estimate the share of values in each category seen in either sketch.
+    """
+    keys = sorted(reference.keys | current.keys)
+    reference_percents = reference.estimate(keys) / max(reference.n, 1)
+    current_percents = current.estimate(keys) / max(current.n, 1)
+    return reference_percents, current_percents
+
+
+def psi(reference, current) -> float:
+    """
+    Estimate the population stability index between two sketches of the same type.
+    """
+    if isinstance(reference, KLLSketch):
+        reference_percents, current_percents = numerical_bin_percents(reference, current)
+    else:
+        reference_percents, current_percents = categorical_percents(reference, current)
+    reference_percents = fill_zeroes(reference_percents)
+    current_percents = fill_zeroes(current_percents)
+    return float(np.sum((reference_percents - current_percents) * np.log(reference_percents / current_percents)))
+
+
+def _sketch_ks(
+    reference_data: pd.Series, current_data: pd.Series, feature_type: ColumnType, threshold: float
+) -> tuple[float, bool]:
+    """
+    Evidently stattest: KS distance estimated from quantile sketches.
+    """
+    value = ks_distance(get_sketch(reference_data), get_sketch(current_data))
+    return value, value >= threshold
+
+
+def _sketch_wasserstein(
+    reference_data: pd.Series, current_data: pd.Series, feature_type: ColumnType, threshold: float
+) -> tuple[float, bool]:
+    """
+    Evidently stattest: normed Wasserstein distance estimated from quantile sketches.
+    """
+    value = wasserstein_distance(get_sketch(reference_data), get_sketch(current_data))
+    return value, value >= threshold
+
+
+def _sketch_psi(
+    reference_data: pd.Series, current_data: pd.Series, feature_type: ColumnType, threshold: float
+) -> tuple[float, bool]:
+    """
+    Evidently stattest: PSI estimated from quantile sketches (numerical) or count-min sketches (categorical).
+    """
+    value = psi(get_sketch(reference_data, feature_type), get_sketch(current_data, feature_type))
+    return value, value >= threshold
+
+
+sketch_ks_stat_test = StatTest(
+    name="sketch_ks",
+    display_name="K-S distance (sketch)",
+    allowed_feature_types=[ColumnType.Numerical],
+    default_threshold=0.1,
+)
+
+sketch_wasserstein_stat_test = StatTest(
+    name="sketch_wasserstein",
+    display_name="Wasserstein distance (normed, sketch)",
+    allowed_feature_types=[ColumnType.Numerical],
+    default_threshold=0.1,
+)
+
+sketch_psi_stat_test = StatTest(
+    name="sketch_psi",
+    display_name="PSI (sketch)",
+    allowed_feature_types=[ColumnType.Categorical, ColumnType.Numerical],
+    default_threshold=0.1,
+)
+
+register_stattest(sketch_ks_stat_test, _sketch_ks)
+register_stattest(sketch_wasserstein_stat_test, _sketch_wasserstein)
+register_stattest(sketch_psi_stat_test, _sketch_psi)
@@ -0,0 +1,162 @@
+"""
+Snapshot serialization. Reports and test suites are written as compact orjson bytes, optionally compressed with gzip or
+zstd, and read back transparently based on the file extension.
+
+orjson writes NaN and infinity as null, which Evidently snapshots contain (e.g. the missing values of the data quality
+metrics), so non-finite floats are stored as {"$float": "nan" | "inf" | "-inf"} and restored when reading.
+"""
+
+import gzip
+import json
+import logging
+import math
+import os
+import uuid
+
+import numpy as np
+import orjson
+from evidently.utils import NumpyEncoder
+
+from src.utils.config_manager import namespaced
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"none": ".json", "gzip": ".json.gz", "zstd": ".json.zst"}
+DEFAULT_LEVELS = {"gzip": 6, "zstd": 3}
+NON_FINITE_KEY = "$float"
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def get_compression(config: dict) -> tuple:
+    """
+    Get the compression method and level from the config. Falls back to gzip if zstd is not installed.
+    """
+    settings = config.get("snapshot_storage", {})
+    compression = settings.get("compression", "none")
+    if compression not in EXTENSIONS:
+        raise ValueError(f"Unknown snapshot compression: {compression}")
+    if compression == "zstd" and zstandard is None:
+        logger.warning("zstandard is not installed, compressing snapshots with gzip instead.")
+        compression = "gzip"
+    return compression, settings.get("level", DEFAULT_LEVELS.get(compression))
+
+
+def get_run_dir(timestamp: str, config: dict = None) -> str:
+    """
+    Get the snapshots directory of a run, in the namespace of the model of the config, in the Docker volume if it exists.
+    """
+    snapshots_dir = "/app/snapshots" if os.path.exists("/app") else "snapshots"
+    return f"{namespaced(snapshots_dir, config)}/{timestamp}"
+
+
+def is_snapshot_file(file_name: str) -> bool:
+    """
+    Check if a file is a snapshot written by this module or by Evidently.
+    """
+    return not file_name.startswith(".") and file_name.endswith(tuple(EXTENSIONS.values()))
+
+
+def get_snapshot_path(output_path: str, compression: str = "none") -> str:
+    """
+    Replace the extension of a snapshot path with the one of the compression method.
+    """
+    for extension in sorted(EXTENSIONS.values(), key=len, reverse=True):
+        if output_path.endswith(extension):
+            output_path = output_path[: -len(extension)]
+            break
+    return output_path + EXTENSIONS[compression]
+
+
+def encode_non_finite(value):
+    """
+    Replace the non-finite floats in a snapshot dictionary, including inside NumPy arrays, with tagged objects.
+    """
+    if isinstance(value, (float, np.floating)):
+        return value if math.isfinite(value) else {NON_FINITE_KEY: repr(float(value))}
+    if isinstance(value, dict):
+        return {key: encode_non_finite(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_non_finite(item) for item in value]
+    if isinstance(value, np.ndarray) and value.dtype.kind == "f" and not np.isfinite(value).all():
+        return encode_non_finite(value.tolist())
+    return value
+
+
+def decode_non_finite(value):
+    """
+    Restore the non-finite floats tagged by encode_non_finite.
+    """
+    if isinstance(value, dict):
+        if len(value) == 1 and NON_FINITE_KEY in value:
+            return float(value[NON_FINITE_KEY])
+        return {key: decode_non_finite(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_non_finite(item) for item in value]
+    return value
+
+
+def dumps_snapshot(snapshot_data: dict, compression: str = "none", level: int = None) -> bytes:
+    """
+    Serialize a snapshot dictionary to compact JSON bytes and compress them.
+    """
+    content = orjson.dumps(encode_non_finite(snapshot_data), default=NumpyEncoder().default, option=ORJSON_OPTIONS)
+    if compression == "gzip":
+        return gzip.compress(content, compresslevel=level or DEFAULT_LEVELS["gzip"], mtime=0)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=level or DEFAULT_LEVELS["zstd"]).compress(content)
+    return content
+
+
+def loads_snapshot(content: bytes, file_path: str = "") -> dict:
+    """
+    Decompress and parse snapshot bytes. The compression method is taken from the file extension.
+    """
+    if file_path.endswith(EXTENSIONS["gzip"]):
+        content = gzip.decompress(content)
+    elif file_path.endswith(EXTENSIONS["zstd"]):
+        if zstandard is None:
+            raise ImportError(f"zstandard is required to read {file_path}")
+        content = zstandard.ZstdDecompressor().decompressobj().decompress(content)
+
+    try:
+        snapshot_data = orjson.loads(content)
+    except orjson.JSONDecodeError:
+        # snapshots saved by Evidently itself write NaN and Infinity literals, which orjson rejects
+        return json.loads(content)
+    if NON_FINITE_KEY.encode("utf-8") in content:
+        return decode_non_finite(snapshot_data)
+    return snapshot_data
+
+
+def write_snapshot_data(snapshot_data: dict, output_path: str, compression: str = "none", level: int = None) -> str:
+    """
+    Write a snapshot dictionary atomically and return the path written, with the extension of the compression method.
+    """
+    output_path = get_snapshot_path(output_path, compression)
+    tmp_path = f"{output_path}.{uuid.uuid4().hex}.tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(dumps_snapshot(snapshot_data, compression, level))
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def save_snapshot(suite, output_path: str, config: dict) -> str:
+    """
+    Save a Report or TestSuite with the compression from the config and return the path written.
+    """
+    compression, level = get_compression(config)
+    return write_snapshot_data(suite._get_snapshot().dict(), output_path, compression, level)
+
+
+def read_snapshot_data(file_path: str) -> dict:
+    """
+    Read a snapshot file written by write_snapshot_data or by Evidently's save.
+    """
+    with open(file_path, "rb") as file:
+        return loads_snapshot(file.read(), file_path)
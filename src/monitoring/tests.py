@@ -10,7 +10,9 @@ import logging
 from evidently.test_suite import TestSuite
 from src.monitoring.metrics import setup_column_mapping
 from src.monitoring.alerts import check_test_results, AlertCollector
-
+from src.monitoring.cache import SnapshotCache
+from src.data_preprocessing.dtypes import release_wide, widen_once
+from src.monitoring.snapshots import get_run_dir, save_snapshot
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -106,14 +108,20 @@ def data_tests(
     timestamp: str,
     details: dict,
     alert_collector: AlertCollector,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate data test results.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/data_test_suite.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged (its alerts were sent before it was cached)
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "data_test_suite")
+        if cache.restore(cache_key, output_path, timestamp, "data_test_suite"):
+            return
     try:
         data_mapping = setup_column_mapping(config, "data", details)
     except Exception as e:
@@ -128,8 +136,8 @@ def data_tests(
         t.append("data")
         data_test_suite = TestSuite(tests=test_functions, tags=t, timestamp=timestamp)
         data_test_suite.run(
-            reference_data=reference_data,
-            current_data=data,
+            reference_data=widen_once(reference_data),
+            current_data=widen_once(data),
             column_mapping=data_mapping,
         )
 
@@ -139,11 +147,9 @@ def data_tests(
             logger.info(f"Failed tests: {failed_tests}")
             alert_collector.add_failed_tests("Data Tests", failed_tests)
 
-        # check if in docker environment
-        if os.path.exists("/app"):
-            data_test_suite.save(f"/app/snapshots/{timestamp}/{folder_path}/data_test_suite.json")
-        else:
-            data_test_suite.save(f"snapshots/{timestamp}/{folder_path}/data_test_suite.json")
+        output_path = save_snapshot(data_test_suite, output_path, config)
+        if cache is not None:
+            cache.store(cache_key, output_path)
     except Exception as e:
         logger.error(f"Error running data tests: {e}")
         return
@@ -158,14 +164,20 @@ def regression_tests(
     timestamp: str,
     details: dict,
     alert_collector: AlertCollector,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate regression test results.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/regression_test_suite.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged (its alerts were sent before it was cached)
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "regression_test_suite")
+        if cache.restore(cache_key, output_path, timestamp, "regression_test_suite"):
+            return
     try:
         regression_mapping = setup_column_mapping(config, "regression", details)
     except Exception as e:
@@ -180,8 +192,8 @@ def regression_tests(
         t.append("regression")
         regression_test_suite = TestSuite(tests=test_functions, tags=t, timestamp=timestamp)
         regression_test_suite.run(
-            reference_data=reference_data,
-            current_data=data,
+            reference_data=widen_once(reference_data),
+            current_data=widen_once(data),
             column_mapping=regression_mapping,
         )
 
@@ -190,11 +202,9 @@ def regression_tests(
         if is_alert:
             alert_collector.add_failed_tests("Regression Tests", failed_tests)
 
-        # check if in docker environment
-        if os.path.exists("/app"):
-            regression_test_suite.save(f"/app/snapshots/{timestamp}/{folder_path}/regression_test_suite.json")
-        else:
-            regression_test_suite.save(f"snapshots/{timestamp}/{folder_path}/regression_test_suite.json")
+        output_path = save_snapshot(regression_test_suite, output_path, config)
+        if cache is not None:
+            cache.store(cache_key, output_path)
     except Exception as e:
         logger.error(f"Error running regression tests: {e}")
 
@@ -208,14 +218,20 @@ def classification_tests(
     timestamp: str,
     details: dict,
     alert_collector: AlertCollector,
+    cache: SnapshotCache = None,
 ) -> None:
     """
     Generate classification test results.
     """
-    if os.path.exists("/app"):
-        ensure_directory(f"/app/snapshots/{timestamp}/{folder_path}")
-    else:
-        ensure_directory(f"snapshots/{timestamp}/{folder_path}")
+    run_dir = get_run_dir(timestamp, config)
+    ensure_directory(f"{run_dir}/{folder_path}")
+    output_path = f"{run_dir}/{folder_path}/classification_test_suite.json"
+
+    # reuse the snapshot from a previous run if the stratum is unchanged (its alerts were sent before it was cached)
+    if cache is not None:
+        cache_key = cache.make_key(data, folder_path, "classification_test_suite")
+        if cache.restore(cache_key, output_path, timestamp, "classification_test_suite"):
+            return
     try:
         classification_mapping = setup_column_mapping(config, "classification", details)
     except Exception as e:
@@ -230,8 +246,8 @@ def classification_tests(
         t.append("classification")
         classification_test_suite = TestSuite(tests=test_functions, tags=t, timestamp=timestamp)
         classification_test_suite.run(
-            reference_data=reference_data,
-            current_data=data,
+            reference_data=widen_once(reference_data),
+            current_data=widen_once(data),
             column_mapping=classification_mapping,
         )
 
@@ -240,11 +256,9 @@ def classification_tests(
         if is_alert:
             alert_collector.add_failed_tests("Classification Tests", failed_tests)
 
-        # check if in docker environment
-        if os.path.exists("/app"):
-            classification_test_suite.save(f"/app/snapshots/{timestamp}/{folder_path}/classification_test_suite.json")
-        else:
-            classification_test_suite.save(f"snapshots/{timestamp}/{folder_path}/classification_test_suite.json")
+        output_path = save_snapshot(classification_test_suite, output_path, config)
+        if cache is not None:
+            cache.store(cache_key, output_path)
     except Exception as e:
         logger.error(f"Error running classification tests: {e}")
         return
@@ -258,9 +272,12 @@ def generate_tests(
     folder_path: str,
     timestamp: str,
     details: dict,
+    cache: SnapshotCache = None,
+    alerts: bool = True,
 ) -> None:
     """
-    Generate the test suite based on the model type.
+    Generate the test suite based on the model type. If a cache is given, unchanged strata reuse their previous snapshots.
+    Failed tests are emailed unless alerts is False.
     """
     try:
         tests_mapping = load_json("src/utils/tests_map.json")
@@ -269,10 +286,15 @@ def generate_tests(
         return
 
     alert_collector = AlertCollector(config)
+    # the suites are only cached once their alerts were sent, as a restored suite doesn't alert again
+    if cache is not None:
+        cache = cache.deferred()
 
     # Generate the data tests
     try:
-        data_tests(data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector)
+        data_tests(
+            data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector, cache
+        )
     except Exception as e:
         logger.error(f"Error running data tests: {e}")
 
@@ -280,7 +302,7 @@ def generate_tests(
     if model_type["regression"]:
         try:
             regression_tests(
-                data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector
+                data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector, cache
             )
         except Exception as e:
             logger.error(f"Error running regression tests: {e}")
@@ -289,11 +311,16 @@ def generate_tests(
     if model_type["binary_classification"]:
         try:
             classification_tests(
-                data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector
+                data, reference_data, config, tests_mapping, folder_path, timestamp, details, alert_collector, cache
             )
         except Exception as e:
             logger.error(f"Error running classification tests: {e}")
 
+    # the suites of the stratum shared its wide frame, the wide reference data is shared by the whole run
+    release_wide(data)
+
     # Send alerts if necessary
-    if alert_collector.should_alert():
+    if alerts and alert_collector.should_alert():
         alert_collector.send_alert(config["alerts"]["emails"])
+    if cache is not None:
+        cache.commit()
@@ -0,0 +1,77 @@
+"""
+File to expose the operational metrics of the Flask APIs in the Prometheus text format: request counts, latencies and
+payload sizes by endpoint, and the ingested rows and database insert latencies by collection.
+"""
+
+import time
+
+from flask import Flask, Response, g, request
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+
+# latencies from a cached response to a large upload
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# payloads from a small JSON body to the 16 MB upload limit
+SIZE_BUCKETS = (1e2, 1e3, 1e4, 1e5, 1e6, 4e6, 16e6)
+ROW_BUCKETS = (1, 10, 100, 1e3, 1e4, 1e5, 1e6)
+
+REQUESTS = Counter("http_requests_total", "HTTP requests.", ["api", "endpoint", "method", "status"])
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ["api", "endpoint"], buckets=LATENCY_BUCKETS
+)
+REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "HTTP request body size.", ["api", "endpoint"], buckets=SIZE_BUCKETS
+)
+ROWS_INGESTED = Counter("ingested_rows_total", "Rows inserted into the database.", ["collection"])
+BATCH_ROWS = Histogram("ingested_batch_rows", "Rows per ingested file.", ["collection"], buckets=ROW_BUCKETS)
+INSERT_LATENCY = Histogram(
+    "db_insert_duration_seconds", "Database insert latency.", ["collection"], buckets=LATENCY_BUCKETS
+)
+WORKSPACE_WRITE_LATENCY = Histogram(
+    "dashboard_workspace_write_seconds",
+    "Latency of writing the filtered panels to the workspace.",
+    buckets=LATENCY_BUCKETS,
+)
+
+
+def get_endpoint() -> str:
+    """
+    Get the route of the request, so the label values are bounded by the routes of the app.
+    """
+    return request.url_rule.rule if request.url_rule else "unmatched"
+
+
+def instrument_app(app: Flask, api: str) -> None:
+    """
+    Count and time the requests of the app, and add the /metrics endpoint.
+    """
+
+    @app.before_request
+    def start_timer():
+        g.metrics_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop("metrics_start", None)
+        if start is not None:
+            endpoint = get_endpoint()
+            REQUESTS.labels(api, endpoint, request.method, str(response.status_code)).inc()
+            REQUEST_LATENCY.labels(api, endpoint).observe(time.perf_counter() - start)
+            if request.content_length:
+                REQUEST_SIZE.labels(api, endpoint).observe(request.content_length)
+        return response
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        """
+        Get the metrics of the process in the Prometheus text format.
+        """
+        return Response(generate_latest(), mimetype=CONTENT_TYPE_LATEST)
+
+
+def record_insert(collection: str, rows: int, duration: float) -> None:
+    """
+    Record a database insert of rows into a collection.
+    """
+    ROWS_INGESTED.labels(collection).inc(rows)
+    BATCH_ROWS.labels(collection).observe(rows)
+    INSERT_LATENCY.labels(collection).observe(duration)
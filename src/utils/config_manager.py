@@ -3,6 +3,9 @@ File to load the JSON config file.
 """
 
 import json
+import os
+
+MODELS_DIRS = ["config/models", "/app/config/models"]
 
 
 def load_config() -> dict:
@@ -22,3 +25,58 @@ def load_config() -> dict:
         except FileNotFoundError:
             continue
     raise FileNotFoundError("Config file not found.")
+
+
+def load_model_configs() -> list:
+    """
+    Load the configs of every monitored model. If the models directory has JSON files, each is the config of a model,
+    monitored in the namespace of its model ID. Otherwise the config file is the only model, without a namespace.
+    """
+    for models_dir in MODELS_DIRS:
+        if not os.path.isdir(models_dir):
+            continue
+        file_names = sorted(file_name for file_name in os.listdir(models_dir) if file_name.endswith(".json"))
+        if not file_names:
+            continue
+        configs = []
+        for file_name in file_names:
+            with open(os.path.join(models_dir, file_name), "r") as file:
+                config = json.load(file)
+            config["namespace"] = config["model_config"]["model_id"]
+            configs.append(config)
+        namespaces = [config["namespace"] for config in configs]
+        if len(set(namespaces)) != len(namespaces):
+            raise ValueError(f"The model IDs of {models_dir} are not unique.")
+        return configs
+    return [load_config()]
+
+
+def get_data_dir(config: dict = None) -> str:
+    """
+    Get the data directory, in the Docker volume if it exists. With a config, get the data directory of its model.
+    """
+    data_dir = "/app/data" if os.path.exists("/app/data") else "data"
+    return namespaced(data_dir, config)
+
+
+def namespaced(directory: str, config: dict = None) -> str:
+    """
+    Get the directory of the model of a config inside a shared directory, e.g. the snapshots or data directory.
+    """
+    namespace = (config or {}).get("namespace")
+    return os.path.join(directory, namespace) if namespace else directory
+
+
+def get_model_config(model_id: str = None) -> dict:
+    """
+    Get the config of a monitored model, by default the only one.
+    """
+    configs = load_model_configs()
+    if model_id is None:
+        if len(configs) > 1:
+            raise ValueError("Several models are monitored, the model ID must be given.")
+        return configs[0]
+    for config in configs:
+        if config["model_config"]["model_id"] == model_id:
+            return config
+    raise ValueError(f"Unknown model ID: {model_id}")
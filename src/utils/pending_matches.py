@@ -0,0 +1,131 @@
+"""
+File to keep the count of the ingested rows that completed a result and label pair, so the monitoring flow is started
+once enough matched rows are waiting instead of on a blind schedule. The ingestion API adds the matches of every
+upload, and the flow trigger claims them when it starts a run. The claims of a run are recorded until it finishes, and
+given back if the run failed, since its rows are still waiting.
+"""
+
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+PENDING_COLLECTION = "pending_matches"
+CLAIMS_COLLECTION = "flow_run_claims"
+DEFAULT_TRIGGER = {
+    "enabled": True,
+    "min_rows": 100,
+    "max_wait_minutes": 60,
+    "debounce_seconds": 60,
+    "poll_seconds": 15,
+}
+
+
+def get_trigger_settings(config: dict) -> dict:
+    """
+    Get the trigger settings from the config, with the defaults for missing settings.
+    """
+    settings = config.get("trigger", {})
+    return {key: settings.get(key, default) for key, default in DEFAULT_TRIGGER.items()}
+
+
+def count_matches(db: Database, collection: str, study_id_col: str, study_ids: list) -> int:
+    """
+    Count the rows of the other collection of a pair with the study IDs of an upload.
+    """
+    if not study_ids:
+        return 0
+    db[collection].create_index(study_id_col)
+    return db[collection].count_documents({study_id_col: {"$in": study_ids}})
+
+
+def record_pending_matches(db: Database, model_id: str, count: int, now: datetime = None) -> None:
+    """
+    Add the matches of an upload to the pending count of the model.
+    """
+    now = now or datetime.now(timezone.utc)
+    update = {"$set": {"last_upload_at": now}}
+    if count:
+        update["$inc"] = {"count": count}
+        update["$min"] = {"first_pending_at": now}
+    db[PENDING_COLLECTION].update_one({"_id": model_id}, update, upsert=True)
+
+
+def get_pending_matches(db: Database, model_id: str) -> dict:
+    """
+    Get the pending count of the model, with the time of its first pending match and of the last upload.
+    """
+    return db[PENDING_COLLECTION].find_one({"_id": model_id}) or {"_id": model_id, "count": 0}
+
+
+def claim_pending_matches(db: Database, model_id: str, count: int) -> None:
+    """
+    Remove the claimed count from the pending matches of the model. Matches recorded since they were read stay pending,
+    waiting from the last upload.
+    """
+    pending = db[PENDING_COLLECTION].find_one_and_update(
+        {"_id": model_id},
+        {"$inc": {"count": -count}, "$unset": {"first_pending_at": ""}},
+        return_document=ReturnDocument.AFTER,
+    )
+    if pending and pending.get("count", 0) > 0:
+        db[PENDING_COLLECTION].update_one(
+            {"_id": model_id, "first_pending_at": {"$exists": False}},
+            {"$set": {"first_pending_at": pending["last_upload_at"]}},
+        )
+
+
+def record_claims(db: Database, flow_run_id: str, pending: dict) -> None:
+    """
+    Record the pending matches claimed for a flow run, given as a mapping of model ID to its pending matches, so that
+    they can be given back if the run fails.
+    """
+    claims = {
+        model_id: {"count": model_pending["count"], "first_pending_at": model_pending.get("first_pending_at")}
+        for model_id, model_pending in pending.items()
+    }
+    db[CLAIMS_COLLECTION].insert_one({"_id": flow_run_id, "claims": claims})
+
+
+def list_claims(db: Database) -> list:
+    """
+    List the recorded claims of the flow runs that weren't seen finishing yet.
+    """
+    return list(db[CLAIMS_COLLECTION].find())
+
+
+def release_claims(db: Database, claim: dict, failed: bool) -> None:
+    """
+    Forget the claims of a finished flow run. The matches of a failed run are pending again, waiting since they were
+    first pending, so that the next run is started for them.
+    """
+    if failed:
+        for model_id, model_claim in claim["claims"].items():
+            update = {"$inc": {"count": model_claim["count"]}}
+            if model_claim.get("first_pending_at"):
+                update["$min"] = {"first_pending_at": model_claim["first_pending_at"]}
+            db[PENDING_COLLECTION].update_one({"_id": model_id}, update, upsert=True)
+    db[CLAIMS_COLLECTION].delete_one({"_id": claim["_id"]})
+
+
+def should_trigger(pending: dict, settings: dict, now: datetime) -> bool:
+    """
+    Decide whether to start a run for the pending matches. A run starts once min_rows matches, or any match older than
+    max_wait_minutes, are waiting, and no upload came in the last debounce_seconds, so a burst of uploads is one run.
+    Matches waiting for max_wait_minutes start a run even during a steady stream of uploads.
+    """
+    count = pending.get("count", 0)
+    if count <= 0 or not pending.get("first_pending_at"):
+        return False
+    waited = (now - as_utc(pending["first_pending_at"])).total_seconds()
+    quiet = (now - as_utc(pending["last_upload_at"])).total_seconds()
+    if waited >= settings["max_wait_minutes"] * 60:
+        return True
+    return count >= settings["min_rows"] and quiet >= settings["debounce_seconds"]
+
+
+def as_utc(timestamp: datetime) -> datetime:
+    """
+    Make a timestamp read from MongoDB, which drops the time zone, aware in UTC.
+    """
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
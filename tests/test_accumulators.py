@@ -0,0 +1,97 @@
+"""
+Script to test the rolling metric accumulators.
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score, mean_absolute_error, mean_squared_error
+from src.monitoring.accumulators import AccumulatorStore, delete_accumulated_runs, update_accumulators
+
+
+@pytest.fixture
+def mock_config():
+    """
+    Fixture to mock the configuration file
+    """
+    return {
+        "model_config": {"model_type": {"regression": True, "binary_classification": True}},
+        "columns": {
+            "study_id": "StudyID",
+            "predictions": {"regression_prediction": "age_pred", "classification_prediction": "class"},
+            "labels": {"regression_label": "age_true", "classification_label": "class_true"},
+            "timestamp": "date",
+        },
+    }
+
+
+def make_batch(start: int, days: list, seed: int) -> pd.DataFrame:
+    """
+    Generate a batch of predictions and labels on the given days.
+    """
+    rng = np.random.default_rng(seed)
+    n = len(days)
+    return pd.DataFrame(
+        {
+            "StudyID": np.arange(start, start + n),
+            "date": pd.to_datetime(days),
+            "age_pred": rng.normal(50, 10, n),
+            "age_true": rng.normal(50, 10, n),
+            "class": rng.integers(0, 2, n),
+            "class_true": rng.integers(0, 2, n),
+        }
+    )
+
+
+def test_rolling_metrics_match_full_history(tmp_path, mock_config):
+    first = make_batch(0, ["2024-08-01"] * 30 + ["2024-08-20"] * 20, seed=1)
+    second = make_batch(50, ["2024-08-25"] * 40 + ["2024-08-28"] * 10, seed=2)
+    db_path = str(tmp_path / "accumulators.db")
+
+    update_accumulators({"main_report": first}, mock_config, "2024-08-20T10:00:00", db_path)
+    rolling = update_accumulators({"main_report": second}, mock_config, "2024-08-28T10:00:00", db_path)
+
+    # the 30 day window ending on 2024-08-28 starts on 2024-07-30 and covers both batches
+    history = pd.concat([first, second])
+    metrics = rolling["main"]["30d"]
+    assert metrics["regression_count"] == len(history)
+    assert metrics["rmse"] == pytest.approx(np.sqrt(mean_squared_error(history["age_true"], history["age_pred"])))
+    assert metrics["mae"] == pytest.approx(mean_absolute_error(history["age_true"], history["age_pred"]))
+    assert metrics["accuracy"] == pytest.approx(accuracy_score(history["class_true"], history["class"]))
+    assert metrics["f1"] == pytest.approx(f1_score(history["class_true"], history["class"]))
+
+    # the 7 day window starts on 2024-08-22 and only covers the second batch
+    metrics = rolling["main"]["7d"]
+    assert metrics["regression_count"] == len(second)
+    assert metrics["rmse"] == pytest.approx(np.sqrt(mean_squared_error(second["age_true"], second["age_pred"])))
+
+
+def test_batch_is_not_counted_twice(tmp_path, mock_config):
+    batch = make_batch(0, ["2024-08-01"] * 10, seed=3)
+    store = AccumulatorStore(str(tmp_path / "accumulators.db"))
+    store.update("main", batch, mock_config, "2024-08-01T10:00:00")
+    store.update("main", batch.iloc[::-1], mock_config, "2024-08-01T10:00:00")
+    assert store.rolling_metrics("main", "2024-08-01", windows=(7,))["7d"]["classification_count"] == 10
+    store.close()
+
+
+def test_failed_run_retried_with_more_rows(tmp_path, mock_config):
+    failed = make_batch(0, ["2024-08-01"] * 10, seed=4)
+    retry = pd.concat([failed, make_batch(10, ["2024-08-02"] * 5, seed=5)])
+    db_path = str(tmp_path / "accumulators.db")
+
+    update_accumulators({"main_report": failed}, mock_config, "2024-08-01T10:00:00", db_path)
+    # the retry includes new rows, the contribution of the failed run it replaces is removed
+    rolling = update_accumulators(
+        {"main_report": retry}, mock_config, "2024-08-02T10:00:00", db_path, ["2024-08-01T10:00:00"]
+    )
+    assert rolling["main"]["7d"]["classification_count"] == len(retry)
+    assert rolling["main"]["7d"]["rmse"] == pytest.approx(
+        np.sqrt(mean_squared_error(retry["age_true"], retry["age_pred"]))
+    )
+
+    # a failed run removed from the dashboard leaves the accumulators
+    delete_accumulated_runs(["2024-08-02T10:00:00"], db_path)
+    store = AccumulatorStore(db_path)
+    assert store.rolling_metrics("main", "2024-08-02", windows=(7,))["7d"]["classification_count"] == 0
+    store.close()
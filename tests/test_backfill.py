@@ -0,0 +1,117 @@
+"""
+Script to test the backfill of historical time windows.
+"""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+
+# importing the workspace manager creates the Docker workspace directory
+with patch("os.makedirs"):
+    from scripts import backfill
+
+
+def test_windows_and_backfill(tmp_path):
+    config = generate_config()
+    results, labels = generate_data(config, 500, n_days=7, seed=3)
+    data = merge_results_and_labels(results, labels, config)
+
+    windows = backfill.get_windows(data, config, "1D")
+    assert [timestamp for timestamp, _ in windows] == [f"2024-08-0{day}T00:00:00" for day in range(1, 8)]
+    assert sum(len(window) for _, window in windows) == len(data)
+    assert all(window["timestamp"].dt.floor("1D").nunique() == 1 for _, window in windows)
+    assert len(backfill.get_windows(data, config, "7D")) <= 2
+    assert backfill.get_windows(data, config, "1D", min_rows=len(data)) == []
+
+    details = generate_details(data, config)
+    timestamp, window = windows[0]
+    with patch.object(backfill, "generate_report") as generate_report, patch.object(
+        backfill, "generate_tests"
+    ) as generate_tests, patch.object(backfill, "get_snapshots_dir", return_value=str(tmp_path)):
+        assert backfill.backfill_window(timestamp, window, data, config, details)[:2] == (
+            timestamp,
+            generate_report.call_count + generate_tests.call_count,
+        )
+    assert {call.kwargs["timestamp"] for call in generate_report.call_args_list} == {timestamp}
+    assert all(call.kwargs["alerts"] is False for call in generate_tests.call_args_list)
+    assert "/reports/main_report" in [call.kwargs["folder_path"] for call in generate_report.call_args_list]
+    # the window records the range of its rows, which a later backfill may replace
+    assert backfill.load_run_range(str(tmp_path), timestamp)[0] == str(window["timestamp"].min())
+
+
+def test_force_backfill_replaces_runs(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from evidently.metrics import DatasetSummaryMetric
+    from evidently.report import Report
+    from evidently.ui.workspace import Workspace
+    from src.dashboard.create_project import iter_snapshot_files, save_run_range
+    from src.monitoring.snapshots import write_snapshot_data
+
+    config = generate_config()
+    results, labels = generate_data(config, 300, n_days=2, seed=4)
+    data = merge_results_and_labels(results, labels, config)
+    details = generate_details(data, config)
+    snapshots_dir = tmp_path / "snapshots"
+    workspace = Workspace.create(str(tmp_path / "workspace"))
+
+    report = Report(metrics=[DatasetSummaryMetric()], tags=["main"])
+    report.run(reference_data=data[["age"]], current_data=data[["age"]])
+    snapshot = report._get_snapshot().dict()
+
+    def write_snapshot(data, reference_data, config, model_type, folder_path, timestamp, **kwargs):
+        output_path = snapshots_dir / timestamp / folder_path.strip("/") / "data_quality_report.json"
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        # every generated snapshot has its own id, as in the flow
+        write_snapshot_data({**snapshot, "id": uuid.uuid4()}, str(output_path))
+
+    # a flow run over rows of the backfilled period, and an older run outside of it
+    write_snapshot(None, None, config, None, "/reports/main_report", "2024-08-01T18:00:00")
+    save_run_range(str(snapshots_dir), "2024-08-01T18:00:00", "2024-08-01 06:00:00", "2024-08-01 17:00:00")
+    write_snapshot(None, None, config, None, "/reports/main_report", "2024-07-01T18:00:00")
+    # a run in the backfilled period from before the time ranges were recorded
+    write_snapshot(None, None, config, None, "/reports/main_report", "2024-08-01T20:00:00")
+
+    def count_snapshots():
+        project = workspace.search_project(config["info"]["project_name"])[0]
+        files = list(iter_snapshot_files(str(snapshots_dir)))
+        return len(project.list_snapshots()), len(files)
+
+    workspace_instance = MagicMock()
+    workspace_instance.get_workspace.return_value = workspace
+    with patch.object(backfill, "get_model_config", return_value=config), patch.object(
+        backfill, "load_details", return_value=details
+    ), patch.object(backfill, "fetch_matched_range", return_value=data), patch.object(
+        backfill, "reference_load_and_validate", return_value=data
+    ), patch.object(
+        backfill, "generate_report", side_effect=write_snapshot
+    ), patch.object(
+        backfill, "generate_tests", side_effect=write_snapshot
+    ), patch.object(
+        backfill, "get_snapshots_dir", return_value=str(snapshots_dir)
+    ), patch(
+        "src.dashboard.create_project.get_snapshots_dir", return_value=str(snapshots_dir)
+    ), patch(
+        "src.dashboard.create_project.update_panels"
+    ), patch.object(
+        backfill, "ProcessPoolExecutor", lambda max_workers, mp_context: ThreadPoolExecutor(max_workers)
+    ), patch.object(
+        backfill.WorkspaceManager, "get_instance", return_value=workspace_instance
+    ), patch(
+        "sys.argv", ["backfill", "--force", "--workers", "2"]
+    ):
+        backfill.main()
+        # the flow run over the backfilled rows is replaced, the older run and the run without a time range are kept
+        runs = [run for run in sorted(os.listdir(snapshots_dir)) if not run.startswith(".")]
+        assert runs == ["2024-07-01T18:00:00", "2024-08-01T00:00:00", "2024-08-01T20:00:00", "2024-08-02T00:00:00"]
+        first = count_snapshots()
+        assert first[0] == first[1]
+
+        # a forced backfill replaces its own windows rather than adding them again
+        backfill.main()
+        assert count_snapshots() == first
+
+        # the run without a time range is only removed on request, by its run time
+        windows = backfill.get_windows(data, config, "1D")
+        done = [timestamp for timestamp, _ in windows]
+        assert backfill.remove_replaced_runs(windows, done, config, force_legacy=True) == ["2024-08-01T20:00:00"]
@@ -0,0 +1,111 @@
+"""
+Script to test the bootstrap confidence intervals.
+"""
+
+import pytest
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score, f1_score, mean_squared_error
+from unittest.mock import patch
+from src.monitoring import bootstrap
+from src.monitoring.bootstrap import bootstrap_intervals, get_chunk_size
+from src.monitoring.alerts import check_interval_alerts
+
+
+@pytest.fixture
+def mock_config():
+    """
+    Fixture to mock the configuration file
+    """
+    return {
+        "model_config": {"model_type": {"regression": True, "binary_classification": True}},
+        "columns": {
+            "predictions": {"regression_prediction": "age_pred", "classification_prediction": "class"},
+            "labels": {"regression_label": "age_true", "classification_label": "class_true"},
+        },
+    }
+
+
+@pytest.fixture
+def mock_stratifications():
+    """
+    Fixture to generate a large and a small stratum
+    """
+    rng = np.random.default_rng(0)
+
+    def make(n):
+        return pd.DataFrame(
+            {
+                "age_pred": rng.normal(50, 10, n),
+                "age_true": rng.normal(50, 10, n),
+                "class": rng.integers(0, 2, n),
+                "class_true": rng.integers(0, 2, n),
+            }
+        )
+
+    return {"main_report": make(2000), "hospital1_report": make(30)}
+
+
+def test_intervals_contain_point_estimates(mock_config, mock_stratifications):
+    intervals = bootstrap_intervals(mock_stratifications, mock_config, n_resamples=500)
+    main = mock_stratifications["main_report"]
+
+    assert intervals["main"]["rmse"]["value"] == pytest.approx(
+        np.sqrt(mean_squared_error(main["age_true"], main["age_pred"]))
+    )
+    assert intervals["main"]["accuracy"]["value"] == pytest.approx(accuracy_score(main["class_true"], main["class"]))
+    assert intervals["main"]["f1"]["value"] == pytest.approx(f1_score(main["class_true"], main["class"]))
+
+    for stratum in ["main", "hospital1"]:
+        for metric, interval in intervals[stratum].items():
+            assert interval["lower"] <= interval["value"] <= interval["upper"], (stratum, metric)
+
+    # the small stratum has a much wider interval
+    width = {
+        stratum: intervals[stratum]["rmse"]["upper"] - intervals[stratum]["rmse"]["lower"] for stratum in intervals
+    }
+    assert width["hospital1"] > 3 * width["main"]
+
+
+def test_chunked_mode_matches(mock_config, mock_stratifications):
+    full = bootstrap_intervals(mock_stratifications, mock_config, n_resamples=300, seed=1)
+    chunked = bootstrap_intervals(mock_stratifications, mock_config, n_resamples=300, chunk_size=64, seed=1)
+    for stratum in full:
+        for metric in full[stratum]:
+            assert chunked[stratum][metric]["value"] == full[stratum][metric]["value"]
+            assert chunked[stratum][metric]["lower"] == pytest.approx(full[stratum][metric]["lower"], abs=0.05)
+            assert chunked[stratum][metric]["upper"] == pytest.approx(full[stratum][metric]["upper"], abs=0.05)
+
+
+def test_default_chunk_size_fits_memory_budget(mock_config, mock_stratifications):
+    # 1000 resamples of 1M rows at 44 bytes per value take 41 GB at once
+    assert get_chunk_size(1000, 1_000_000, 44) == 1
+    assert get_chunk_size(1000, 20_000, 44) == 76
+    assert get_chunk_size(1000, 2000, 44) == 762
+    assert get_chunk_size(1000, 100, 44) == 1000
+
+    chunks = []
+    draw_chunks = bootstrap.iter_uniform_chunks
+
+    def iter_uniform_chunks(*args):
+        for uniform in draw_chunks(*args):
+            chunks.append(uniform.nbytes)
+            yield uniform
+
+    with patch.object(bootstrap, "iter_uniform_chunks", side_effect=iter_uniform_chunks):
+        bounded = bootstrap_intervals(mock_stratifications, mock_config, n_resamples=300, seed=1, memory_mb=0.5)
+    # the chunks stay within the budget, and the intervals are the same as with all resamples at once
+    assert len(chunks) > 1
+    # a float32 uniform, an int64 index and a float64 regression error for each of the 2000 rows of a resample
+    assert max(chunks) // 4 * (4 + 8 + 8) <= 0.5 * 1024 * 1024
+    assert bounded == bootstrap_intervals(mock_stratifications, mock_config, n_resamples=300, chunk_size=300, seed=1)
+
+
+def test_interval_alerts():
+    intervals = {
+        "main": {"rmse": {"value": 14.0, "lower": 13.0, "upper": 15.0, "n": 2000}},
+        "hospital1": {"rmse": {"value": 14.0, "lower": 9.0, "upper": 19.0, "n": 30}},
+    }
+    is_alert, failed_tests = check_interval_alerts(intervals, {"rmse": {"max": 12}})
+    assert is_alert
+    assert [test["name"] for test in failed_tests] == ["rmse (main)"]
@@ -0,0 +1,132 @@
+"""
+Script to test the snapshot cache code.
+"""
+
+import json
+import os
+import pytest
+import pandas as pd
+from unittest.mock import patch
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+from src.dashboard.create_project import mark_run_complete, remove_failed_runs, save_run_range
+from src.monitoring import tests
+from src.monitoring.cache import SnapshotCache, hash_dataframe, prune_cache
+
+
+@pytest.fixture
+def mock_config():
+    """
+    Fixture to mock the configuration file
+    """
+    return {
+        "model_config": {"model_type": {"regression": True, "binary_classification": False}},
+        "columns": {"study_id": "StudyID", "age": "age"},
+        "tests": {"regression_tests": [{"name": "rmse"}]},
+    }
+
+
+@pytest.fixture
+def mock_data():
+    """
+    Fixture to generate mock data for testing
+    """
+    return pd.DataFrame(
+        {
+            "StudyID": [1, 2, 3, 4],
+            "age": [25, 30, 35, 40],
+            "hospital": ["hospital1", "hospital2", "hospital1", "hospital2"],
+        }
+    )
+
+
+def test_hash_ignores_row_order(mock_data):
+    shuffled = mock_data.iloc[[3, 1, 0, 2]].reset_index(drop=True)
+    assert hash_dataframe(mock_data) == hash_dataframe(shuffled)
+
+
+def test_hash_changes_with_content(mock_data):
+    changed = mock_data.copy()
+    changed.loc[0, "age"] = 26
+    assert hash_dataframe(mock_data) != hash_dataframe(changed)
+
+
+def test_key_depends_on_reference_and_config(tmp_path, mock_data, mock_config):
+    cache = SnapshotCache(mock_data, mock_config, cache_dir=str(tmp_path))
+    key = cache.make_key(mock_data, "/reports/main_report", "regression_report")
+
+    other_reference = SnapshotCache(mock_data.head(2), mock_config, cache_dir=str(tmp_path))
+    assert other_reference.make_key(mock_data, "/reports/main_report", "regression_report") != key
+
+    other_config = dict(mock_config, tests={"regression_tests": [{"name": "mae"}]})
+    other_cache = SnapshotCache(mock_data, other_config, cache_dir=str(tmp_path))
+    assert other_cache.make_key(mock_data, "/reports/main_report", "regression_report") != key
+
+    # the stratum is part of the key, as strata with identical rows carry different tags
+    assert cache.make_key(mock_data, "/reports/hospital1_report", "regression_report") != key
+
+
+def test_restore_after_store(tmp_path, mock_data, mock_config):
+    cache = SnapshotCache(mock_data, mock_config, cache_dir=str(tmp_path / "cache"))
+    key = cache.make_key(mock_data, "/reports/main_report", "regression_report")
+
+    first_path = tmp_path / "first.json"
+    second_path = tmp_path / "second.json"
+    assert not cache.restore(key, str(second_path), "2024-08-02T00:00:00", "regression_report")
+
+    first_path.write_text(json.dumps({"id": "old-id", "timestamp": "2024-08-01T00:00:00", "tags": ["main"]}))
+    cache.store(key, str(first_path))
+
+    assert cache.restore(key, str(second_path), "2024-08-02T00:00:00", "regression_report")
+    restored = json.loads(second_path.read_text())
+    assert restored["timestamp"] == "2024-08-02T00:00:00"
+    assert restored["id"] != "old-id"
+    assert restored["tags"] == ["main"]
+    assert cache.hits["regression_report"] == 1
+    assert cache.misses["regression_report"] == 1
+
+
+def test_failed_run_is_retried_from_cache(tmp_path):
+    config = generate_config(n_features=2, regression=False)
+    results, labels = generate_data(config, 200, seed=6)
+    data = merge_results_and_labels(results, labels, config)
+    details = generate_details(data, config)
+    snapshots_dir = tmp_path / "snapshots"
+    cache_dir = str(snapshots_dir / ".cache")
+
+    def run(timestamp, send_alert=None):
+        # the flow records the run as incomplete until the rows of the batch are moved to the matched collection
+        save_run_range(str(snapshots_dir), timestamp, data["timestamp"].min(), data["timestamp"].max(), False)
+        cache = SnapshotCache(data, config, cache_dir=cache_dir)
+        with patch.object(tests, "get_run_dir", return_value=str(snapshots_dir / timestamp)), patch.object(
+            tests, "check_test_results", return_value=(True, ["share_drifted_cols"])
+        ), patch.object(tests.AlertCollector, "send_alert", side_effect=send_alert) as alert:
+            tests.generate_tests(
+                data, data, config, config["model_config"]["model_type"], "/tests/main", timestamp, details, cache
+            )
+        return cache, alert
+
+    # the run crashes while sending its alerts, nothing is cached as already alerted
+    with pytest.raises(RuntimeError):
+        run("2024-08-02T00:00:00", send_alert=RuntimeError("Mailgun is down"))
+    assert os.listdir(cache_dir) == []
+
+    # the retry runs on the same rows, as they weren't moved, and alerts again, then fails after its tests
+    cache, alert = run("2024-08-02T01:00:00")
+    assert sum(cache.misses.values()) == 2 and not cache.hits
+    alert.assert_called_once()
+
+    # the next retry reuses every suite without alerting again, and replaces both failed runs
+    cache, alert = run("2024-08-02T02:00:00")
+    assert sum(cache.hits.values()) == 2 and not cache.misses
+    alert.assert_not_called()
+    mark_run_complete(str(snapshots_dir), "2024-08-02T02:00:00")
+    assert remove_failed_runs(str(snapshots_dir), "2024-08-02T02:00:00") == [
+        "2024-08-02T00:00:00",
+        "2024-08-02T01:00:00",
+    ]
+    assert remove_failed_runs(str(snapshots_dir), "2024-08-02T03:00:00") == []
+
+    # the entries follow the restored copies, so they survive the removal of the run they were generated in
+    assert prune_cache(cache_dir) == 0
+    cache, _ = run("2024-08-02T03:00:00")
+    assert sum(cache.hits.values()) == 2
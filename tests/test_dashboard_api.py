@@ -0,0 +1,349 @@
+"""
+Script to load test the per-session dashboard views of the dashboard API.
+"""
+
+import importlib
+import random
+import threading
+import time
+import pytest
+import numpy as np
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from concurrent.futures import ThreadPoolExecutor
+
+FILTERS = [{"filter1": "hospital1"}, {"filter1": "male"}, {"filter1": "hospital2", "filter2": "female"}, {}]
+N_CLIENTS = 50
+
+
+@pytest.fixture
+def mock_app(tmp_path):
+    """
+    Fixture to import the dashboard API with a mocked workspace
+    """
+    # importing the workspace manager creates the Docker workspace directory
+    with patch("os.makedirs"):
+        from src.dashboard import workspace_manager
+
+    workspace = MagicMock()
+    workspace.search_project.return_value = [SimpleNamespace(id="project-id")]
+    workspace_manager.WorkspaceManager._instance = None
+    with patch("evidently.ui.workspace.Workspace.create", return_value=workspace), patch(
+        "scripts.data_details.load_details", return_value={}
+    ), patch.object(workspace_manager, "WORKSPACE_NAME", str(tmp_path)):
+        app_module = importlib.import_module("api.dashboard.app")
+        app_module = importlib.reload(app_module)
+        yield app_module
+    workspace_manager.WorkspaceManager._instance = None
+
+
+@pytest.fixture
+def mock_workspace_app(tmp_path):
+    """
+    Fixture to import the dashboard API with a real Evidently workspace holding a project with tagged snapshots
+    """
+    import pandas as pd
+    from evidently.metrics import DatasetSummaryMetric
+    from evidently.report import Report
+    from evidently.ui.workspace import Workspace
+
+    with patch("os.makedirs"):
+        from src.dashboard import workspace_manager
+    from src.utils.config_manager import get_model_config
+
+    workspace = Workspace.create(str(tmp_path))
+    project = workspace.create_project(get_model_config(None)["info"]["project_name"])
+    data = pd.DataFrame({"value": [1.0, 2.0, 3.0]})
+    for tags in [["main", "single"], ["hospital1", "single"], ["male", "single"]]:
+        report = Report(metrics=[DatasetSummaryMetric()], tags=tags + ["data"])
+        report.run(reference_data=data, current_data=data)
+        workspace.add_report(project.id, report)
+
+    workspace_manager.WorkspaceManager._instance = None
+    with patch("scripts.data_details.load_details", return_value={}), patch.object(
+        workspace_manager, "WORKSPACE_NAME", str(tmp_path)
+    ):
+        app_module = importlib.import_module("api.dashboard.app")
+        app_module = importlib.reload(app_module)
+        yield app_module, project
+    workspace_manager.WorkspaceManager._instance = None
+
+
+def test_concurrent_filter_changes(mock_app):
+    views = {}
+    active = {"count": 0, "max": 0}
+    active_lock = threading.Lock()
+
+    def build_panels(config, tags):
+        time.sleep(0.01)
+        return [SimpleNamespace(title=",".join(tags))]
+
+    def get_view_id(workspace, config, tags):
+        return "project-id" if tuple(tags) == mock_app.normalize_tags([]) else views.get(tuple(tags))
+
+    def create_view(workspace, config, tags, panels):
+        with active_lock:
+            active["count"] += 1
+            active["max"] = max(active["max"], active["count"])
+        time.sleep(0.005)
+        assert tuple(tags) not in views
+        views[tuple(tags)] = f"view-{panels[0].title}"
+        with active_lock:
+            active["count"] -= 1
+        return views[tuple(tags)]
+
+    def client_session(seed):
+        client = mock_app.app.test_client()
+        rng = random.Random(seed)
+        session_id = None
+        latencies = []
+        for _ in range(5):
+            filters = dict(rng.choice(FILTERS))
+            if session_id:
+                filters["session_id"] = session_id
+            start = time.perf_counter()
+            response = client.post("/apply_filters", json=filters).get_json()
+            latencies.append(time.perf_counter() - start)
+            session_id = response["session_id"]
+            expected = mock_app.normalize_tags(
+                [value for key, value in filters.items() if key != "session_id"]
+                + (["single"] if len([key for key in filters if key != "session_id"]) == 1 else [])
+            )
+            assert tuple(response["tags"]) == expected
+            assert response["dashboard_url"].endswith(f"/projects/{get_view_id(None, None, expected)}")
+
+        # the session still sees its own last filters, whatever the other clients applied since
+        view = client.get(f"/get_view?session_id={session_id}").get_json()
+        assert tuple(view["tags"]) == expected
+        assert view["panels"] == [",".join(expected)]
+        return latencies
+
+    with patch.object(mock_app, "build_panels", side_effect=build_panels), patch.object(
+        mock_app, "get_view_id", side_effect=get_view_id
+    ), patch.object(mock_app, "create_view", side_effect=create_view) as create, patch.object(
+        mock_app, "is_view_use_stale", return_value=False
+    ):
+        with ThreadPoolExecutor(max_workers=N_CLIENTS) as executor:
+            latencies = np.concatenate(list(executor.map(client_session, range(N_CLIENTS))))
+
+    # each filtered view is created once, by one writer at a time, and later switches are lookups
+    assert active["max"] == 1
+    assert create.call_count == len(FILTERS) - 1
+    assert np.percentile(latencies, 95) < 2.0
+
+
+def test_reload_only_on_new_generation(mock_app):
+    from src.dashboard import workspace_manager
+
+    client = mock_app.app.test_client()
+    create = workspace_manager.Workspace.create
+    calls = create.call_count
+    for _ in range(10):
+        assert client.get("/get_dashboard_url").status_code == 200
+    assert create.call_count == calls
+
+    # a flow run writes a new marker: the next request reloads the workspace, once
+    generation = workspace_manager.write_generation()
+    for _ in range(10):
+        client.get("/get_dashboard_url")
+    assert create.call_count == calls + 1
+    assert workspace_manager.WorkspaceManager.get_instance().generation == generation
+
+
+def test_cached_responses_with_etags(mock_app):
+    from src.dashboard import workspace_manager
+
+    client = mock_app.app.test_client()
+    details = {
+        "hospital_unique_values": ["hospital1", "hospital2"],
+        "sex_unique_values": ["F", "M"],
+        "instrument_type_unique_values": [],
+        "patient_class_unique_values": [],
+    }
+    with patch.object(mock_app, "load_details", return_value=details) as load_details:
+        response = client.get("/get_filter_options")
+        assert response.get_json()["sex"] == ["female", "male"]
+        etag = response.headers["ETag"]
+        for _ in range(10):
+            assert client.get("/get_filter_options", headers={"If-None-Match": etag}).status_code == 304
+        assert load_details.call_count == 1
+
+        url = client.get("/get_dashboard_url")
+        assert url.get_json()["dashboard_url"].endswith("/projects/project-id")
+        assert client.get("/get_dashboard_url", headers={"If-None-Match": url.headers["ETag"]}).status_code == 304
+
+        # a flow run rebuilds the responses, and the ETags only change if the content does
+        details["hospital_unique_values"].append("hospital3")
+        workspace_manager.write_generation()
+        response = client.get("/get_filter_options", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.get_json()["hospital"] == ["hospital1", "hospital2", "hospital3"]
+        assert client.get("/get_dashboard_url", headers={"If-None-Match": url.headers["ETag"]}).status_code == 304
+        assert load_details.call_count == 2
+
+
+def test_metrics_endpoint(mock_app):
+    from src.utils.api_metrics import record_insert
+
+    client = mock_app.app.test_client()
+    for _ in range(3):
+        client.get("/get_dashboard_url")
+    client.get("/fact_card/missing.png")
+    record_insert("model_results", 250, 0.02)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    lines = response.get_data(as_text=True).splitlines()
+    # the counters are per process, so only check that the requests are labelled by route
+    assert any(
+        line.startswith('http_requests_total{api="dashboard",endpoint="/get_dashboard_url",method="GET",status="200"}')
+        for line in lines
+    )
+    assert any('endpoint="/fact_card/<path:file_name>"' in line and 'status="404"' in line for line in lines)
+    assert any(line.startswith('ingested_rows_total{collection="model_results"}') for line in lines)
+    assert any(line.startswith('http_request_duration_seconds_bucket{api="dashboard"') for line in lines)
+
+
+def build_view_panels(config, tags):
+    """
+    Build a single panel reading the data snapshots of the tags.
+    """
+    from evidently.renderers.html_widgets import WidgetSize
+    from evidently.ui.dashboards import CounterAgg, DashboardPanelCounter, ReportFilter
+
+    return [
+        DashboardPanelCounter(
+            filter=ReportFilter(metadata_values={}, tag_values=list(tags) + ["data"]),
+            agg=CounterAgg.NONE,
+            title=",".join(tags),
+            size=WidgetSize.FULL,
+        )
+    ]
+
+
+def test_sessions_get_separate_views(mock_workspace_app, tmp_path):
+    from evidently.ui.workspace import Workspace
+
+    mock_app, project = mock_workspace_app
+
+    def read_view(dashboard_url):
+        # read the project as the Evidently UI does, from the workspace directory
+        view = Workspace.create(str(tmp_path)).get_project(dashboard_url.rsplit("/", 1)[-1])
+        return [panel.title for panel in view.dashboard.panels], sorted(
+            tag for snapshot in view.list_snapshots() for tag in snapshot.tags
+        )
+
+    client_a = mock_app.app.test_client()
+    client_b = mock_app.app.test_client()
+    with patch.object(mock_app, "build_panels", side_effect=build_view_panels):
+        view_a = client_a.post("/apply_filters", json={"filter1": "hospital1"}).get_json()
+        shown_a = read_view(view_a["dashboard_url"])
+        assert shown_a == (["hospital1,single"], ["data", "hospital1", "single"])
+
+        view_b = client_b.post("/apply_filters", json={"filter1": "male"}).get_json()
+        assert view_b["dashboard_url"] != view_a["dashboard_url"]
+        assert view_b["session_id"] != view_a["session_id"]
+        assert read_view(view_b["dashboard_url"]) == (["male,single"], ["data", "male", "single"])
+        # the other session's filters leave the view of the first session as it was
+        assert read_view(view_a["dashboard_url"]) == shown_a
+
+        # applying a filter set again is a lookup: the view project isn't written
+        metadata_path = tmp_path / view_a["dashboard_url"].rsplit("/", 1)[-1] / "metadata.json"
+        mtime = metadata_path.stat().st_mtime_ns
+        again = client_b.post("/apply_filters", json={"filter1": "hospital1"}).get_json()
+        assert again["dashboard_url"] == view_a["dashboard_url"]
+        assert metadata_path.stat().st_mtime_ns == mtime
+        assert client_a.get(f"/get_view?session_id={view_a['session_id']}").get_json()["dashboard_url"] == (
+            view_a["dashboard_url"]
+        )
+
+        # no filter shows the main project
+        main = client_a.post("/apply_filters", json={"session_id": view_a["session_id"]}).get_json()
+        assert main["dashboard_url"].endswith(f"/projects/{project.id}")
+
+    # after a run, the flow links the new snapshots into the views that read them
+    import pandas as pd
+    from evidently.metrics import DatasetSummaryMetric
+    from evidently.report import Report
+    from src.dashboard.filter_views import sync_views
+
+    workspace = Workspace.create(str(tmp_path))
+    report = Report(metrics=[DatasetSummaryMetric()], tags=["hospital1", "single", "data"])
+    report.run(reference_data=pd.DataFrame({"value": [1.0]}), current_data=pd.DataFrame({"value": [2.0]}))
+    workspace.add_report(project.id, report)
+    sync_views(workspace, mock_app.config, workspace.get_project(project.id), build_view_panels)
+    assert len(read_view(view_a["dashboard_url"])[1]) == 6
+    assert read_view(view_b["dashboard_url"]) == (["male,single"], ["data", "male", "single"])
+
+
+def test_least_recently_used_view_is_evicted(mock_workspace_app, tmp_path):
+    from evidently.ui.workspace import Workspace
+    from src.dashboard.filter_views import is_view_name, load_views
+
+    mock_app, project = mock_workspace_app
+    client = mock_app.app.test_client()
+    with patch.object(mock_app, "build_panels", side_effect=build_view_panels), patch.dict(
+        mock_app.config, {"dashboard_views": {"max_views": 1}}
+    ):
+        first = client.post("/apply_filters", json={"filter1": "hospital1"}).get_json()
+        second = client.post("/apply_filters", json={"filter1": "male"}).get_json()
+
+    # the view project and its registry entry are deleted
+    first_id = first["dashboard_url"].rsplit("/", 1)[-1]
+    second_id = second["dashboard_url"].rsplit("/", 1)[-1]
+    assert not (tmp_path / first_id).exists()
+    workspace = Workspace.create(str(tmp_path))
+    assert load_views(workspace, mock_app.config) == {second_id: ("male", "single")}
+    # the view projects are named so that the Evidently UI leaves them out of the project list
+    assert [is_view_name(p.name) for p in sorted(workspace.list_projects(), key=lambda p: p.id != project.id)] == [
+        False,
+        True,
+    ]
+
+
+def test_evidently_ui_hides_view_projects(tmp_path):
+    from evidently.ui.app import create_app, get_config
+    from evidently.ui.workspace import Workspace
+    from litestar.testing import TestClient
+    from src.dashboard.evidently_ui import ViewHidingStorageComponent
+    from src.dashboard.filter_views import get_view_name
+
+    workspace = Workspace.create(str(tmp_path))
+    config = {"info": {"project_name": "Model"}}
+    workspace.create_project("Model")
+    view = workspace.create_project(get_view_name(config, ("male", "single")))
+
+    ui_config = get_config(workspace=str(tmp_path))
+    ui_config.storage = ViewHidingStorageComponent(path=str(tmp_path), autorefresh=False)
+    with TestClient(create_app(ui_config)) as client:
+        assert [project["name"] for project in client.get("/api/projects").json()] == ["Model"]
+        # the view is still served by its URL
+        assert client.get(f"/api/projects/{view.id}/info").json()["name"] == view.name
+
+
+def test_new_views_do_not_reload_the_workspace(mock_workspace_app, tmp_path):
+    import pandas as pd
+    from evidently.metrics import DatasetSummaryMetric
+    from evidently.report import Report
+    from evidently.ui.workspace import Workspace
+    from src.dashboard import workspace_manager
+    from src.dashboard.filter_views import load_views, sync_views
+
+    mock_app, project = mock_workspace_app
+    # the flow loaded the workspace before the view was created
+    flow_workspace = Workspace.create(str(tmp_path))
+    generation = workspace_manager.read_generation()
+    client = mock_app.app.test_client()
+    with patch.object(mock_app, "build_panels", side_effect=build_view_panels):
+        view = client.post("/apply_filters", json={"filter1": "hospital1"}).get_json()
+    view_id = view["dashboard_url"].rsplit("/", 1)[-1]
+    assert workspace_manager.read_generation() == generation
+
+    report = Report(metrics=[DatasetSummaryMetric()], tags=["hospital1", "single", "data"])
+    report.run(reference_data=pd.DataFrame({"value": [1.0]}), current_data=pd.DataFrame({"value": [2.0]}))
+    flow_workspace.add_report(project.id, report)
+    sync_views(flow_workspace, mock_app.config, flow_workspace.get_project(project.id), build_view_panels)
+    # the view is added to the loaded workspace and synced, not forgotten
+    assert view_id in load_views(flow_workspace, mock_app.config)
+    assert len(Workspace.create(str(tmp_path)).get_project(view_id).list_snapshots()) == 2
@@ -0,0 +1,114 @@
+"""
+Script to test the compiled dashboard template.
+"""
+
+import pytest
+from unittest.mock import patch
+from src.dashboard import create_project
+from src.dashboard.create_project import (
+    build_panels,
+    create_bottom_panels,
+    create_interval_panel,
+    create_metric_panels,
+    create_summary_panels,
+    create_test_panels,
+    new_view,
+)
+
+TAG_SETS = [["main", "single"], ["male", "single"], ["hospital1", "female"]]
+
+
+@pytest.fixture
+def mock_config():
+    """
+    Fixture to mock the configuration file, with confidence intervals for the main and male strata
+    """
+    config = {
+        "model_config": {"model_type": {"regression": True, "binary_classification": True}},
+        "columns": {
+            "predictions": {"regression_prediction": "age_pred", "classification_prediction": "class"},
+            "labels": {"regression_label": "age_true", "classification_label": "class_true"},
+        },
+        "tests": {
+            "data_quality_tests": [{"name": "num_rows"}, {"name": "num_empty_rows", "params": {"lte": 0}}],
+            "data_drift_tests": [{"name": "share_drifted_cols"}],
+            "regression_tests": [{"name": "mae"}, {"name": "rmse"}],
+            "classification_tests": [{"name": "accuracy"}],
+        },
+        "dashboard_panels": [
+            {"name": "rmse", "type": "line", "size": "half"},
+            {"name": "accuracy", "type": "bar", "size": "full"},
+            {"name": "num_rows"},
+            {"name": "prediction_groundtruth_drift"},
+            {"name": "share_drifted_cols"},
+        ],
+        "info": {
+            "project_name": "Model",
+            "project_description": "Description",
+            "model_developer": "Developer",
+            "contact_name": "Contact",
+            "contact_email": "contact@example.com",
+            "references": [{"name": "Reference", "url": "https://example.com"}],
+            "disclaimer": "Disclaimer",
+            "fact_card": None,
+        },
+    }
+    intervals = {
+        "strata": {
+            stratum: {"rmse": {"value": 5.0, "lower": 4.5, "upper": 5.5, "n": 1000}} for stratum in ["main", "male"]
+        }
+    }
+    create_project._templates.clear()
+    with patch.object(create_project, "load_intervals", return_value=intervals):
+        yield config
+    create_project._templates.clear()
+
+
+def build_panels_directly(config: dict, tags: list) -> list:
+    """
+    Build the panels with the panel functions, without the template.
+    """
+    view = new_view(config)
+    create_summary_panels(config, tags, view)
+    create_test_panels(config, tags, view)
+    create_metric_panels(config, tags, view)
+    panel = create_interval_panel(config, tags)
+    if panel is not None:
+        view.dashboard.add_panel(panel)
+    create_bottom_panels(config, tags, view)
+    return view.dashboard.panels
+
+
+@pytest.mark.parametrize("tags", TAG_SETS)
+def test_template_matches_direct_build(mock_config, tags):
+    compiled = [panel.dict(exclude={"id"}) for panel in build_panels(mock_config, tags)]
+    direct = [panel.dict(exclude={"id"}) for panel in build_panels_directly(mock_config, tags)]
+    assert compiled == direct
+    assert not any(create_project.TAG_PLACEHOLDER in str(panel) for panel in compiled)
+
+
+def test_compiled_once_per_config(mock_config):
+    with patch.object(create_project, "load_json", wraps=create_project.load_json) as load_json:
+        for tags in TAG_SETS:
+            build_panels(mock_config, tags)
+        assert load_json.call_count == 2
+
+        # a config change compiles a new template, and the models of a run alternating keep their templates
+        changed = {**mock_config, "dashboard_panels": mock_config["dashboard_panels"][:1]}
+        build_panels(changed, ["male", "single"])
+        build_panels(mock_config, ["male", "single"])
+        assert load_json.call_count == 4
+    assert len(create_project._templates) == 2
+
+    # the least recently used templates beyond the bound are evicted
+    other = {**mock_config, "dashboard_panels": mock_config["dashboard_panels"][:2]}
+    with patch.object(create_project, "MAX_CACHED_TEMPLATES", 2):
+        build_panels(other, ["male", "single"])
+    assert list(create_project._templates) == [
+        create_project.get_config_hash(config) for config in [mock_config, other]
+    ]
+
+    # panels built for a filter set don't share their tag filters with the template
+    male = build_panels(mock_config, ["male", "single"])
+    female = build_panels(mock_config, ["female", "single"])
+    assert [panel.filter.tag_values for panel in male] != [panel.filter.tag_values for panel in female]
@@ -0,0 +1,178 @@
+"""
+Script to test the dtype compaction of the current and reference data.
+"""
+
+import glob
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+from src.data_preprocessing import dtypes
+from src.data_preprocessing.dtypes import get_memory_mb, normalize_dtypes, widen_dtypes
+from src.monitoring import metrics, tests
+from src.monitoring.stratify import DataSplitter
+
+
+@pytest.fixture
+def mock_frames():
+    """
+    Fixture to generate synthetic current and reference data with their config and details
+    """
+    config = generate_config()
+    results, labels = generate_data(config, 1000, drift=0.3, seed=1)
+    data = merge_results_and_labels(results, labels, config)
+    reference_results, reference_labels = generate_data(config, 500, seed=2)
+    reference_data = merge_results_and_labels(reference_results, reference_labels, config)
+    return data, reference_data, config, generate_details(data, config)
+
+
+def load_snapshots(directory: str) -> dict:
+    """
+    Load the snapshots of a run, without the IDs and timestamps that differ between runs.
+    """
+
+    def strip(value):
+        if isinstance(value, dict):
+            return {key: strip(item) for key, item in value.items() if key not in ("id", "timestamp", "metadata")}
+        if isinstance(value, list):
+            return [strip(item) for item in value]
+        return value
+
+    snapshots = {}
+    for path in glob.glob(os.path.join(directory, "**", "*.json"), recursive=True):
+        with open(path, "r") as file:
+            snapshots[os.path.relpath(path, directory)] = strip(json.load(file))
+    return snapshots
+
+
+def test_normalize_dtypes(mock_frames):
+    data, reference_data, config, details = mock_frames
+    # a hospital only seen in the reference data
+    reference_data.loc[0, "hospital"] = "hospital9"
+
+    compact_data, compact_reference = normalize_dtypes(data, reference_data, config, details)
+    assert isinstance(compact_data["hospital"].dtype, pd.CategoricalDtype)
+    assert compact_data["hospital"].dtype == compact_reference["hospital"].dtype
+    assert list(compact_data["hospital"].cat.categories) == details["hospital_unique_values"] + ["hospital9"]
+    assert isinstance(compact_data["feature_4"].dtype, pd.CategoricalDtype)
+    assert compact_data["class_pred"].dtype == "int8"
+    assert compact_data["age_pred"].dtype == "float64"
+    assert get_memory_mb(compact_data) < get_memory_mb(data) / 2
+
+    pd.testing.assert_frame_equal(widen_dtypes(compact_data), data)
+    pd.testing.assert_frame_equal(widen_dtypes(compact_reference), reference_data)
+
+
+def test_reports_unchanged(mock_frames, tmp_path):
+    data, reference_data, config, details = mock_frames
+    compact_data, compact_reference = normalize_dtypes(data, reference_data, config, details)
+    model_type = config["model_config"]["model_type"]
+
+    for name, (current, reference) in {
+        "wide": (data, reference_data),
+        "compact": (compact_data, compact_reference),
+    }.items():
+        run_dir = str(tmp_path / name)
+        with patch.object(metrics, "get_run_dir", return_value=run_dir), patch.object(
+            tests, "get_run_dir", return_value=run_dir
+        ), patch("src.monitoring.alerts.send_email_alert"):
+            report_strata = DataSplitter().split_data(current, config, details, "report")
+            for key in ["main_report", "hospital1_report"]:
+                metrics.generate_report(
+                    report_strata[key],
+                    reference,
+                    config,
+                    model_type,
+                    f"/reports/{key}",
+                    "2000-01-01T00:00:00",
+                    details,
+                )
+            test_strata = DataSplitter().split_data(current, config, details, "test")
+            tests.generate_tests(
+                test_strata["female_test"],
+                reference,
+                config,
+                model_type,
+                "/tests/female_test",
+                "2000-01-01T00:00:00",
+                details,
+                alerts=False,
+            )
+
+    wide = load_snapshots(str(tmp_path / "wide"))
+    assert len(wide) == 9
+    assert load_snapshots(str(tmp_path / "compact")) == wide
+
+
+def test_frames_widened_once(mock_frames, tmp_path):
+    data, reference_data, config, details = mock_frames
+    compact_data, compact_reference = normalize_dtypes(data, reference_data, config, details)
+    model_type = config["model_config"]["model_type"]
+    report_strata = DataSplitter().split_data(compact_data, config, details, "report")
+    test_strata = DataSplitter().split_data(compact_data, config, details, "test")
+    widened = []
+
+    def widen(frame):
+        widened.append(id(frame))
+        return widen_dtypes(frame)
+
+    with patch.object(dtypes, "widen_dtypes", side_effect=widen), patch.object(
+        metrics, "get_run_dir", return_value=str(tmp_path)
+    ), patch.object(tests, "get_run_dir", return_value=str(tmp_path)):
+        for key, stratum in report_strata.items():
+            metrics.generate_report(
+                stratum, compact_reference, config, model_type, f"/reports/{key}", "2000-01-01T00:00:00", details
+            )
+        for key in ["main_test", "female_test"]:
+            tests.generate_tests(
+                test_strata[key],
+                compact_reference,
+                config,
+                model_type,
+                f"/tests/{key}",
+                "2000-01-01T00:00:00",
+                details,
+                alerts=False,
+            )
+
+    # one copy of the reference data for the run and one per stratum, rather than one each per report and suite
+    assert widened.count(id(compact_reference)) == 1
+    assert len(widened) == 1 + len(report_strata) + 2
+    # the wide strata are released once their reports and suites ran
+    kept = [frame() for frame, _ in dtypes._wide_frames.values()]
+    assert any(frame is compact_reference for frame in kept)
+    assert not any(frame is stratum for frame in kept for stratum in [*report_strata.values(), *test_strata.values()])
+
+
+def test_frames_widened_in_parallel(mock_frames):
+    data, reference_data, config, details = mock_frames
+    compact_data, compact_reference = normalize_dtypes(data, reference_data, config, details)
+    reference_widened = threading.Event()
+    widened = []
+
+    def widen(frame):
+        # the data waits for the reference data, which blocks if a conversion holds a lock of every frame
+        if frame is compact_data:
+            assert reference_widened.wait(timeout=10)
+        widened.append(id(frame))
+        wide = widen_dtypes(frame)
+        if frame is compact_reference:
+            reference_widened.set()
+        return wide
+
+    with patch.object(dtypes, "widen_dtypes", side_effect=widen), ThreadPoolExecutor(max_workers=4) as executor:
+        data_futures = [executor.submit(dtypes.widen_once, compact_data) for _ in range(2)]
+        reference_futures = [executor.submit(dtypes.widen_once, compact_reference) for _ in range(2)]
+        wide_data = [future.result() for future in data_futures]
+        wide_reference = [future.result() for future in reference_futures]
+
+    # every frame is widened once, and the runs on the same frame share its wide frame
+    assert sorted(widened) == sorted([id(compact_data), id(compact_reference)])
+    assert wide_data[0] is wide_data[1]
+    assert wide_reference[0] is wide_reference[1]
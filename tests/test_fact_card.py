@@ -0,0 +1,61 @@
+"""
+Script to test the fact card asset.
+"""
+
+import io
+import os
+import subprocess
+import sys
+import pytest
+import numpy as np
+from unittest.mock import patch
+from src.dashboard import fact_card
+
+
+@pytest.fixture
+def mock_config(tmp_path):
+    """
+    Fixture to mock the configuration file with a fact card in a temporary images directory
+    """
+    images_dir = tmp_path / "images"
+    images_dir.mkdir()
+    (images_dir / "ModelFactCard.png").write_bytes(b"\x89PNG fact card")
+    with patch.object(fact_card, "FACT_CARD_DIR", str(images_dir)):
+        yield {"info": {"fact_card": "ModelFactCard.png"}}
+
+
+def test_prepared_once_and_served_by_url(mock_config, tmp_path):
+    cache_dir = str(tmp_path / "fact_cards")
+    with patch.object(fact_card, "optimize_image", side_effect=lambda content, image_format: content) as optimize:
+        url = fact_card.get_fact_card_url(mock_config, cache_dir)
+        assert fact_card.get_fact_card_url(mock_config, cache_dir) == url
+        assert fact_card.prepare_fact_card(mock_config, cache_dir) == url.rsplit("/", 1)[1]
+        assert optimize.call_count == 1
+
+    assert url.startswith("http://localhost:5002/fact_card/") and url.endswith(".png")
+    assert os.listdir(cache_dir) == [url.rsplit("/", 1)[1]]
+
+
+def test_missing_or_invalid_fact_card(mock_config, tmp_path):
+    assert fact_card.get_fact_card_url({"info": {"fact_card": None}}) is None
+    assert fact_card.get_fact_card_url({"info": {"fact_card": "missing.png"}}) is None
+    (tmp_path / "images" / "card.gif").write_bytes(b"GIF")
+    assert fact_card.get_fact_card_url({"info": {"fact_card": "card.gif"}}) is None
+
+
+def test_resized_to_budget():
+    Image = pytest.importorskip("PIL.Image")
+    rng = np.random.default_rng(0)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 256, (2400, 3000, 3), dtype=np.uint8)).save(buffer, format="JPEG", quality=95)
+    assert len(buffer.getvalue()) > fact_card.MAX_FACT_CARD_BYTES
+
+    optimized = fact_card.optimize_image(buffer.getvalue(), "JPEG")
+    assert len(optimized) <= fact_card.MAX_FACT_CARD_BYTES
+    assert Image.open(io.BytesIO(optimized)).width <= fact_card.MAX_FACT_CARD_WIDTH
+
+
+def test_imported_without_the_database_client():
+    # the API serves the fact card, it shouldn't need the MongoDB client of the ETL
+    code = "import sys, src.dashboard.fact_card; print('pymongo' in sys.modules)"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "False"
@@ -0,0 +1,57 @@
+"""
+Script to test fetching the matched data and moving it once its run succeeded.
+"""
+
+import os
+from collections import defaultdict
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from src.data_preprocessing import fetch_data
+
+
+@pytest.fixture
+def mock_db():
+    """
+    Fixture to mock the MongoDB database with pending results and labels, one of them without a label
+    """
+    collections = defaultdict(MagicMock)
+    db = MagicMock()
+    db.__getitem__.side_effect = collections.__getitem__
+    db.list_collection_names.return_value = ["model_results", "model_labels", "model_matched"]
+    collections["model_results"].find.return_value = [
+        {"_id": i, "StudyID": i, "timestamp": f"2024-08-01 0{i}:00:00", "prediction": i} for i in range(3)
+    ]
+    collections["model_labels"].find.return_value = [
+        {"_id": i, "StudyID": i, "timestamp": "2024-08-02 00:00:00", "label": i} for i in range(2)
+    ]
+    with patch.dict(os.environ, {"MONGO_URI": "mongodb://test"}), patch.object(
+        fetch_data, "get_db_connection", return_value=db
+    ):
+        yield collections
+
+
+def test_rows_move_after_the_run(mock_db):
+    config = {"model_config": {"model_id": "model"}, "columns": {"study_id": "StudyID", "timestamp": "timestamp"}}
+    data = fetch_data.fetch_and_merge(config)
+    assert sorted(data["StudyID"]) == [0, 1]
+    assert list(data.columns) == ["StudyID", "timestamp", "prediction", "label"]
+    # a run that fails before the move is retried on the same rows
+    mock_db["model_matched"].insert_many.assert_not_called()
+    mock_db["model_results"].delete_many.assert_not_called()
+
+    fetch_data.move_matched(config, [0, 1])
+    query = {"StudyID": {"$in": [0, 1]}}
+    assert mock_db["model_results"].find.call_args.args == (query,)
+    assert sorted(record["StudyID"] for record in mock_db["model_matched"].insert_many.call_args.args[0]) == [0, 1]
+    mock_db["model_results"].delete_many.assert_called_once_with(query)
+    mock_db["model_labels"].delete_many.assert_called_once_with(query)
+
+
+def test_rejected_rows_move_to_the_rejected_collection(mock_db):
+    config = {"model_config": {"model_id": "model"}, "columns": {"study_id": "StudyID", "timestamp": "timestamp"}}
+    fetch_data.move_rejected(config, [1])
+    mock_db["model_rejected"].insert_many.assert_called_once()
+    mock_db["model_matched"].insert_many.assert_not_called()
+    mock_db["model_results"].delete_many.assert_called_once_with({"StudyID": {"$in": [1]}})
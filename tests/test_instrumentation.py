@@ -0,0 +1,131 @@
+"""
+Script to test the per-stage instrumentation of the monitoring flow.
+"""
+
+import json
+import time
+import threading
+import pytest
+import pandas as pd
+from unittest.mock import patch
+from src.monitoring import instrumentation
+from src.monitoring.instrumentation import finish_run, get_records, stage, start_run
+
+
+@pytest.fixture
+def mock_run():
+    """
+    Fixture to start a new instrumented run
+    """
+    start_run()
+    yield
+    start_run()
+
+
+def test_stage_records(mock_run, tmp_path):
+    with stage("sleep", rows=10):
+        time.sleep(0.05)
+    with stage("compute") as record:
+        sum(i * i for i in range(10**6))
+        record["rows"] = 10**6
+    with pytest.raises(ValueError):
+        with stage("failing"):
+            raise ValueError("stage failed")
+
+    records = {record["stage"]: record for record in get_records()}
+    assert records["sleep"]["wall_time"] >= 0.05
+    assert records["sleep"]["cpu_time"] < records["sleep"]["wall_time"]
+    assert records["sleep"]["rows"] == 10
+    assert records["compute"]["cpu_time"] > 0
+    assert records["compute"]["rows"] == 10**6
+    assert "failing" in records
+    assert all(record["peak_rss_mb"] > 0 for record in records.values())
+
+    file_path = finish_run("2024-08-01T00:00:00", str(tmp_path))
+    with open(file_path) as file:
+        saved = json.load(file)
+    assert [record["stage"] for record in saved["stages"]] == ["sleep", "compute", "failing"]
+    assert saved["wall_time"] >= 0.05
+
+
+def test_concurrent_stages(mock_run):
+    def task(key):
+        with stage(f"report.{key}", rows=key):
+            time.sleep(0.01)
+
+    threads = [threading.Thread(target=task, args=(key,)) for key in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(record["rows"] for record in get_records()) == list(range(20))
+
+
+def test_etl_stages(mock_run):
+    from src.data_preprocessing import etl
+
+    data = pd.DataFrame({"StudyID": range(100)})
+    with patch.object(etl, "fetch_and_merge", return_value=data), patch.object(
+        etl, "validate_data", return_value=True
+    ), patch.object(etl, "reference_load_and_validate", return_value=data), patch.object(
+        etl, "data_details"
+    ), patch.object(
+        etl, "load_details"
+    ), patch.object(
+        etl, "normalize_dtypes", return_value=(data, data)
+    ):
+        etl.etl_pipeline({})
+    assert {record["stage"]: record["rows"] for record in get_records()} == {
+        "etl.validate": 100,
+        "etl.update_reference": None,
+        "etl.details": 100,
+        "etl.dtypes": 200,
+    }
+
+
+def test_summary_table(mock_run):
+    with stage("report.main_report", rows=5):
+        pass
+    summary = instrumentation.format_summary(get_records())
+    assert summary.splitlines()[1].startswith("report.main_report")
+
+
+def test_profiled_stages(mock_run, tmp_path):
+    start_run("report.*", str(tmp_path))
+    with stage("report.main_report"):
+        # nested stages of a profiled stage are not profiled again
+        with stage("report.nested"):
+            sum(i * i for i in range(10**5))
+    with stage("test.main_test"):
+        pass
+
+    records = {record["stage"]: record for record in get_records()}
+    assert records["report.main_report"]["profile"] == str(tmp_path / "report.main_report.prof")
+    assert "profile" not in records["report.nested"] and "profile" not in records["test.main_test"]
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["report.main_report.prof", "report.main_report.txt"]
+    assert "cumulative" in (tmp_path / "report.main_report.txt").read_text()
+
+
+def test_stages_of_several_models(mock_run, tmp_path):
+    # the profiles of each model go to its own snapshots, under the stage names prefixed with its namespace
+    start_run("*.report.*", lambda config: str(tmp_path / config["namespace"]))
+    for namespace in ["model_a", "model_b"]:
+        with stage("report.main_report", config={"namespace": namespace}):
+            pass
+
+    assert [record["stage"] for record in get_records()] == [
+        "model_a.report.main_report",
+        "model_b.report.main_report",
+    ]
+    for namespace in ["model_a", "model_b"]:
+        assert (tmp_path / namespace / f"{namespace}.report.main_report.prof").exists()
+    assert instrumentation.get_profile_dir("2024-08-01T00:00:00", {"namespace": "model_a"}).endswith(
+        "snapshots/model_a/2024-08-01T00:00:00/.profile"
+    )
+
+
+def test_profile_patterns(monkeypatch):
+    monkeypatch.setenv(instrumentation.PROFILE_ENV, "all")
+    assert instrumentation.get_profile_patterns() == ["*"]
+    assert instrumentation.get_profile_patterns(" report.*, create_dashboard,") == ["report.*", "create_dashboard"]
+    assert instrumentation.get_profile_patterns("") == []
@@ -0,0 +1,88 @@
+"""
+Script to test the incremental snapshot registration.
+"""
+
+import uuid
+import pytest
+import pandas as pd
+from unittest.mock import MagicMock, patch
+from evidently.report import Report
+from evidently.metrics import DatasetSummaryMetric
+from src.dashboard.create_project import log_snapshots
+from src.monitoring.snapshots import save_snapshot
+
+
+@pytest.fixture
+def mock_report():
+    """
+    Fixture to generate a small report
+    """
+    data = pd.DataFrame({"age": [50.0, 60.0, 70.0], "sex": ["M", "F", "M"]})
+    report = Report(metrics=[DatasetSummaryMetric()], tags=["main"])
+    report.run(reference_data=data, current_data=data)
+    return report
+
+
+def write_run(snapshots_dir, timestamp, report):
+    """
+    Write the snapshots of one run in the layout of the flow.
+    """
+    for strata in ["main_report", "male_report"]:
+        strata_path = snapshots_dir / timestamp / "reports" / strata
+        strata_path.mkdir(parents=True)
+        save_snapshot(report, str(strata_path / "data_quality_report.json"), {})
+
+
+def test_only_new_snapshots_are_added(tmp_path, mock_report):
+    project = MagicMock(id=uuid.uuid4())
+    workspace = MagicMock()
+    write_run(tmp_path, "2024-08-01T00:00:00", mock_report)
+
+    with patch("src.dashboard.create_project.get_snapshots_dir", return_value=str(tmp_path)):
+        log_snapshots(project, workspace)
+        assert workspace.add_snapshot.call_count == 2
+
+        # nothing changed, nothing is added again
+        log_snapshots(project, workspace)
+        assert workspace.add_snapshot.call_count == 2
+
+        write_run(tmp_path, "2024-08-02T00:00:00", mock_report)
+        log_snapshots(project, workspace)
+        assert workspace.add_snapshot.call_count == 4
+
+        # a recreated project gets the whole history
+        log_snapshots(MagicMock(id=uuid.uuid4()), workspace)
+        assert workspace.add_snapshot.call_count == 8
+
+
+def test_failed_snapshots_are_retried(tmp_path, mock_report):
+    project = MagicMock(id=uuid.uuid4())
+    workspace = MagicMock()
+    write_run(tmp_path, "2024-08-01T00:00:00", mock_report)
+    workspace.add_snapshot.side_effect = [Exception("workspace unavailable"), None]
+
+    with patch("src.dashboard.create_project.get_snapshots_dir", return_value=str(tmp_path)):
+        log_snapshots(project, workspace)
+        workspace.add_snapshot.side_effect = None
+        log_snapshots(project, workspace)
+    assert workspace.add_snapshot.call_count == 3
+
+
+def test_parallel_rebuild(tmp_path, mock_report):
+    project = MagicMock(id=uuid.uuid4())
+    workspace = MagicMock()
+    for day in range(1, 4):
+        write_run(tmp_path, f"2024-08-0{day}T00:00:00", mock_report)
+    (tmp_path / "2024-08-01T00:00:00" / "reports" / "main_report" / "regression_report.json").write_text("{")
+
+    with patch("src.dashboard.create_project.get_snapshots_dir", return_value=str(tmp_path)), patch(
+        "src.dashboard.rebuild.PARALLEL_MIN_SNAPSHOTS", 1
+    ):
+        log_snapshots(project, workspace, workers=2, batch_size=4)
+        assert workspace.add_snapshot.call_count == 6
+        assert {call.args[1].tags[0] for call in workspace.add_snapshot.call_args_list} == {"main"}
+
+        # the corrupted file is retried, the others are not
+        workspace.reset_mock()
+        log_snapshots(project, workspace, workers=2, batch_size=4)
+        assert workspace.add_snapshot.call_count == 0
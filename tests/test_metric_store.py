@@ -0,0 +1,136 @@
+"""
+Script to test the metric store and the metrics query endpoint of the dashboard API.
+"""
+
+import sqlite3
+import pytest
+from unittest.mock import patch
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+from src.monitoring import metrics, tests
+from src.monitoring.metric_store import MetricStore, collect_run_values, save_metric_values
+from tests.test_dashboard_api import mock_app  # noqa: F401
+
+
+@pytest.fixture
+def mock_intervals():
+    """
+    Fixture to mock the confidence intervals of a run
+    """
+
+    def intervals(shift: float) -> dict:
+        return {
+            "main": {
+                "rmse": {"value": 5.0 + shift, "lower": 4.5 + shift, "upper": 5.5 + shift, "n": 1000},
+                "mae": {"value": 4.0 + shift, "lower": 3.5 + shift, "upper": 4.5 + shift, "n": 1000},
+            },
+            "male": {"rmse": {"value": 6.0 + shift, "lower": 5.0 + shift, "upper": 7.0 + shift, "n": 500}},
+        }
+
+    return intervals
+
+
+def test_query_and_pagination(tmp_path, mock_intervals):
+    db_path = str(tmp_path / "metrics.db")
+    for day in range(1, 11):
+        save_metric_values(mock_intervals(day), f"2024-08-{day:02d}T00:00:00", db_path)
+
+    store = MetricStore(db_path)
+    rmse = store.query("main", metric="rmse", start="2024-08-03T00:00:00", end="2024-08-05T00:00:00")
+    assert [value["value"] for value in rmse["values"]] == [8.0, 9.0, 10.0]
+    assert rmse["next_offset"] is None
+
+    values = []
+    offset = 0
+    while offset is not None:
+        page = store.query("main", limit=3, offset=offset)
+        values += page["values"]
+        offset = page["next_offset"]
+    assert len(values) == 20
+    assert [value["timestamp"] for value in values] == sorted(value["timestamp"] for value in values)
+
+    # re-adding a run replaces its values and changes the version
+    version = store.version()
+    store.add_run(mock_intervals(0), "2024-08-10T00:00:00")
+    assert store.version() != version
+    assert store.query("male", start="2024-08-10T00:00:00")["values"][0]["value"] == 6.0
+
+    # deleting a run other than the newest changes the version too
+    version = store.version()
+    assert store.delete_runs(["2024-08-01T00:00:00"])
+    assert store.version() != version
+    store.close()
+
+
+def test_metrics_endpoint_etag(mock_app, tmp_path, mock_intervals):  # noqa: F811
+    client = mock_app.app.test_client()
+    db_path = str(tmp_path / "metrics.db")
+    with patch.object(mock_app, "get_metric_store_path", return_value=db_path):
+        assert client.get("/get_metrics").status_code == 400
+        assert client.get("/get_metrics?stratum=main").get_json()["values"] == []
+
+        save_metric_values(mock_intervals(0), "2024-08-01T00:00:00", db_path)
+        response = client.get("/get_metrics?stratum=main&metric=rmse&limit=1")
+        assert response.get_json()["values"][0]["value"] == 5.0
+        etag = response.headers["ETag"]
+
+        cached = client.get("/get_metrics?stratum=main&metric=rmse&limit=1", headers={"If-None-Match": etag})
+        assert cached.status_code == 304
+        other = client.get("/get_metrics?stratum=male&metric=rmse&limit=1", headers={"If-None-Match": etag})
+        assert other.status_code == 200
+
+        # a new run invalidates the ETag
+        save_metric_values(mock_intervals(1), "2024-08-02T00:00:00", db_path)
+        response = client.get("/get_metrics?stratum=main&metric=rmse&limit=1", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.get_json()["next_offset"] == 1
+
+
+def test_read_only_store(tmp_path, mock_intervals):
+    db_path = str(tmp_path / "metrics.db")
+    with pytest.raises(sqlite3.OperationalError):
+        MetricStore(db_path, read_only=True)
+    assert not (tmp_path / "metrics.db").exists()
+
+    save_metric_values(mock_intervals(0), "2024-08-01T00:00:00", db_path)
+    store = MetricStore(db_path, read_only=True)
+    assert len(store.query("main")["values"]) == 2
+    with pytest.raises(sqlite3.OperationalError):
+        store.add_run(mock_intervals(1), "2024-08-02T00:00:00")
+    store.close()
+
+
+def test_collect_run_values(tmp_path):
+    config = generate_config(n_features=2)
+    results, labels = generate_data(config, 300, drift=0.5, seed=7)
+    data = merge_results_and_labels(results, labels, config)
+    reference_results, reference_labels = generate_data(config, 300, seed=8)
+    reference_data = merge_results_and_labels(reference_results, reference_labels, config)
+    details = generate_details(data, config)
+    model_type = config["model_config"]["model_type"]
+    with patch.object(metrics, "get_run_dir", return_value=str(tmp_path)), patch.object(
+        tests, "get_run_dir", return_value=str(tmp_path)
+    ):
+        metrics.generate_report(
+            data, reference_data, config, model_type, "/reports/main_report", "2024-08-01T00:00:00", details
+        )
+        tests.generate_tests(
+            data, reference_data, config, model_type, "/tests/main_test", "2024-08-01T00:00:00", details, alerts=False
+        )
+
+    values = collect_run_values(str(tmp_path))
+    assert list(values) == ["main"]
+    main = {metric: value["value"] for metric, value in values["main"].items()}
+    assert 0 < main["share_of_drifted_columns"] <= 1
+    assert main["number_of_drifted_columns"] >= 1
+    assert "drift_score.age" in main
+    assert main["test.Number of Rows"] == 1.0
+    assert set(value for metric, value in main.items() if metric.startswith("test.")) <= {0.0, 1.0}
+
+    db_path = str(tmp_path / "metrics.db")
+    save_metric_values(values, "2024-08-01T00:00:00", db_path)
+    store = MetricStore(db_path, read_only=True)
+    assert (
+        store.query("main", metric="share_of_drifted_columns")["values"][0]["value"]
+        == main["share_of_drifted_columns"]
+    )
+    store.close()
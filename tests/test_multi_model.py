@@ -0,0 +1,64 @@
+"""
+Script to test the namespaces of the monitored models.
+"""
+
+import json
+import pytest
+from src.utils import config_manager
+from src.utils.config_manager import get_model_config, load_model_configs
+from src.monitoring.snapshots import get_run_dir
+from src.monitoring.bootstrap import get_intervals_path
+from src.monitoring.metric_store import get_metric_store_path
+from src.monitoring.cache import get_cache_dir
+from src.data_preprocessing.reference_store import get_reference_path
+from scripts.data_details import DETAILS_FILE_PATH, get_details_path
+
+
+@pytest.fixture
+def mock_models_dir(tmp_path, monkeypatch):
+    """
+    Fixture to point the models directory to a temporary directory
+    """
+    monkeypatch.setattr(config_manager, "MODELS_DIRS", [str(tmp_path)])
+    return tmp_path
+
+
+def write_model(models_dir, file_name, model_id):
+    with open(models_dir / file_name, "w") as file:
+        json.dump({"model_config": {"model_id": model_id}, "info": {"project_name": model_id}}, file)
+
+
+def test_single_model_without_namespace(mock_models_dir):
+    configs = load_model_configs()
+    assert len(configs) == 1 and "namespace" not in configs[0]
+    assert get_model_config() == configs[0]
+    # the paths of a single model are unchanged
+    assert get_run_dir("2024-08-01T00:00:00", configs[0]).endswith("snapshots/2024-08-01T00:00:00")
+    assert get_details_path(configs[0]) == DETAILS_FILE_PATH
+
+
+def test_model_namespaces(mock_models_dir):
+    write_model(mock_models_dir, "b.json", "bone_age")
+    write_model(mock_models_dir, "a.json", "chest_xray")
+    write_model(mock_models_dir, "notes.txt", "ignored")
+    configs = load_model_configs()
+    assert [config["namespace"] for config in configs] == ["chest_xray", "bone_age"]
+
+    config = get_model_config("bone_age")
+    assert get_run_dir("2024-08-01T00:00:00", config).endswith("snapshots/bone_age/2024-08-01T00:00:00")
+    assert get_cache_dir(config).endswith("snapshots/bone_age/.cache")
+    for path in [
+        get_intervals_path(config),
+        get_metric_store_path(config),
+        get_details_path(config),
+        get_reference_path(config),
+    ]:
+        assert "data/bone_age/" in path
+    with pytest.raises(ValueError):
+        get_model_config()
+    with pytest.raises(ValueError):
+        get_model_config("unknown")
+
+    write_model(mock_models_dir, "c.json", "bone_age")
+    with pytest.raises(ValueError):
+        load_model_configs()
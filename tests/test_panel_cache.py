@@ -0,0 +1,68 @@
+"""
+Script to test the dashboard panel cache.
+"""
+
+import threading
+from src.dashboard.panel_cache import PanelCache, normalize_tags
+
+
+def test_normalize_tags():
+    assert normalize_tags(["male", "hospital1"]) == normalize_tags(["hospital1", "male", "male"])
+    assert normalize_tags([]) == ("main", "single")
+    assert normalize_tags(["", None]) == ("main", "single")
+
+
+def test_lookup_and_eviction():
+    cache = PanelCache(max_size=2)
+    builds = []
+
+    def builder(tags):
+        builds.append(tags)
+        return [f"panel for {tags}"]
+
+    assert cache.get_or_build(["male", "single"], builder) == ["panel for ['male', 'single']"]
+    cache.get_or_build(["single", "male"], builder)
+    assert len(builds) == 1
+
+    cache.get_or_build(["female", "single"], builder)
+    cache.get_or_build(["male", "single"], builder)
+    # the least recently used filter set is evicted
+    cache.get_or_build(["hospital1", "single"], builder)
+    cache.get_or_build(["female", "single"], builder)
+    assert len(builds) == 4
+    assert cache.hits == 2
+
+
+def test_new_version_invalidates():
+    cache = PanelCache()
+    builds = []
+
+    def builder(tags):
+        builds.append(tags)
+        return list(tags)
+
+    cache.get_or_build(["male"], builder, version="2024-08-01T00:00:00")
+    cache.get_or_build(["male"], builder, version="2024-08-01T00:00:00")
+    cache.get_or_build(["male"], builder, version="2024-08-02T00:00:00")
+    assert len(builds) == 2
+
+
+def test_concurrent_requests_build_once():
+    cache = PanelCache()
+    builds = []
+    barrier = threading.Barrier(20)
+
+    def builder(tags):
+        builds.append(tags)
+        return list(tags)
+
+    def request():
+        barrier.wait()
+        assert cache.get_or_build(["hospital1", "male"], builder) == ["hospital1", "male"]
+
+    threads = [threading.Thread(target=request) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(builds) == 1
@@ -0,0 +1,72 @@
+"""
+Script to test the pending matches that trigger the monitoring flow.
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock
+from src.utils.pending_matches import (
+    get_trigger_settings,
+    record_claims,
+    record_pending_matches,
+    release_claims,
+    should_trigger,
+)
+
+NOW = datetime(2024, 8, 1, 12, tzinfo=timezone.utc)
+
+
+def pending(count, waited_seconds, quiet_seconds):
+    # MongoDB returns naive UTC datetimes
+    return {
+        "count": count,
+        "first_pending_at": (NOW - timedelta(seconds=waited_seconds)).replace(tzinfo=None),
+        "last_upload_at": (NOW - timedelta(seconds=quiet_seconds)).replace(tzinfo=None),
+    }
+
+
+def test_should_trigger():
+    settings = get_trigger_settings({"trigger": {"min_rows": 50}})
+    assert settings["debounce_seconds"] == 60
+    assert not should_trigger({"count": 0}, settings, NOW)
+    # enough rows, but uploads are still coming
+    assert not should_trigger(pending(500, 120, 10), settings, NOW)
+    assert should_trigger(pending(500, 120, 60), settings, NOW)
+    # too few rows, until the oldest has waited long enough, even during uploads
+    assert not should_trigger(pending(10, 600, 600), settings, NOW)
+    assert should_trigger(pending(10, 3600, 5), settings, NOW)
+
+
+def test_record_pending_matches():
+    db = MagicMock()
+    record_pending_matches(db, "model", 3, NOW)
+    record_pending_matches(db, "model", 0, NOW)
+    with_matches, without_matches = [call.args for call in db["pending_matches"].update_one.call_args_list]
+    assert with_matches[0] == {"_id": "model"}
+    assert with_matches[1] == {
+        "$set": {"last_upload_at": NOW},
+        "$inc": {"count": 3},
+        "$min": {"first_pending_at": NOW},
+    }
+    # uploads without matches only delay a run
+    assert without_matches[1] == {"$set": {"last_upload_at": NOW}}
+
+
+def test_failed_run_gives_its_claims_back():
+    db = MagicMock()
+    record_claims(db, "run-id", {"model": pending(120, 600, 60)})
+    claim = db["flow_run_claims"].insert_one.call_args.args[0]
+    assert claim["_id"] == "run-id"
+    assert claim["claims"]["model"]["count"] == 120
+
+    # a completed run only forgets its claims
+    release_claims(db, claim, failed=False)
+    db["pending_matches"].update_one.assert_not_called()
+    db["flow_run_claims"].delete_one.assert_called_once_with({"_id": "run-id"})
+
+    # the rows of a failed run are still waiting, since they were first pending
+    release_claims(db, claim, failed=True)
+    db["pending_matches"].update_one.assert_called_once_with(
+        {"_id": "model"},
+        {"$inc": {"count": 120}, "$min": {"first_pending_at": claim["claims"]["model"]["first_pending_at"]}},
+        upsert=True,
+    )
@@ -0,0 +1,89 @@
+"""
+Script to test the selection and swapping of the windowed reference data.
+"""
+
+from datetime import datetime, timezone
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from scripts.synthetic_data import generate_config, generate_data, merge_results_and_labels
+from src.data_preprocessing import reference_manager
+from src.data_preprocessing.reference_store import read_reference, write_reference
+
+
+@pytest.fixture
+def mock_archive():
+    """
+    Fixture to generate a synthetic archive of matched data over 30 days from 2024-08-01
+    """
+    config = generate_config()
+    results, labels = generate_data(config, 3000, n_days=30, seed=5)
+    return merge_results_and_labels(results, labels, config), config
+
+
+@pytest.fixture
+def mock_fetch(mock_archive, tmp_path):
+    """
+    Fixture to read the time ranges from the synthetic archive and keep the reference data in a temporary directory
+    """
+    archive, _ = mock_archive
+
+    def fetch_matched_range(config, start=None, end=None):
+        return archive[(archive["timestamp"] >= start) & (archive["timestamp"] < end)].reset_index(drop=True)
+
+    with patch.object(reference_manager, "get_reference_dir", return_value=str(tmp_path)), patch.object(
+        reference_manager, "get_reference_path", return_value=str(tmp_path / "reference_data.parquet")
+    ), patch.object(reference_manager, "fetch_matched_range", side_effect=fetch_matched_range) as fetch:
+        yield fetch
+
+
+def test_reference_window():
+    now = datetime(2025, 3, 10, 15, 30, tzinfo=timezone.utc)
+    assert reference_manager.get_reference_window({"strategy": "last_n_days", "days": 7}, now) == (
+        pd.Timestamp("2025-03-03"),
+        pd.Timestamp("2025-03-10"),
+    )
+    assert reference_manager.get_reference_window({"strategy": "same_period_last_year", "days": 7}, now) == (
+        pd.Timestamp("2024-03-03"),
+        pd.Timestamp("2024-03-10"),
+    )
+    with pytest.raises(ValueError):
+        reference_manager.get_reference_settings({"reference": {"strategy": "rolling"}})
+
+
+def test_update_reference(mock_archive, mock_fetch, tmp_path):
+    archive, config = mock_archive
+    reference_path = str(tmp_path / "reference_data.parquet")
+    current = archive[archive["timestamp"] >= "2024-08-19"]
+
+    # the fixed reference data is never replaced
+    assert not reference_manager.update_reference(config, current, datetime(2024, 8, 20, 9))
+    assert mock_fetch.call_count == 0
+
+    config["reference"] = {"strategy": "last_n_days", "days": 7}
+    assert reference_manager.update_reference(config, current, datetime(2024, 8, 20, 9))
+    reference_data = read_reference(reference_path)
+    assert reference_data["timestamp"].min() >= pd.Timestamp("2024-08-13")
+    assert reference_data["timestamp"].max() < pd.Timestamp("2024-08-20")
+    # the rows of the current data aren't part of the reference data
+    assert not reference_data["StudyID"].isin(current["StudyID"]).any()
+
+    # later runs of the same day reuse the cached reference data
+    assert not reference_manager.update_reference(config, current, datetime(2024, 8, 20, 18))
+    assert mock_fetch.call_count == 1
+
+    # a reference data replaced by hand is swapped back without fetching it again
+    write_reference(archive.head(10), reference_path)
+    assert reference_manager.update_reference(config, current, datetime(2024, 8, 20, 19))
+    assert mock_fetch.call_count == 1
+    assert len(read_reference(reference_path)) == len(reference_data)
+
+    assert reference_manager.update_reference(config, current, datetime(2024, 8, 21, 9))
+    assert read_reference(reference_path)["timestamp"].min() >= pd.Timestamp("2024-08-14")
+
+    # a window without enough rows keeps the previous reference data
+    config["reference"]["min_rows"] = len(archive)
+    assert not reference_manager.update_reference(config, current, datetime(2024, 8, 22, 9))
+    assert read_reference(reference_path)["timestamp"].min() >= pd.Timestamp("2024-08-14")
@@ -0,0 +1,73 @@
+"""
+Script to test the storage and validation stamp of the reference data.
+"""
+
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from scripts.synthetic_data import generate_config, generate_data, merge_results_and_labels
+from src.data_preprocessing import etl, reference_store
+
+
+@pytest.fixture
+def mock_reference_dir(tmp_path):
+    """
+    Fixture to keep the reference data in a temporary directory
+    """
+    with patch.object(reference_store, "get_reference_dir", return_value=str(tmp_path)):
+        yield tmp_path
+
+
+@pytest.fixture
+def mock_data():
+    """
+    Fixture to generate synthetic matched data with its config
+    """
+    config = generate_config()
+    results, labels = generate_data(config, 200, seed=4)
+    return merge_results_and_labels(results, labels, config), config
+
+
+def load_reference(config, data):
+    """
+    Load the reference data, counting the validations.
+    """
+    with patch.object(etl, "validate_data", wraps=etl.validate_data) as validate_data:
+        reference_data = etl.reference_load_and_validate(config, data)
+    return reference_data, validate_data.call_count
+
+
+def test_reference_validated_once(mock_reference_dir, mock_data):
+    data, config = mock_data
+
+    # the first run copies the current data
+    reference_data, validations = load_reference(config, data)
+    assert validations == 1
+    assert (mock_reference_dir / "reference_data.parquet").exists()
+    assert json.loads((mock_reference_dir / "reference_data.stamp.json").read_text())["rows"] == len(data)
+
+    reference_data, validations = load_reference(config, data.head(10))
+    assert validations == 0
+    pd.testing.assert_frame_equal(reference_data, data)
+
+    # a changed config or file is validated again
+    config["age_filtering"] = {"filter_type": "default"}
+    assert load_reference(config, data)[1] == 1
+    assert load_reference(config, data)[1] == 0
+    reference_store.write_reference(data.head(100), str(mock_reference_dir / "reference_data.parquet"))
+    assert load_reference(config, data)[1] == 1
+
+
+def test_legacy_csv_converted(mock_reference_dir, mock_data):
+    data, config = mock_data
+    data.to_csv(mock_reference_dir / "reference_data.csv", index=False)
+
+    reference_data, validations = load_reference(config, data.head(10))
+    assert validations == 1
+    assert not (mock_reference_dir / "reference_data.csv").exists()
+    assert (mock_reference_dir / "reference_data.csv.bak").exists()
+    assert reference_data["timestamp"].dtype == "datetime64[ns]"
+    pd.testing.assert_frame_equal(reference_data, data, check_dtype=False)
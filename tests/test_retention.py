@@ -0,0 +1,95 @@
+"""
+Script to test the snapshot retention on a synthetic multi-year history.
+"""
+
+import json
+import uuid
+import pytest
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from src.dashboard.create_project import load_manifest, save_manifest
+from src.dashboard.retention import TIMESTAMP_FORMAT, apply_retention, get_retention_policy, select_runs
+
+NOW = datetime(2024, 8, 15, 12, 0, 0)
+
+
+@pytest.fixture
+def mock_history():
+    """
+    Fixture to generate three years of runs, four per day
+    """
+    return [(NOW - timedelta(hours=6 * i)).strftime(TIMESTAMP_FORMAT) for i in range(1, 4 * 365 * 3)]
+
+
+def ages(runs):
+    """
+    Get the timestamps and ages in days of runs.
+    """
+    return [
+        (datetime.strptime(run, TIMESTAMP_FORMAT), (NOW - datetime.strptime(run, TIMESTAMP_FORMAT)).days)
+        for run in runs
+    ]
+
+
+def test_select_runs(mock_history):
+    keep, remove = select_runs(mock_history, get_retention_policy({}), NOW)
+    assert keep | remove == set(mock_history)
+    assert not keep & remove
+
+    kept = ages(keep)
+    # every run of the last 14 days is kept
+    assert sum(age < 14 for _, age in kept) == sum(age < 14 for _, age in ages(mock_history))
+    # one run per day until 180 days, the latest one of the day (away from the boundary days)
+    daily = [timestamp for timestamp, age in kept if 15 <= age < 179]
+    assert len(daily) == len({timestamp.date() for timestamp in daily})
+    assert all(timestamp.hour == 18 for timestamp in daily)
+    # one run per ISO week after that
+    weekly = [timestamp for timestamp, age in kept if age >= 181]
+    assert len(weekly) == len({timestamp.isocalendar()[:2] for timestamp in weekly})
+    assert len(weekly) == pytest.approx((3 * 365 - 181) / 7, abs=2)
+
+    keep, remove = select_runs(mock_history, get_retention_policy({"retention": {"weekly_days": 365}}), NOW)
+    assert max(age for _, age in ages(keep)) < 365
+
+
+def test_invalid_policy():
+    with pytest.raises(ValueError):
+        get_retention_policy({"retention": {"keep_all_days": 30, "daily_days": 7}})
+
+
+def test_apply_retention(tmp_path):
+    runs = [
+        (NOW - timedelta(days=days, hours=hours)).strftime(TIMESTAMP_FORMAT) for days in [1, 40] for hours in [0, 6]
+    ]
+    project = MagicMock(id=uuid.uuid4())
+    manifest = {}
+    for run in runs:
+        strata_path = tmp_path / run / "reports" / "main_report"
+        strata_path.mkdir(parents=True)
+        (strata_path / "data_quality_report.json").write_text("{}")
+        manifest[f"{run}/reports/main_report/data_quality_report.json"] = {"mtime": 0, "size": 2, "id": run}
+    save_manifest(str(tmp_path), str(project.id), manifest)
+    # cache entries of a kept and a removed run
+    cache_dir = tmp_path / ".cache"
+    cache_dir.mkdir()
+    for key, run in [("kept", runs[2]), ("removed", runs[3])]:
+        snapshot_path = tmp_path / run / "reports" / "main_report" / "data_quality_report.json"
+        (cache_dir / f"{key}.json").write_text(json.dumps({"path": str(snapshot_path)}))
+
+    # the dry run only reports
+    workspace = MagicMock()
+    report = apply_retention({}, workspace, project, dry_run=True, now=NOW, snapshots_dir=str(tmp_path))
+    assert report["runs_removed"] == [runs[3]]
+    assert report["bytes_removed"] == 2
+    assert report["cache_entries_removed"] == 1
+    assert (tmp_path / runs[3]).exists()
+    assert (cache_dir / "removed.json").exists()
+    workspace.delete_snapshot.assert_not_called()
+
+    report = apply_retention({}, workspace, project, now=NOW, snapshots_dir=str(tmp_path))
+    assert not (tmp_path / runs[3]).exists()
+    assert (tmp_path / runs[2]).exists()
+    workspace.delete_snapshot.assert_called_once_with(project.id, runs[3])
+    assert len(load_manifest(str(tmp_path), str(project.id))) == 3
+    # no cache hit points at a removed snapshot
+    assert sorted(path.name for path in cache_dir.iterdir()) == ["kept.json"]
@@ -0,0 +1,135 @@
+"""
+Script to test the approximate drift sketches against the exact results.
+"""
+
+import pytest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from scipy import stats
+from evidently.calculations.stattests import psi_stat_test
+from evidently.calculations.stattests.utils import get_binned_data
+from evidently.core import ColumnType
+from src.monitoring import sketches
+from src.monitoring.sketches import (
+    KLLSketch,
+    CountMinSketch,
+    sketch_series,
+    ks_distance,
+    wasserstein_distance,
+    numerical_bin_percents,
+    psi,
+)
+from src.monitoring.metrics import get_drift_stattests
+
+RANK_ERROR = 0.01
+
+
+@pytest.fixture
+def numerical_data():
+    """
+    Fixture to generate a large reference and a drifted current numerical column
+    """
+    rng = np.random.default_rng(42)
+    reference = pd.Series(rng.normal(50, 10, 200000))
+    current = pd.Series(rng.normal(53, 12, 150000))
+    return reference, current
+
+
+@pytest.fixture
+def categorical_data():
+    """
+    Fixture to generate a large reference and a drifted current categorical column
+    """
+    rng = np.random.default_rng(42)
+    reference = pd.Series(rng.choice(["IP", "OP", "ED", "ICU"], 200000, p=[0.4, 0.3, 0.2, 0.1]))
+    current = pd.Series(rng.choice(["IP", "OP", "ED", "ICU", "DAY"], 150000, p=[0.3, 0.3, 0.2, 0.1, 0.1]))
+    return reference, current
+
+
+def test_kll_rank_error(numerical_data):
+    reference, _ = numerical_data
+    sketch = sketch_series(reference)
+    points = np.quantile(reference, np.linspace(0, 1, 501))
+    exact = np.searchsorted(np.sort(reference), points, side="right") / len(reference)
+    assert np.max(np.abs(sketch.cdf(points) - exact)) <= RANK_ERROR
+    assert sketch.num_retained() < 1000
+    assert sketch.std == pytest.approx(np.std(reference))
+
+
+def test_kll_merge(numerical_data):
+    reference, _ = numerical_data
+    merged = KLLSketch().update(reference[:100000]).merge(KLLSketch().update(reference[100000:]))
+    assert merged.n == len(reference)
+    assert ks_distance(merged, sketch_series(reference)) <= 2 * RANK_ERROR
+
+
+def test_ks_distance(numerical_data):
+    reference, current = numerical_data
+    exact = stats.ks_2samp(reference, current).statistic
+    approximate = ks_distance(sketch_series(reference), sketch_series(current))
+    assert abs(approximate - exact) <= 2 * RANK_ERROR
+
+
+def test_wasserstein_distance(numerical_data):
+    reference, current = numerical_data
+    exact = stats.wasserstein_distance(reference, current) / np.std(reference)
+    approximate = wasserstein_distance(sketch_series(reference), sketch_series(current))
+    error_bound = 2 * RANK_ERROR * (max(reference.max(), current.max()) - min(reference.min(), current.min()))
+    assert abs(approximate - exact) <= error_bound / np.std(reference)
+
+
+def test_numerical_psi(numerical_data):
+    reference, current = numerical_data
+    exact_reference, exact_current = get_binned_data(reference, current, ColumnType.Numerical, 30, feel_zeroes=False)
+    reference_percents, current_percents = numerical_bin_percents(sketch_series(reference), sketch_series(current))
+    assert len(reference_percents) == len(exact_reference)
+    assert np.max(np.abs(reference_percents - exact_reference)) <= 2 * RANK_ERROR
+    assert np.max(np.abs(current_percents - exact_current)) <= 2 * RANK_ERROR
+
+    exact = psi_stat_test(reference, current, ColumnType.Numerical, None).drift_score
+    assert psi(sketch_series(reference), sketch_series(current)) == pytest.approx(exact, rel=0.25)
+
+
+def test_categorical_psi(categorical_data):
+    reference, current = categorical_data
+    exact = psi_stat_test(reference, current, ColumnType.Categorical, None).drift_score
+    approximate = psi(
+        sketch_series(reference, ColumnType.Categorical),
+        sketch_series(current, ColumnType.Categorical),
+    )
+    assert approximate == pytest.approx(exact, rel=1e-6)
+
+
+def test_count_min_never_underestimates(categorical_data):
+    reference, _ = categorical_data
+    sketch = CountMinSketch(width=4, depth=3).update(reference)
+    counts = reference.value_counts()
+    estimates = sketch.estimate(counts.index)
+    assert np.all(estimates >= counts.to_numpy())
+    assert np.all(estimates - counts.to_numpy() <= len(reference))
+
+
+def test_get_drift_stattests():
+    data = pd.DataFrame({"age": range(10)})
+    assert get_drift_stattests({}, data) == {}
+    config = {"approximate_drift": {"enabled": True, "min_rows": 5}}
+    assert get_drift_stattests(config, data) == {"num_stattest": "sketch_wasserstein", "cat_stattest": "sketch_psi"}
+    config["approximate_drift"]["min_rows"] = 50
+    assert get_drift_stattests(config, data) == {}
+
+
+def test_stattests_reuse_sketches(numerical_data):
+    reference, current = numerical_data
+    strata = [current.iloc[::2].reset_index(drop=True), current.iloc[1::2].reset_index(drop=True)]
+    sketches._sketches.clear()
+    with patch.object(sketches, "sketch_series", side_effect=sketch_series) as build:
+        values = [
+            stattest(reference.copy(), stratum, ColumnType.Numerical, 0.1)[0]
+            for stratum in strata
+            for stattest in [sketches._sketch_ks, sketches._sketch_wasserstein, sketches._sketch_psi]
+        ]
+    # one sketch of the reference column for every stratum and metric, one per stratum
+    assert build.call_count == 1 + len(strata)
+    assert values[0] == ks_distance(sketch_series(reference), sketch_series(strata[0]))
+    assert values[5] == psi(sketch_series(reference), sketch_series(strata[1]))
@@ -0,0 +1,83 @@
+"""
+Script to test the snapshot serialization.
+"""
+
+import json
+import math
+import pytest
+import numpy as np
+import pandas as pd
+from evidently.report import Report
+from evidently.metrics import DatasetSummaryMetric, DatasetDriftMetric
+from evidently.suite.base_suite import Snapshot
+from evidently.utils import NumpyEncoder
+from src.monitoring.snapshots import (
+    get_compression,
+    get_snapshot_path,
+    is_snapshot_file,
+    read_snapshot_data,
+    save_snapshot,
+    write_snapshot_data,
+)
+
+
+@pytest.fixture
+def mock_report():
+    """
+    Fixture to generate a report on data with missing values
+    """
+    rng = np.random.default_rng(0)
+    reference = pd.DataFrame({"age": rng.normal(50, 10, 200), "sex": rng.choice(["M", "F"], 200)})
+    current = reference.copy()
+    current.loc[:20, "age"] = np.nan
+    report = Report(metrics=[DatasetSummaryMetric(), DatasetDriftMetric()], tags=["main"])
+    report.run(reference_data=reference, current_data=current)
+    return report
+
+
+def test_get_snapshot_path():
+    assert get_snapshot_path("a/regression_report.json", "gzip") == "a/regression_report.json.gz"
+    assert get_snapshot_path("a/regression_report.json.gz", "zstd") == "a/regression_report.json.zst"
+    assert get_snapshot_path("a/regression_report.json.zst", "none") == "a/regression_report.json"
+    assert is_snapshot_file("regression_report.json.gz")
+    assert not is_snapshot_file("regression_report.json.gz.1234.tmp")
+    assert not is_snapshot_file(".manifest.json")
+
+
+def test_non_finite_round_trip(tmp_path):
+    snapshot_data = {
+        "values": [1.5, float("nan"), float("inf"), -float("inf"), "", None],
+        "array": np.array([0.5, np.nan]),
+        "scalar": np.float32("nan"),
+        "nested": {1: {"value": np.int64(3)}},
+    }
+    for compression in ["none", "gzip"]:
+        path = write_snapshot_data(snapshot_data, str(tmp_path / "snapshot.json"), compression)
+        restored = read_snapshot_data(path)
+        assert restored["values"][0] == 1.5
+        assert math.isnan(restored["values"][1])
+        assert restored["values"][2:] == [float("inf"), -float("inf"), "", None]
+        assert restored["array"][0] == 0.5 and math.isnan(restored["array"][1])
+        assert math.isnan(restored["scalar"])
+        assert restored["nested"] == {"1": {"value": 3}}
+
+
+def test_save_snapshot_matches_evidently(tmp_path, mock_report):
+    evidently_path = str(tmp_path / "evidently.json")
+    mock_report.save(evidently_path)
+
+    path = save_snapshot(mock_report, str(tmp_path / "report.json"), {"snapshot_storage": {"compression": "gzip"}})
+    assert path.endswith(".json.gz")
+
+    # both the compressed snapshot and Evidently's own file parse into the same snapshot
+    expected = Snapshot(**read_snapshot_data(evidently_path))
+    restored = Snapshot(**read_snapshot_data(path))
+    assert json.dumps(restored.dict(), cls=NumpyEncoder) == json.dumps(expected.dict(), cls=NumpyEncoder)
+    assert restored.tags == ["main"]
+
+
+def test_get_compression():
+    assert get_compression({}) == ("none", None)
+    assert get_compression({"snapshot_storage": {"compression": "gzip", "level": 9}}) == ("gzip", 9)
+    with pytest.raises(ValueError):
+        get_compression({"snapshot_storage": {"compression": "brotli"}})
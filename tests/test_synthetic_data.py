@@ -0,0 +1,41 @@
+"""
+Script to test the synthetic data generator.
+"""
+
+import pandas as pd
+from scripts.synthetic_data import generate_config, generate_data, generate_details, merge_results_and_labels
+from src.data_preprocessing.validate import validate_data
+from src.monitoring.stratify import DataSplitter
+
+
+def test_deterministic_and_valid():
+    config = generate_config(n_features=8)
+    results, labels = generate_data(config, 200, n_hospitals=4, seed=1)
+    again, _ = generate_data(config, 200, n_hospitals=4, seed=1)
+    pd.testing.assert_frame_equal(results, again)
+
+    data = merge_results_and_labels(results, labels, config)
+    assert len(data) == 200
+    assert validate_data(data, config)
+
+    details = generate_details(data, config)
+    assert details["hospital_unique_values"] == ["hospital1", "hospital2", "hospital3", "hospital4"]
+    assert "feature_4" in details["categorical_columns"] and "feature_8" in details["categorical_columns"]
+    assert "main_report" in DataSplitter().split_data(data, config, details, "report")
+
+
+def test_duplicates_label_delay_and_drift():
+    config = generate_config()
+    results, labels = generate_data(config, 1000, duplicate_rate=0.1, label_delay_days=3)
+    assert len(results) == 1100
+    delay = labels["timestamp"] - results.drop_duplicates("StudyID")["timestamp"]
+    assert (delay == pd.Timedelta(days=3)).all()
+    # the deduplication keeps the latest copy of every study
+    data = merge_results_and_labels(results, labels, config)
+    assert len(data) == 1000
+    original = results.iloc[:1000].set_index("StudyID")["age"]
+    assert (data.set_index("StudyID")["age"].sort_index() == original).all()
+
+    drifted, _ = generate_data(config, 1000, drift=1.0)
+    assert drifted["feature_1"].mean() - results["feature_1"].mean() > 0.5
+    assert (drifted["age_pred"] - drifted["age"]).mean() > 3
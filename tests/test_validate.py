@@ -1,6 +1,8 @@
 import pytest
 import pandas as pd
-from src.data_preprocessing.validate import validate_data
+from unittest.mock import patch
+from src.data_preprocessing import etl
+from src.data_preprocessing.validate import get_invalid_rows, validate_data
 import numpy as np
 
 
@@ -204,3 +206,16 @@ def test_validate_corrupted_data(corrupted_data, mock_config):
 def test_validate_missing_regression_output(missing_regression_output, mock_config):
     with pytest.raises(ValueError):
         validate_data(missing_regression_output, mock_config)
+
+
+def test_invalid_rows_are_rejected(data_with_wrong_types, mock_config):
+    data_with_wrong_types.loc[0, "regression_output"] = 10.0
+    assert get_invalid_rows(data_with_wrong_types, mock_config)["StudyID"].tolist() == ["002", "003"]
+
+    # the rows failing validation leave the pending collections before the run fails
+    with patch.object(etl, "fetch_and_merge", return_value=data_with_wrong_types), patch.object(
+        etl, "move_rejected"
+    ) as move_rejected:
+        with pytest.raises(ValueError):
+            etl.main_load_and_validate(mock_config)
+    move_rejected.assert_called_once_with(mock_config, ["002", "003"])